@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify, session, send_file
+from flask import Flask, render_template, request, jsonify, session, send_file, Response, stream_with_context
 from flask_cors import CORS
 import os
 import json
@@ -11,13 +11,23 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from model import get_response as get_isro_response
-from weather_advisory import save_weather_context, geocode_city
+from weather_advisory import (
+    save_weather_context, geocode_city, get_weather_context, compare_regions,
+    refresh_region, forecast_expires_at
+)
 from weather_llm import get_weather_response
 import re
 from fpdf import FPDF
 import tempfile
 import datetime
 from models import db, ChatSession, ChatMessage
+from chat_transfer import iter_export_lines, import_lines, parse_datetime
+import click
+import sys
+import retention
+import prewarm
+import model as isro_model
+from memory_report import process_memory
 
 # Configure logging
 if not os.path.exists('logs'):
@@ -48,6 +58,21 @@ db.init_app(app)
 with app.app_context():
     db.create_all()
 
+def start_background_jobs():
+    """Start the per-process background threads (gunicorn.conf.py calls this in each worker)"""
+    # Background retention job (archive/prune chat history, incremental VACUUM)
+    if os.getenv('CHAT_RETENTION_SCHEDULE', '0') == '1':
+        retention.start_scheduler(app)
+
+    # Background pre-warming of forecasts/advisories for popular regions (opt-in:
+    # it calls the geocoding and forecast upstreams, which CLI commands must not)
+    if os.getenv('PREWARM_ENABLED', '0') == '1':
+        prewarm.start_scheduler(refresh_region, forecast_expires_at)
+
+# Threads do not survive fork, so a preloading server starts them after forking
+if os.getenv('DEFER_BACKGROUND_JOBS', '0') != '1':
+    start_background_jobs()
+
 # Error Handlers
 @app.errorhandler(404)
 def not_found_error(error):
@@ -171,10 +196,11 @@ def remove_emojis(text):
 
 def handle_weather_query(query):
     """Handle weather-related queries"""
-    if not session.get('current_region'):
+    region = session.get('current_region')
+    if not region:
         return "Please set a region first using the region selector. I need to know which location's weather you're asking about."
     
-    return get_weather_response(query)
+    return get_weather_response(query, get_weather_context(region))
 
 def handle_isro_query(query):
     """Handle ISRO/MOSDAC queries"""
@@ -255,6 +281,48 @@ def delete_chat_session(session_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# API to stream all chat sessions as NDJSON (resumable with ?after=<last completed session id>)
+@app.route('/api/chat_sessions/export', methods=['GET'])
+def export_chat_sessions():
+    try:
+        after_id = request.args.get('after', type=int)
+        since = parse_datetime(request.args.get('since'))
+        until = parse_datetime(request.args.get('until'))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid export parameters: {e}'}), 400
+
+    return Response(
+        stream_with_context(iter_export_lines(after_id=after_id, since=since, until=until)),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename=chat_sessions.ndjson'}
+    )
+
+# API to bulk import chat sessions from an NDJSON request body
+@app.route('/api/chat_sessions/import', methods=['POST'])
+def import_chat_sessions():
+    try:
+        stats = import_lines(request.stream)
+        return jsonify({'success': True, **stats})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# API to inspect retention job metrics
+@app.route('/api/retention/status', methods=['GET'])
+def retention_status():
+    return jsonify(retention.METRICS)
+
+# API to inspect region pre-warming
+@app.route('/api/prewarm/status', methods=['GET'])
+def prewarm_status():
+    return jsonify({**prewarm.METRICS, 'top_regions': prewarm.popularity.top()})
+
+# API to inspect this server process's memory (per gunicorn worker)
+@app.route('/api/memory', methods=['GET'])
+def memory_status():
+    return jsonify({**process_memory(), 'index_version': isro_model.index_version,
+                    'index_mmap': isro_model.INDEX_MMAP})
+
 # API endpoint for chat
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -364,7 +432,8 @@ def set_region():
             return jsonify({'error': 'Could not find location. Please try a different name.'}), 400
         
         # Generate weather context for this region
-        save_weather_context(region)
+        save_weather_context(region, coords)
+        prewarm.popularity.record(region)
         
         # Store region in session
         session['current_region'] = region
@@ -379,6 +448,25 @@ def set_region():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# API endpoint to compare weather across several regions
+MAX_COMPARE_REGIONS = 50
+
+@app.route('/compare_regions', methods=['POST'])
+def compare_regions_endpoint():
+    try:
+        data = request.json
+        regions = [r.strip() for r in data.get('regions', []) if isinstance(r, str) and r.strip()]
+        
+        if not regions:
+            return jsonify({'error': 'At least one region is required'}), 400
+        if len(regions) > MAX_COMPARE_REGIONS:
+            return jsonify({'error': f'At most {MAX_COMPARE_REGIONS} regions can be compared'}), 400
+        
+        return jsonify(compare_regions(regions))
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # API endpoint to clear chat
 @app.route('/clear_chat', methods=['POST'])
 def clear_chat():
@@ -521,6 +609,37 @@ def download_pdf(filename):
         print(f"PDF generation error: {e}")
         return jsonify({'error': f'PDF generation failed: {str(e)}'}), 500
 
+# CLI: flask --app app export-chats [--output FILE] [--after ID] [--since DATE] [--until DATE]
+@app.cli.command('export-chats')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default=None, help='Output file (default: stdout)')
+@click.option('--after', type=int, default=None, help='Resume after this session id (the last one fully received)')
+@click.option('--since', default=None, help='Only sessions updated on/after this ISO date')
+@click.option('--until', default=None, help='Only sessions updated before this ISO date')
+def export_chats_command(output, after, since, until):
+    """Stream chat sessions and messages as NDJSON"""
+    out = open(output, 'w', encoding='utf-8') if output else sys.stdout
+    try:
+        for line in iter_export_lines(after_id=after, since=parse_datetime(since), until=parse_datetime(until)):
+            out.write(line)
+    finally:
+        if output:
+            out.close()
+
+# CLI: flask --app app import-chats FILE
+@app.cli.command('import-chats')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+def import_chats_command(source):
+    """Bulk import chat sessions and messages from NDJSON"""
+    stats = import_lines(source)
+    click.echo(json.dumps(stats))
+
+# CLI: flask --app app retention [--convert-vacuum]
+@app.cli.command('retention')
+@click.option('--convert-vacuum', is_flag=True, help='Switch the database to incremental auto-vacuum (runs one full VACUUM)')
+def retention_command(convert_vacuum):
+    """Archive and prune old chat history, then compact the database"""
+    click.echo(json.dumps(retention.run_retention(convert_vacuum=convert_vacuum)))
+
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))
     debug_mode = os.environ.get("FLASK_ENV", "development") == "development"
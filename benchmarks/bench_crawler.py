@@ -0,0 +1,265 @@
+"""
+bench_crawler.py
+
+Benchmark crawl_website() against a synthetic site served locally, so
+concurrency and parsing changes can be compared without touching
+mosdac.gov.in.
+
+The site runs in a separate process (so its CPU does not count against the
+crawler) and serves --pages linked HTML pages plus a share of PDFs, with
+configurable response latency, transient 503 errors and duplicate links
+(fragments, tracking parameters and repeated hrefs that canonicalization
+should collapse).
+
+Reports pages/s, bytes/s, peak RSS of the crawler and of the parse workers,
+event-loop lag and CPU utilization.
+
+Usage: python benchmarks/bench_crawler.py [--pages 2000] [--latency-ms 20] [--error-rate 0.02]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import crawler  # noqa: E402
+from crawl_scheduler import CrawlScheduler, make_connector  # noqa: E402
+
+WORDS = ("satellite ocean monsoon cyclone rainfall insat oceansat scatterometer radiance "
+         "temperature humidity product archive download calibration orbit swath").split()
+
+
+# ---------------- Synthetic site ---------------- #
+
+def make_pdf(text):
+    import fitz
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def render_page(n, args, rng):
+    """HTML for page n: a few headed sections of filler text and a set of links"""
+    sections = []
+    for s in range(4):
+        words = " ".join(rng.choice(WORDS) for _ in range(args.page_kb * 40))
+        sections.append(f"<h2>Section {n}.{s}</h2><p>{words}</p>")
+
+    links = []
+    for _ in range(args.links):
+        target = rng.randrange(args.pages)
+        href = f"/page/{target}"
+        if rng.random() < args.dup_ratio:
+            # Variants canonicalize_url() should fold back into the same page
+            href = rng.choice([f"{href}#top", f"{href}?utm_source=bench", f"{href}/", href])
+        links.append(f'<a href="{href}">page {target}</a>')
+    if rng.random() < args.pdf_ratio:
+        links.append(f'<a href="/doc/{n}.pdf">report {n}</a>')
+    return (f"<html><head><title>Page {n}</title></head><body><h1>Page {n}</h1>"
+            f"{''.join(sections)}<nav>{' '.join(links)}</nav></body></html>").encode()
+
+
+def serve_site(args, port, ready):
+    rng = random.Random(args.seed)
+    pages = [render_page(n, args, rng) for n in range(args.pages)]
+    # Page 0 links to everything in order so the whole site is reachable
+    index = "".join(f'<a href="/page/{n}">{n}</a>' for n in range(args.pages))
+    pages[0] = pages[0].replace(b"<nav>", f"<nav>{index}".encode(), 1)
+    pdf = make_pdf("Synthetic report " + " ".join(WORDS))
+    errors = random.Random(args.seed + 1)
+
+    async def delay():
+        if args.latency_ms:
+            await asyncio.sleep(max(0.0, errors.gauss(args.latency_ms, args.jitter_ms)) / 1000)
+
+    async def page(request):
+        await delay()
+        if errors.random() < args.error_rate:
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        n = int(request.match_info["n"])
+        if n >= len(pages):
+            return web.Response(status=404)
+        return web.Response(body=pages[n], content_type="text/html")
+
+    async def doc(request):
+        await delay()
+        return web.Response(body=pdf, content_type="application/pdf")
+
+    app = web.Application()
+    app.router.add_get("/page/{n:\\d+}", page)
+    app.router.add_get("/doc/{name}", doc)
+    ready.set()
+    web.run_app(app, host="127.0.0.1", port=port, print=None, access_log=None)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"synthetic site did not start on port {port}")
+
+
+# ---------------- Measurement ---------------- #
+
+class LoopLagMonitor:
+    """Samples how late a periodic timer fires, i.e. how long the loop was blocked"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+    def report(self):
+        lags = np.array(self.lags or [0.0]) * 1000
+        return (f"event-loop lag    mean {lags.mean():.1f} ms, p99 {np.percentile(lags, 99):.1f} ms, "
+                f"max {lags.max():.1f} ms ({len(self.lags)} samples)")
+
+
+def max_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss * scale / 1e6
+
+
+def cpu_seconds(who=resource.RUSAGE_SELF):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+async def run_crawl(args, port):
+    start_url = f"http://127.0.0.1:{port}/page/0"
+    stats = crawler.CrawlStats()
+    scheduler = None
+    if not args.no_scheduler:
+        scheduler = CrawlScheduler(crawler.fetch, rate=args.rate, burst=max(1, int(args.rate)),
+                                   initial_concurrency=args.max_concurrency,
+                                   max_concurrency=args.max_concurrency,
+                                   backoff_base=args.backoff, respect_robots=False)
+    parse_pool = ProcessPoolExecutor(max_workers=args.parse_workers) if args.parse_workers else None
+    nodes = 0
+
+    def sink(node, fresh):
+        nonlocal nodes
+        nodes += 1
+
+    monitor = LoopLagMonitor()
+    monitor.start()
+    wall = time.perf_counter()
+    cpu = cpu_seconds()
+    children = cpu_seconds(resource.RUSAGE_CHILDREN)
+    try:
+        connector = make_connector(limit=args.max_concurrency * 2, limit_per_host=args.max_concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await crawler.crawl_website(session, start_url, max_pages=args.max_pages, sink=sink,
+                                        parse_pool=parse_pool, stats=stats, scheduler=scheduler,
+                                        workers=args.max_concurrency)
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = cpu_seconds() - cpu
+        await monitor.stop()
+        if parse_pool:
+            # Joins the workers so their usage shows up in RUSAGE_CHILDREN
+            parse_pool.shutdown(wait=True)
+
+    print(stats.report())
+    if scheduler:
+        print(scheduler.report())
+    print()
+    print(f"nodes emitted     {nodes}")
+    print(f"throughput        {stats.fetched / wall:.1f} pages/s, {stats.fetch_bytes / wall / 1e6:.2f} MB/s")
+    print(monitor.report())
+    print(f"peak RSS          crawler {max_rss_mb():.0f} MB, "
+          f"largest parse worker {max_rss_mb(resource.RUSAGE_CHILDREN):.0f} MB")
+    cores = os.cpu_count() or 1
+    children = cpu_seconds(resource.RUSAGE_CHILDREN) - children
+    print(f"CPU               crawler {cpu / wall * 100:.0f}% of a core, "
+          f"parse workers {children / wall * 100:.0f}% of a core, "
+          f"total {(cpu + children) / wall / cores * 100:.0f}% of {cores} cores")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=2000, help="HTML pages on the synthetic site")
+    parser.add_argument('--links', type=int, default=8, help="Random links per page")
+    parser.add_argument('--page-kb', type=int, default=4, help="Approximate text size per section")
+    parser.add_argument('--pdf-ratio', type=float, default=0.05, help="Share of pages linking a PDF")
+    parser.add_argument('--dup-ratio', type=float, default=0.3,
+                        help="Share of links written as a fragment/tracking/trailing-slash variant")
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--jitter-ms', type=float, default=10)
+    parser.add_argument('--error-rate', type=float, default=0.02, help="Share of page requests answered 503")
+    parser.add_argument('--max-pages', type=int, default=None, help="Crawl cap (default: every page and PDF)")
+    parser.add_argument('--max-concurrency', type=int, default=16)
+    parser.add_argument('--rate', type=float, default=1000.0, help="Scheduler requests/s for the host")
+    parser.add_argument('--backoff', type=float, default=0.05, help="Scheduler retry backoff base in seconds")
+    parser.add_argument('--no-scheduler', action='store_true', help="Fetch directly, without CrawlScheduler")
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count(),
+                        help="Parse pool size; 0 parses on the event loop")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if args.max_pages is None:
+        args.max_pages = args.pages * 2
+
+    port = free_port()
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=serve_site, args=(args, port, ready), daemon=True)
+    server.start()
+    media_dir = Path(tempfile.mkdtemp(prefix="bench_crawler_"))
+    # Keep downloaded PDFs out of output/media
+    crawler.MEDIA_DIR = media_dir
+    try:
+        ready.wait(120)
+        wait_for_port(port)
+        print(f"{args.pages} pages, {args.links} links/page, {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms "
+              f"latency, {args.error_rate:.0%} errors, {args.max_concurrency} concurrency, "
+              f"{args.parse_workers or 'no'} parse workers")
+        asyncio.run(run_crawl(args, port))
+    finally:
+        server.terminate()
+        server.join()
+        shutil.rmtree(media_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
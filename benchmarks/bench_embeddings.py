@@ -0,0 +1,121 @@
+"""
+bench_embeddings.py
+
+Compare query-embedding backends for the /chat retrieval step:
+sentence-transformers on PyTorch, and ONNX Runtime with the float32 and
+int8 models (run `python onnx_embeddings.py export` first).
+
+Each backend runs in a fresh process so import time and memory are not
+shared. Reported per backend: time to import and load the model, RSS
+after loading, single-query latency, and throughput with --concurrency
+threads embedding at once (for ONNX with and without micro-batching).
+
+Usage: python benchmarks/bench_embeddings.py [--queries 200] [--concurrency 8] [--threads N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+
+BACKENDS = ('torch', 'onnx-fp32', 'onnx-int8')
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+QUESTIONS = [
+    "What is MOSDAC?",
+    "Which satellites carry a scatterometer?",
+    "How do I download INSAT-3D rainfall products?",
+    "What is the spatial resolution of Oceansat-3 ocean colour data?",
+    "Explain the difference between Level-1 and Level-2 products",
+    "Is there cyclone track data for the Bay of Bengal?",
+    "How often is sea surface temperature updated?",
+    "Where can I find soil moisture estimates for India?",
+]
+
+
+def load(backend, threads, max_batch):
+    if backend == 'torch':
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=MODEL)
+    from onnx_embeddings import OnnxEmbeddings
+    return OnnxEmbeddings(int8=backend == 'onnx-int8', threads=threads, max_batch=max_batch)
+
+
+def throughput(embeddings, queries, concurrency):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(embeddings.embed_query, queries))
+    return len(queries) / (time.perf_counter() - started)
+
+
+def run_worker(backend, queries, concurrency, threads):
+    """Measure one backend in this process and print a JSON result"""
+    import numpy as np
+    from memory_report import process_memory
+
+    started = time.perf_counter()
+    embeddings = load(backend, threads, max_batch=1)
+    load_seconds = time.perf_counter() - started
+    rss = process_memory()['rss']
+
+    texts = [QUESTIONS[i % len(QUESTIONS)] + f" ({i})" for i in range(queries)]
+    embeddings.embed_query(texts[0])  # warm-up
+    latencies = []
+    for text in texts:
+        t = time.perf_counter()
+        embeddings.embed_query(text)
+        latencies.append(time.perf_counter() - t)
+    latencies = np.array(latencies) * 1000
+
+    result = {
+        'backend': backend, 'load_s': load_seconds, 'rss_mb': rss / 1e6,
+        'p50_ms': float(np.percentile(latencies, 50)), 'p95_ms': float(np.percentile(latencies, 95)),
+        'qps': throughput(embeddings, texts, concurrency),
+    }
+    if backend != 'torch':
+        embeddings.max_batch = 16
+        result['qps_batched'] = throughput(embeddings, texts, concurrency)
+        result['avg_batch'] = embeddings.batched_queries / max(embeddings.batches, 1)
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8, help="Threads embedding at once")
+    parser.add_argument('--threads', type=int, default=None, help="Intra-op threads per backend")
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.queries, args.concurrency, args.threads)
+        return
+
+    print(f"{args.queries} queries, concurrency {args.concurrency}, "
+          f"{args.threads or 'default'} inference threads\n")
+    print(f"{'backend':<10} {'load s':>7} {'RSS MB':>7} {'p50 ms':>7} {'p95 ms':>7} {'q/s':>7} {'q/s batched':>12}")
+    for backend in args.backends.split(','):
+        cmd = [sys.executable, __file__, '--worker', backend, '--queries', str(args.queries),
+               '--concurrency', str(args.concurrency)]
+        if args.threads:
+            cmd += ['--threads', str(args.threads)]
+        proc = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+        if proc.returncode != 0:
+            print(f"{backend:<10} failed: {proc.stderr.strip().splitlines()[-1] if proc.stderr else proc.returncode}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        batched = f"{r['qps_batched']:.0f} (avg {r['avg_batch']:.1f})" if 'qps_batched' in r else '-'
+        print(f"{backend:<10} {r['load_s']:7.2f} {r['rss_mb']:7.0f} {r['p50_ms']:7.2f} {r['p95_ms']:7.2f} "
+              f"{r['qps']:7.0f} {batched:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+bench_weather_analytics.py
+
+Benchmark the hourly-forecast advisory engine over many synthetic locations.
+
+Compares four paths:
+- per-location summarize() on Open-Meteo shaped dicts (what /set_region does),
+  each a batch of one through the vectorized path
+- summarize_many() over all the dicts at once (what /compare_regions does)
+- the core indicators computed once over a ready [locations, hours] batch
+- a plain-Python loop over the hourly lists computing only those core
+  indicators, as a baseline
+
+Usage: python benchmarks/bench_weather_analytics.py [--locations 5000] [--hours 168]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from weather_analytics import (  # noqa: E402
+    summarize, summarize_many, heat_index, peak_window, first_exceedance, pressure_change,
+    RAIN_THRESHOLD_MM,
+)
+
+
+def synthetic_forecasts(locations, hours, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(hours, dtype=np.float32)
+    temp = 28 + 6 * np.sin(2 * np.pi * (t - 9) / 24) + rng.normal(0, 1, (locations, hours))
+    rh = np.clip(65 - 15 * np.sin(2 * np.pi * (t - 9) / 24) + rng.normal(0, 5, (locations, hours)), 5, 100)
+    precip = np.where(rng.random((locations, hours)) > 0.85, rng.gamma(1.5, 1.5, (locations, hours)), 0)
+    gusts = np.abs(rng.normal(25, 10, (locations, hours)))
+    pressure = 1008 + np.cumsum(rng.normal(0, 0.4, (locations, hours)), axis=1)
+    return {
+        'temperature_2m': temp.astype(np.float32),
+        'relativehumidity_2m': rh.astype(np.float32),
+        'precipitation': precip.astype(np.float32),
+        'windgusts_10m': gusts.astype(np.float32),
+        'pressure_msl': pressure.astype(np.float32),
+    }
+
+
+def as_responses(batch, hours):
+    times = [f"2026-01-{1 + h // 24:02d}T{h % 24:02d}:00" for h in range(hours)]
+    n = len(batch['temperature_2m'])
+    return [
+        {'hourly': {'time': times, **{k: v[i].tolist() for k, v in batch.items()}}}
+        for i in range(n)
+    ]
+
+
+def python_baseline(response):
+    h = response['hourly']
+    temps, rh = h['temperature_2m'], h['relativehumidity_2m']
+    his = []
+    for tc, r in zip(temps, rh):
+        t = tc * 9 / 5 + 32
+        hi = (-42.379 + 2.04901523 * t + 10.14333127 * r - 0.22475541 * t * r - 6.83783e-3 * t * t
+              - 5.481717e-2 * r * r + 1.22874e-3 * t * t * r + 8.5282e-4 * t * r * r - 1.99e-6 * t * t * r * r)
+        his.append((hi - 32) * 5 / 9)
+    onset = next((i for i, p in enumerate(h['precipitation']) if p > RAIN_THRESHOLD_MM), -1)
+    g = h['windgusts_10m']
+    best = max(range(len(g) - 2), key=lambda i: g[i] + g[i + 1] + g[i + 2])
+    p = h['pressure_msl']
+    drop = min(p[i] - p[i - 3] for i in range(3, len(p)))
+    return max(his), onset, best, drop
+
+
+def timed(label, fn, n):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms  {n / elapsed:12.0f} locations/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--locations', type=int, default=5000)
+    parser.add_argument('--hours', type=int, default=168)
+    args = parser.parse_args()
+
+    batch = synthetic_forecasts(args.locations, args.hours)
+    responses = as_responses(batch, args.hours)
+    print(f"{args.locations} locations x {args.hours} hours")
+
+    timed("python loop (baseline)", lambda: [python_baseline(r) for r in responses], args.locations)
+    timed("summarize() per location", lambda: [summarize(r, horizon=args.hours) for r in responses], args.locations)
+    timed("summarize_many()", lambda: summarize_many(responses, horizon=args.hours), args.locations)
+
+    def vectorized():
+        heat_index(batch['temperature_2m'], batch['relativehumidity_2m']).max(axis=1)
+        first_exceedance(batch['precipitation'], RAIN_THRESHOLD_MM)
+        peak_window(batch['windgusts_10m'])
+        np.nanmin(pressure_change(batch['pressure_msl']), axis=1)
+
+    timed("vectorized batch", vectorized, args.locations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+"""
+loadtest.py
+
+Load generator for the Flask app, with the upstream APIs replaced by
+stub_upstreams.py so runs are repeatable and cost nothing.
+
+For each server configuration it starts the stubs and the app, then runs a
+closed-loop concurrency ramp. Each virtual user keeps its own cookie session
+and repeatedly picks a scenario from the mix:
+
+    chat        POST /chat (ISRO question: retrieval + Groq)
+    weather     POST /chat in weather mode (sets a region once per user)
+    region      POST /set_region for one of --regions place names (geocode + forecast)
+    sessions    GET /api/chat_sessions, then one session's messages
+    new_session POST /api/chat_sessions/new
+    pdf         POST /chat asking for a PDF, then GET /download-pdf/<name>
+
+Per stage it reports throughput, latency percentiles and error rate, overall
+and per endpoint. The saturation point is the first stage where adding users
+raises throughput by less than --knee (default 10%) or errors exceed 1%.
+
+Server configurations: waitress:<threads> and gunicorn:<workers>x<threads>,
+for example --servers waitress:8,gunicorn:2x4,gunicorn:4x2. --url targets an
+already running server instead.
+
+Usage: python benchmarks/loadtest.py [--servers waitress:8,gunicorn:2x4] [--stages 1,2,4,8,16,32]
+       [--stage-seconds 30] [--mix chat=35,weather=15,region=15,sessions=15,new_session=5,pdf=15]
+       [--groq-ms 800] [--nominatim-ms 150] [--meteo-ms 200] [--json results.json]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from stub_upstreams import env_urls  # noqa: E402
+
+DEFAULT_MIX = "chat=35,weather=15,region=15,sessions=15,new_session=5,pdf=15"
+ISRO_QUESTIONS = [
+    "What is MOSDAC?",
+    "Which satellites does MOSDAC archive data from?",
+    "How do I download INSAT-3D imagery?",
+    "What ocean products are available from Oceansat-3?",
+    "Explain SCATSAT-1 wind products",
+]
+WEATHER_QUESTIONS = ["Will it rain tomorrow?", "Is it safe to go out this afternoon?", "How windy will it be?"]
+PDF_LINK = re.compile(r'/download-pdf/([^"]+)"')
+REQUEST_TIMEOUT = 120
+
+
+# ---------------- Scenarios ---------------- #
+
+class VirtualUser:
+    def __init__(self, base_url, regions, record, rng):
+        self.base_url = base_url
+        self.http = requests.Session()
+        self.regions = regions
+        self.record = record
+        self.rng = rng
+        self.region_set = False
+
+    def call(self, name, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.http.request(method, self.base_url + path, timeout=REQUEST_TIMEOUT, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        self.record(name, time.perf_counter() - started, ok)
+        return response if ok else None
+
+    def chat(self):
+        self.call("chat", "POST", "/chat", json={"message": self.rng.choice(ISRO_QUESTIONS), "mode": "isro"})
+
+    def region(self):
+        if self.call("set_region", "POST", "/set_region", json={"region": self.rng.choice(self.regions)}):
+            self.region_set = True
+
+    def weather(self):
+        if not self.region_set:
+            self.region()
+        self.call("weather_chat", "POST", "/chat",
+                  json={"message": self.rng.choice(WEATHER_QUESTIONS), "mode": "weather"})
+
+    def sessions(self):
+        response = self.call("list_sessions", "GET", "/api/chat_sessions")
+        if response is not None:
+            ids = [s["id"] for s in response.json()[:20]]
+            if ids:
+                self.call("session_messages", "GET", f"/api/chat_sessions/{self.rng.choice(ids)}/messages")
+
+    def new_session(self):
+        self.call("new_session", "POST", "/api/chat_sessions/new", json={"title": "Load test"})
+
+    def pdf(self):
+        response = self.call("pdf_chat", "POST", "/chat",
+                             json={"message": f"Give me a PDF about {self.rng.choice(ISRO_QUESTIONS)}", "mode": "isro"})
+        if response is not None:
+            match = PDF_LINK.search(response.json().get("response", ""))
+            self.call("download_pdf", "GET", f"/download-pdf/{match.group(1) if match else 'response.pdf'}")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if not hasattr(VirtualUser, name.strip()):
+            raise SystemExit(f"unknown scenario {name!r}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# ---------------- Ramp ---------------- #
+
+class Recorder:
+    def __init__(self):
+        self.samples = []
+        self.lock = threading.Lock()
+
+    def __call__(self, name, seconds, ok):
+        with self.lock:
+            self.samples.append((name, seconds, ok))
+
+    def drain(self):
+        with self.lock:
+            samples, self.samples = self.samples, []
+        return samples
+
+
+def summarize_samples(samples, seconds):
+    def stats(rows):
+        latencies = np.array([s for _, s, _ in rows]) * 1000
+        errors = sum(1 for _, _, ok in rows if not ok)
+        return {
+            "requests": len(rows), "rps": len(rows) / seconds, "error_rate": errors / len(rows),
+            "p50_ms": float(np.percentile(latencies, 50)), "p95_ms": float(np.percentile(latencies, 95)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+        }
+    if not samples:
+        return {"requests": 0, "rps": 0.0, "error_rate": 0.0, "endpoints": {}}
+    by_endpoint = defaultdict(list)
+    for row in samples:
+        by_endpoint[row[0]].append(row)
+    return {**stats(samples), "endpoints": {name: stats(rows) for name, rows in sorted(by_endpoint.items())}}
+
+
+def run_ramp(base_url, stages, stage_seconds, mix, regions, think_ms, seed):
+    recorder = Recorder()
+    stop_all = threading.Event()
+    users = []
+    results = []
+    names, weights = list(mix), list(mix.values())
+
+    def user_loop(user):
+        while not stop_all.is_set():
+            getattr(user, user.rng.choices(names, weights)[0])()
+            if think_ms:
+                time.sleep(user.rng.expovariate(1000 / think_ms))
+
+    try:
+        for concurrency in stages:
+            while len(users) < concurrency:
+                rng = random.Random(seed + len(users))
+                user = VirtualUser(base_url, regions, recorder, rng)
+                thread = threading.Thread(target=user_loop, args=(user,), daemon=True)
+                users.append(thread)
+                thread.start()
+            recorder.drain()
+            time.sleep(stage_seconds)
+            stage = {"concurrency": concurrency, **summarize_samples(recorder.drain(), stage_seconds)}
+            results.append(stage)
+            print(f"  {concurrency:4d} users  {stage['rps']:7.1f} req/s  p50 {stage.get('p50_ms', 0):7.0f} ms  "
+                  f"p95 {stage.get('p95_ms', 0):7.0f} ms  p99 {stage.get('p99_ms', 0):7.0f} ms  "
+                  f"errors {stage['error_rate']:.1%}", flush=True)
+    finally:
+        stop_all.set()
+    return results
+
+
+def saturation(stages, knee=0.10, max_error_rate=0.01):
+    """(stage where throughput stopped scaling or errors appeared, reason), or (None, None)"""
+    previous = None
+    for stage in stages:
+        if stage["error_rate"] > max_error_rate:
+            return stage, f"error rate {stage['error_rate']:.1%}"
+        if previous and stage["rps"] < previous["rps"] * (1 + knee):
+            return stage, f"throughput +{(stage['rps'] / max(previous['rps'], 1e-9) - 1):.0%}"
+        previous = stage
+    return None, None
+
+
+# ---------------- Processes ---------------- #
+
+def server_command(spec, port):
+    kind, _, size = spec.partition(":")
+    if kind == "waitress":
+        return [sys.executable, "-m", "waitress", f"--listen=127.0.0.1:{port}", f"--threads={size or 4}", "app:app"]
+    if kind == "gunicorn":
+        workers, _, threads = (size or "2x4").partition("x")
+        return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-w", workers,
+                "--threads", threads or "1", "-b", f"127.0.0.1:{port}", "app:app"]
+    raise SystemExit(f"unknown server {spec!r}; use waitress:<threads> or gunicorn:<workers>x<threads>")
+
+
+def wait_until_up(url, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with {process.returncode} during start-up")
+        try:
+            if requests.get(url, timeout=2).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def stop(process):
+    if process and process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run_server(spec, args, stub_port, port, workdir):
+    env = {
+        **os.environ, **env_urls("127.0.0.1", stub_port),
+        # Keep the load test's writes away from the real database and caches
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'loadtest.db')}",
+        "GEOCODE_CACHE_PATH": os.path.join(workdir, "geocode_cache.db"),
+        "PREWARM_ENABLED": "0",
+        "CHAT_RETENTION_SCHEDULE": "0",
+    }
+    log = open(os.path.join(workdir, f"{spec.replace(':', '_')}.log"), "w")
+    process = subprocess.Popen(server_command(spec, port), cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        wait_until_up(base_url + "/", process, args.startup_timeout)
+        return run_ramp(base_url, args.stages, args.stage_seconds, args.mix, args.region_names,
+                        args.think_ms, args.seed)
+    finally:
+        stop(process)
+        log.close()
+
+
+def report(spec, stages, knee):
+    stage, reason = saturation(stages, knee)
+    best = max(stages, key=lambda s: s["rps"]) if stages else None
+    print(f"\n{spec}: peak {best['rps']:.1f} req/s at {best['concurrency']} users" if best else f"\n{spec}: no data")
+    if stage:
+        print(f"  saturates at {stage['concurrency']} users ({reason})")
+    else:
+        print(f"  not saturated up to {stages[-1]['concurrency'] if stages else 0} users")
+    if best:
+        print(f"  {'endpoint':<17} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}  (at peak)")
+        for name, e in best["endpoints"].items():
+            print(f"  {name:<17} {e['rps']:7.1f} {e['p50_ms']:8.0f} {e['p95_ms']:8.0f} {e['p99_ms']:8.0f} "
+                  f"{e['error_rate']:7.1%}")
+    return {"server": spec, "stages": stages,
+            "saturation_users": stage["concurrency"] if stage else None, "saturation_reason": reason}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", default="waitress:8,gunicorn:2x4")
+    parser.add_argument("--url", help="Load an already running app instead of starting servers")
+    parser.add_argument("--stages", default="1,2,4,8,16,32", help="Concurrent users per ramp stage")
+    parser.add_argument("--stage-seconds", type=float, default=30)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between a user's requests")
+    parser.add_argument("--regions", type=int, default=200, help="Distinct place names used by set_region")
+    parser.add_argument("--knee", type=float, default=0.10, help="Minimum throughput gain per stage before saturation")
+    parser.add_argument("--groq-ms", type=float, default=800)
+    parser.add_argument("--nominatim-ms", type=float, default=150)
+    parser.add_argument("--meteo-ms", type=float, default=200)
+    parser.add_argument("--jitter", type=float, default=0.25)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--startup-timeout", type=float, default=300, help="Seconds to wait for the app (model load)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write all stage results to this file")
+    args = parser.parse_args()
+    args.stages = [int(s) for s in args.stages.split(",")]
+    args.mix = parse_mix(args.mix)
+    args.region_names = [f"Loadtest Town {i}" for i in range(args.regions)]
+
+    print(f"Upstream latency: groq {args.groq_ms:.0f} ms, nominatim {args.nominatim_ms:.0f} ms, "
+          f"open-meteo {args.meteo_ms:.0f} ms; mix {args.mix}")
+    results = []
+    failed = False
+    workdir = tempfile.mkdtemp(prefix="loadtest_")
+    stubs = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(__file__), "stub_upstreams.py"),
+         "--port", str(args.stub_port), "--groq-ms", str(args.groq_ms), "--nominatim-ms", str(args.nominatim_ms),
+         "--meteo-ms", str(args.meteo_ms), "--jitter", str(args.jitter)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(f"http://127.0.0.1:{args.stub_port}/stats", stubs, 30)
+        if args.url:
+            print("Start the app with these variables to use the stubs: " +
+                  " ".join(f"{k}={v}" for k, v in env_urls("127.0.0.1", args.stub_port).items()))
+        for spec in ([args.url] if args.url else args.servers.split(",")):
+            print(f"\n== {spec} ==", flush=True)
+            try:
+                if args.url:
+                    stages = run_ramp(args.url, args.stages, args.stage_seconds, args.mix, args.region_names,
+                                      args.think_ms, args.seed)
+                else:
+                    stages = run_server(spec, args, args.stub_port, args.port, workdir)
+            except RuntimeError as e:
+                print(f"  {e} (server log in {workdir})")
+                failed = True
+                continue
+            results.append((spec, stages))
+
+        print("\n== Summary ==")
+        summary = [report(spec, stages, args.knee) for spec, stages in results]
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(summary, f, indent=2)
+    finally:
+        stop(stubs)
+        # Keep server logs around when a server failed to start
+        if not failed:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
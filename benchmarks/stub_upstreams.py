@@ -0,0 +1,171 @@
+"""
+stub_upstreams.py
+
+Local stand-ins for the app's upstream APIs, for load testing:
+- Groq chat completions (POST /openai/v1/chat/completions); point the app at it with GROQ_API_BASE
+- Nominatim search (GET /search); NOMINATIM_DOMAIN=host:port NOMINATIM_SCHEME=http
+- Open-Meteo forecast (GET /v1/forecast); OPEN_METEO_URL=http://host:port/v1/forecast
+
+Each has a configurable latency (mean and jitter, in ms). Nominatim resolves
+every place name to a stable coordinate derived from its hash, except names
+containing "nowhere", which are not found. Forecasts contain every hourly and
+daily field the advisory uses, for one or several coordinates.
+
+Usage: python benchmarks/stub_upstreams.py [--port 9100] [--groq-ms 800] [--nominatim-ms 150] [--meteo-ms 200]
+"""
+import argparse
+import asyncio
+import hashlib
+import math
+import random
+import time
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+ANSWER = (
+    "MOSDAC (Meteorological and Oceanographic Satellite Data Archival Centre) is ISRO's "
+    "facility for archiving and disseminating data from meteorological and oceanographic "
+    "satellite missions such as INSAT-3D, INSAT-3DR, Oceansat-2/3 and SCATSAT-1.\n\n"
+    "# Data access\n\nProducts can be searched by mission, sensor and date and downloaded "
+    "after registration. Near real-time products are published within hours of acquisition."
+)
+
+
+def env_urls(host, port):
+    """Environment variables that point the app at these stubs"""
+    return {
+        "GROQ_API_BASE": f"http://{host}:{port}",
+        "GROQ_API_KEY": "gsk_stub",
+        "NOMINATIM_DOMAIN": f"{host}:{port}",
+        "NOMINATIM_SCHEME": "http",
+        "GEOCODE_MIN_DELAY": "0",
+        "OPEN_METEO_URL": f"http://{host}:{port}/v1/forecast",
+    }
+
+
+def place_coords(name):
+    digest = hashlib.blake2b(name.strip().lower().encode("utf-8"), digest_size=8).digest()
+    a, b = int.from_bytes(digest[:4], "big"), int.from_bytes(digest[4:], "big")
+    # Spread over India so forecasts land in different grid cells
+    return 8 + (a / 2 ** 32) * 27, 68 + (b / 2 ** 32) * 29
+
+
+def forecast(lat, lon, hours=168):
+    now = datetime.utcnow()
+    start = now.replace(minute=0, second=0, microsecond=0)
+    times = [(start + timedelta(hours=h)).strftime("%Y-%m-%dT%H:%M") for h in range(hours)]
+    rng = random.Random(f"{lat:.2f},{lon:.2f},{start:%Y%m%d%H}")
+    diurnal = [math.sin(2 * math.pi * (h - 9) / 24) for h in range(hours)]
+    temp = [round(28 + 6 * d + rng.gauss(0, 1), 1) for d in diurnal]
+    days = [(start + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(hours // 24)]
+    return {
+        "latitude": lat, "longitude": lon, "timezone": "Asia/Kolkata",
+        "current_weather": {"temperature": temp[0], "windspeed": round(rng.uniform(2, 25), 1),
+                            "weathercode": rng.choice([0, 1, 2, 3, 61, 80, 95]),
+                            # Open-Meteo reports the current time in 15-minute steps
+                            "time": now.replace(minute=now.minute // 15 * 15).strftime("%Y-%m-%dT%H:%M")},
+        "hourly": {
+            "time": times,
+            "temperature_2m": temp,
+            "apparent_temperature": [t + 2 for t in temp],
+            "relativehumidity_2m": [round(min(100, max(10, 65 - 15 * d + rng.gauss(0, 5)))) for d in diurnal],
+            "precipitation": [round(rng.gammavariate(1.5, 1.5), 1) if rng.random() > 0.85 else 0 for _ in times],
+            "cloudcover": [rng.randint(0, 100) for _ in times],
+            "windspeed_10m": [round(rng.uniform(2, 25), 1) for _ in times],
+            "windgusts_10m": [round(abs(rng.gauss(25, 10)), 1) for _ in times],
+            "weathercode": [rng.choice([0, 1, 2, 3, 61, 80]) for _ in times],
+            "visibility": [rng.randint(2000, 24000) for _ in times],
+            "shortwave_radiation": [max(0, round(800 * d)) for d in diurnal],
+            "pressure_msl": [round(1008 + rng.gauss(0, 1.5), 1) for _ in times],
+        },
+        "daily": {
+            "time": days,
+            "temperature_2m_max": [max(temp[i * 24:(i + 1) * 24]) for i in range(len(days))],
+            "temperature_2m_min": [min(temp[i * 24:(i + 1) * 24]) for i in range(len(days))],
+            "precipitation_sum": [round(rng.uniform(0, 20), 1) for _ in days],
+            "windspeed_10m_max": [round(rng.uniform(10, 40), 1) for _ in days],
+            "windgusts_10m_max": [round(rng.uniform(20, 70), 1) for _ in days],
+            "sunrise": [f"{d}T06:05" for d in days],
+            "sunset": [f"{d}T18:20" for d in days],
+        },
+    }
+
+
+def make_app(groq_ms=800, nominatim_ms=150, meteo_ms=200, jitter=0.25, error_rate=0.0, seed=0):
+    rng = random.Random(seed)
+    stats = {"groq": 0, "nominatim": 0, "meteo": 0, "errors": 0}
+
+    async def delay(mean_ms):
+        if mean_ms:
+            await asyncio.sleep(max(0.0, rng.gauss(mean_ms, mean_ms * jitter)) / 1000)
+
+    def failed():
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return True
+        return False
+
+    async def chat_completions(request):
+        stats["groq"] += 1
+        body = await request.json()
+        await delay(groq_ms)
+        if failed():
+            return web.json_response({"error": {"message": "stub overloaded"}}, status=503)
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        return web.json_response({
+            "id": f"chatcmpl-stub-{stats['groq']}", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "llama-3.1-8b-instant"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": ANSWER}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(ANSWER.split()),
+                      "total_tokens": prompt_tokens + len(ANSWER.split())},
+        })
+
+    async def search(request):
+        stats["nominatim"] += 1
+        query = request.query.get("q", "")
+        await delay(nominatim_ms)
+        if failed():
+            return web.Response(status=503)
+        if "nowhere" in query.lower():
+            return web.json_response([])
+        lat, lon = place_coords(query)
+        return web.json_response([{"place_id": stats["nominatim"], "lat": f"{lat:.6f}", "lon": f"{lon:.6f}",
+                                   "display_name": f"{query}, India", "importance": 0.5}])
+
+    async def meteo(request):
+        stats["meteo"] += 1
+        lats = [float(v) for v in request.query["latitude"].split(",")]
+        lons = [float(v) for v in request.query["longitude"].split(",")]
+        await delay(meteo_ms)
+        if failed():
+            return web.json_response({"error": True, "reason": "stub overloaded"}, status=503)
+        data = [forecast(lat, lon) for lat, lon in zip(lats, lons)]
+        return web.json_response(data[0] if len(data) == 1 else data)
+
+    async def status(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post("/openai/v1/chat/completions", chat_completions)
+    app.router.add_get("/search", search)
+    app.router.add_get("/v1/forecast", meteo)
+    app.router.add_get("/stats", status)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--groq-ms", type=float, default=800, help="Mean chat completion latency")
+    parser.add_argument("--nominatim-ms", type=float, default=150, help="Mean geocoding latency")
+    parser.add_argument("--meteo-ms", type=float, default=200, help="Mean forecast latency")
+    parser.add_argument("--jitter", type=float, default=0.25, help="Latency standard deviation as a share of the mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of upstream calls answered 503")
+    args = parser.parse_args()
+    for key, value in env_urls(args.host, args.port).items():
+        print(f"{key}={value}")
+    web.run_app(make_app(args.groq_ms, args.nominatim_ms, args.meteo_ms, args.jitter, args.error_rate),
+                host=args.host, port=args.port, print=None, access_log=None)
@@ -0,0 +1,275 @@
+"""
+chat_transfer.py
+
+Streaming NDJSON export/import of chat sessions and messages.
+
+Each line is one JSON object with a "type" of "session" or "message".
+Sessions are emitted in id order and each session is followed by its
+messages. A session is only complete once the next session line (or the end
+of the stream) has been seen, so to resume an interrupted export pass the id
+of the last *completed* session, i.e. the session line before the last one
+received, as after_id. Re-exporting that partial session is harmless:
+import_lines skips rows that already exist unchanged.
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from models import db, ChatSession, ChatMessage
+
+EXPORT_BATCH_SIZE = 200
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+
+def parse_datetime(value):
+    """Parse an ISO date/datetime string, returning None for empty values"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def session_to_record(s):
+    return {
+        'type': 'session',
+        'id': s.id,
+        'title': s.title,
+        'created_at': s.created_at.isoformat() if s.created_at else None,
+        'updated_at': s.updated_at.isoformat() if s.updated_at else None,
+    }
+
+
+def message_to_record(m):
+    return {
+        'type': 'message',
+        'id': m.id,
+        'session_id': m.session_id,
+        'role': m.role,
+        'content': m.content,
+        'timestamp': m.timestamp.isoformat() if m.timestamp else None,
+        'mode': m.mode,
+    }
+
+
+def iter_export_records(after_id=None, since=None, until=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield session/message records in constant memory.
+
+    Sessions are paged by primary key (keyset pagination), filtered on
+    updated_at when since/until are given. Messages are streamed per page
+    of sessions with yield_per so no session is ever fully materialized.
+    """
+    cursor = after_id or 0
+    while True:
+        stmt = select(ChatSession).where(ChatSession.id > cursor)
+        if since:
+            stmt = stmt.where(ChatSession.updated_at >= since)
+        if until:
+            stmt = stmt.where(ChatSession.updated_at < until)
+        stmt = stmt.order_by(ChatSession.id).limit(batch_size)
+        sessions = db.session.execute(stmt).scalars().all()
+        if not sessions:
+            break
+
+        records = {s.id: session_to_record(s) for s in sessions}
+        ids = list(records)
+        db.session.expunge_all()
+
+        msg_stmt = (
+            select(ChatMessage)
+            .where(ChatMessage.session_id.in_(ids))
+            .order_by(ChatMessage.session_id, ChatMessage.id)
+            .execution_options(yield_per=1000)
+        )
+        pending = list(ids)
+        for m in db.session.execute(msg_stmt).scalars():
+            # Emit every session header up to and including this message's session
+            while pending and pending[0] <= m.session_id:
+                yield records.pop(pending.pop(0))
+            yield message_to_record(m)
+        for sid in pending:
+            yield records[sid]
+        db.session.expunge_all()
+
+        cursor = ids[-1]
+
+
+def iter_export_lines(**kwargs):
+    for record in iter_export_records(**kwargs):
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def _require_id(value, name):
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f'{name} must be an integer')
+    return value
+
+
+def _require_text(value, name, max_length=None):
+    if not isinstance(value, str) or not value:
+        raise ValueError(f'{name} is required')
+    if max_length and len(value) > max_length:
+        raise ValueError(f'{name} is longer than {max_length} characters')
+    return value
+
+
+def session_from_record(record):
+    """Validated ChatSession row from an export record; raises ValueError"""
+    return {
+        'id': _require_id(record.get('id'), 'id'),
+        'title': _require_text(record.get('title'), 'title', ChatSession.title.type.length),
+        'created_at': parse_datetime(record.get('created_at')),
+        'updated_at': parse_datetime(record.get('updated_at')),
+    }
+
+
+def message_from_record(record):
+    """Validated ChatMessage row from an export record; raises ValueError"""
+    mode = record.get('mode')
+    if mode is not None:
+        _require_text(mode, 'mode', ChatMessage.mode.type.length)
+    return {
+        'id': _require_id(record.get('id'), 'id'),
+        'session_id': _require_id(record.get('session_id'), 'session_id'),
+        'role': _require_text(record.get('role'), 'role', ChatMessage.role.type.length),
+        'content': _require_text(record.get('content'), 'content'),
+        'timestamp': parse_datetime(record.get('timestamp')),
+        'mode': mode,
+    }
+
+
+def import_lines(lines, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Bulk insert sessions and messages from NDJSON lines in one transaction.
+
+    Each record is validated before anything is written; invalid lines, and
+    messages whose session was invalid or does not exist, are counted in
+    'errors' with their line numbers in 'error_lines'. Original ids are
+    preserved. A row whose id is taken by an identical row is skipped, so
+    importing an overlapping export twice is harmless; a row whose id is
+    taken by a different row is inserted under a new id, with its messages
+    following it, and 'session_ids' maps each remapped session id to its new
+    one. Nothing is committed unless the whole stream imports.
+    Returns a dict of counts.
+    """
+    stats = {'sessions': 0, 'messages': 0, 'skipped': 0, 'remapped': 0, 'errors': 0,
+             'error_lines': [], 'session_ids': {}}
+    session_ids = stats['session_ids']
+    rejected_sessions = set()
+    sessions, messages = [], []
+
+    def error(line_no, reason):
+        stats['errors'] += 1
+        if len(stats['error_lines']) < MAX_REPORTED_ERRORS:
+            stats['error_lines'].append({'line': line_no, 'error': reason})
+
+    def flush_sessions():
+        existing = {
+            row.id: (row.title, row.created_at)
+            for row in db.session.execute(
+                select(ChatSession.id, ChatSession.title, ChatSession.created_at)
+                .where(ChatSession.id.in_([r['id'] for _, r in sessions]))
+            )
+        }
+        rows, moved = [], []
+        for _, r in sessions:
+            current = existing.get(r['id'])
+            if current is None:
+                existing[r['id']] = (r['title'], r['created_at'])
+                rows.append(r)
+            elif current[0] == r['title'] and r['created_at'] in (None, current[1]):
+                # A record without created_at got the column default when inserted
+                stats['skipped'] += 1
+            else:
+                moved.append(r)
+        if rows:
+            db.session.execute(insert(ChatSession), rows)
+        # After the rows keeping their ids, so a new id never takes one of theirs
+        for r in moved:
+            old_id = r.pop('id')
+            session_ids[old_id] = db.session.execute(insert(ChatSession).values(**r)).inserted_primary_key[0]
+        stats['sessions'] += len(rows) + len(moved)
+        stats['remapped'] += len(moved)
+        sessions.clear()
+
+    def flush_messages():
+        for _, r in messages:
+            r['session_id'] = session_ids.get(r['session_id'], r['session_id'])
+        known = set(db.session.execute(
+            select(ChatSession.id).where(ChatSession.id.in_({r['session_id'] for _, r in messages}))
+        ).scalars())
+        existing = {
+            row.id: tuple(row[1:])
+            for row in db.session.execute(
+                select(ChatMessage.id, ChatMessage.session_id, ChatMessage.role,
+                       ChatMessage.content, ChatMessage.timestamp)
+                .where(ChatMessage.id.in_([r['id'] for _, r in messages]))
+            )
+        }
+        rows, moved = [], []
+        for line_no, r in messages:
+            if r['session_id'] not in known:
+                error(line_no, f"session {r['session_id']} does not exist")
+                continue
+            key = (r['session_id'], r['role'], r['content'])
+            current = existing.get(r['id'])
+            if current is None:
+                existing[r['id']] = key + (r['timestamp'],)
+                rows.append(r)
+            elif current[:3] == key and r['timestamp'] in (None, current[3]):
+                stats['skipped'] += 1
+            else:
+                moved.append({k: v for k, v in r.items() if k != 'id'})
+        if rows:
+            db.session.execute(insert(ChatMessage), rows)
+        if moved:
+            db.session.execute(insert(ChatMessage), moved)
+        stats['messages'] += len(rows) + len(moved)
+        stats['remapped'] += len(moved)
+        messages.clear()
+
+    def flush():
+        # Sessions first: messages always follow their session in the stream
+        if sessions:
+            flush_sessions()
+        if messages:
+            flush_messages()
+
+    try:
+        for line_no, line in enumerate(lines, 1):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            line = line.strip()
+            if not line:
+                continue
+            record = None
+            try:
+                record = json.loads(line)
+                kind = record.get('type')
+                if kind == 'session':
+                    sessions.append((line_no, session_from_record(record)))
+                elif kind == 'message':
+                    row = message_from_record(record)
+                    if row['session_id'] in rejected_sessions:
+                        raise ValueError(f"session {row['session_id']} was rejected")
+                    messages.append((line_no, row))
+                else:
+                    raise ValueError(f'unknown record type {kind!r}')
+            except (ValueError, TypeError, AttributeError) as e:
+                if isinstance(record, dict) and record.get('type') == 'session':
+                    rejected_sessions.add(record.get('id'))
+                error(line_no, str(e))
+                continue
+
+            if len(sessions) + len(messages) >= batch_size:
+                flush()
+
+        flush()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return stats
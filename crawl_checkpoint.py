@@ -0,0 +1,196 @@
+"""
+crawl_checkpoint.py
+
+Streaming crawl output and resumable checkpoints.
+
+Nodes are appended to an NDJSON file (gzip-compressed when the path ends in
+.gz) as soon as each page completes, so memory no longer grows with the site
+and a crash loses at most the pages since the last checkpoint. Checkpoints
+hold the pending frontier and the visited set's dump (with a DigestLog, just
+the log's flushed length) and are written atomically.
+ndjson_to_legacy() rebuilds the old output/output.json layout.
+
+A resumed crawl must not append to whatever the crash left behind. Plain
+NDJSON is truncated to the byte offset flushed at the last checkpoint. A
+gzip member cannot be continued after a crash, so the resumed crawl writes a
+new segment file (nodes-1.ndjson.gz, nodes-2.ndjson.gz, ...) and readers
+chain the segments, stopping at the unterminated end of each.
+"""
+import gzip
+import json
+import os
+import zlib
+from pathlib import Path
+
+
+def _is_gzip(path):
+    return Path(path).suffix == ".gz"
+
+
+def segment_path(path, n):
+    """Path of segment n of a node file; segment 0 is the path itself"""
+    path = Path(path)
+    if n == 0:
+        return path
+    stem, dot, suffixes = path.name.partition(".")
+    return path.with_name(f"{stem}-{n}{dot}{suffixes}")
+
+
+def segment_paths(path):
+    """Existing segments of a node file, in write order"""
+    paths = []
+    n = 0
+    while segment_path(path, n).exists():
+        paths.append(segment_path(path, n))
+        n += 1
+    return paths
+
+
+def _last_line_end(f):
+    """Offset just past the last newline of a binary file (checkpoints without nodes_offset)"""
+    end = f.seek(0, os.SEEK_END)
+    while end > 0:
+        start = max(0, end - 65536)
+        f.seek(start)
+        block = f.read(end - start)
+        i = block.rfind(b"\n")
+        if i >= 0:
+            return start + i + 1
+        end = start
+    return 0
+
+
+class NodeWriter:
+    def __init__(self, path, resume=None):
+        """
+        Write nodes to path, or continue after a crash when resume is the
+        checkpoint's {"nodes_segment": ..., "nodes_offset": ...}.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.count = 0
+        if resume is None:
+            # A fresh crawl replaces every segment of the previous one
+            for old in segment_paths(self.path)[1:]:
+                old.unlink()
+            self.segment = self.path
+            self._f = gzip.open(self.path, "wb") if _is_gzip(self.path) else open(self.path, "wb")
+        elif _is_gzip(self.path):
+            self.segment = segment_path(self.path, len(segment_paths(self.path)))
+            self._f = gzip.open(self.segment, "wb")
+        else:
+            self.segment = Path(resume.get("nodes_segment", self.path))
+            self._f = open(self.segment, "r+b" if self.segment.exists() else "wb")
+            # Drop anything written after the last checkpoint, including a torn line
+            offset = resume.get("nodes_offset")
+            self._f.truncate(_last_line_end(self._f) if offset is None else offset)
+            self._f.seek(0, os.SEEK_END)
+
+    def write(self, node):
+        self._f.write((json.dumps(node, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.count += 1
+
+    def flush(self):
+        """Flush to disk; returns the byte offset of the flushed end of the current segment"""
+        self._f.flush()
+        # gzip streams expose fileno() of the underlying file
+        try:
+            os.fsync(self._f.fileno())
+        except (AttributeError, OSError, ValueError):
+            pass
+        return None if _is_gzip(self.segment) else self._f.tell()
+
+    def close(self):
+        self.flush()
+        self._f.close()
+
+
+class Checkpoint:
+    def __init__(self, path, writer=None, every=50):
+        self.path = Path(path)
+        self.writer = writer
+        self.every = every
+
+    def load(self):
+        """Saved crawl state dict, or None if there is no checkpoint"""
+        if not self.path.exists():
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, frontier, visited, **extra):
+        """
+        Write the checkpoint. visited is a visited set's dump() dict, stored
+        as-is; a plain iterable of URLs is stored as the legacy URL list.
+        """
+        # Make sure every node the checkpoint counts as done is on disk first
+        offset = self.writer.flush() if self.writer else None
+        visited = visited if isinstance(visited, dict) else list(visited)
+        data = {"frontier": list(frontier), "visited": visited, **extra}
+        if self.writer:
+            data["nodes_path"] = str(self.writer.path)
+            data["nodes_segment"] = str(self.writer.segment)
+            data["nodes_offset"] = offset
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if self.path.exists():
+            self.path.unlink()
+
+
+def _segment_lines(path):
+    if not _is_gzip(path):
+        with open(path, "rb") as f:
+            yield from f
+        return
+    with gzip.open(path, "rb") as f:
+        try:
+            yield from f
+        except (EOFError, zlib.error, gzip.BadGzipFile):
+            # Member left unterminated by a crash; everything flushed before it was read
+            return
+
+
+def iter_nodes(path):
+    """Nodes from every segment of a node file, skipping a line torn by a crash"""
+    for segment in segment_paths(path):
+        for line in _segment_lines(segment):
+            if not line.endswith(b"\n"):
+                break
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def ndjson_to_legacy(ndjson_path, output_path, base_url):
+    """
+    Write the legacy {"url": ..., "children": [...]} output.json from NDJSON.
+
+    Pages re-fetched after a resume appear twice in the NDJSON; only the
+    last copy of each URL is kept. Nodes are streamed in two passes so only
+    the URL index is held in memory.
+    """
+    last_seen = {}
+    for i, node in enumerate(iter_nodes(ndjson_path)):
+        last_seen[node.get("url")] = i
+
+    tmp = Path(str(output_path) + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as out:
+        out.write("{\n")
+        out.write(f'  "url": {json.dumps(base_url)},\n')
+        out.write('  "children": [')
+        first = True
+        for i, node in enumerate(iter_nodes(ndjson_path)):
+            if last_seen.get(node.get("url")) != i:
+                continue
+            body = json.dumps(node, ensure_ascii=False, indent=2).replace("\n", "\n    ")
+            out.write(("\n    " if first else ",\n    ") + body)
+            first = False
+        out.write("]\n}" if first else "\n  ]\n}")
+    os.replace(tmp, output_path)
+    return len(last_seen)
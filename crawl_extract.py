@@ -0,0 +1,187 @@
+"""
+crawl_extract.py
+
+Text extractors for downloaded media and the registry that dispatches to them.
+
+Each extractor is registered with the content types and file extensions it
+handles and a timeout. The crawler streams matching responses to disk and
+runs the extractor on its parse pool; responses no extractor handles are
+not downloaded at all. The pool worker runs each extractor in a child
+process (`python crawl_extract.py <name> <path> <out>`) and kills it at the
+timeout, so a hung extractor never keeps a pool worker busy. Each extractor
+imports its library when it runs, so a child only loads what its document
+needs instead of paying for every library on startup.
+"""
+import hashlib
+import mimetypes
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class MediaFile:
+    """A response body streamed to disk"""
+    path: Path
+    content_type: str
+    size: int
+    digest: str
+
+
+@dataclass
+class Extractor:
+    name: str
+    fn: callable
+    content_types: tuple
+    extensions: tuple
+    timeout: float
+
+
+EXTRACTORS = []
+
+
+def register_extractor(name, content_types=(), extensions=(), timeout=60):
+    """Decorator adding fn(path) -> text to the dispatch table"""
+    def decorator(fn):
+        EXTRACTORS.append(Extractor(name, fn, tuple(content_types), tuple(extensions), timeout))
+        return fn
+    return decorator
+
+
+def find_extractor(content_type, url_or_path=""):
+    """First extractor matching the content type, falling back to the file extension"""
+    mime = (content_type or "").split(";")[0].strip().lower()
+    for extractor in EXTRACTORS:
+        if any(mime == ct or (ct.endswith("/") and mime.startswith(ct)) for ct in extractor.content_types):
+            return extractor
+    suffix = Path(str(url_or_path).split("?")[0]).suffix.lower()
+    for extractor in EXTRACTORS:
+        if suffix and suffix in extractor.extensions:
+            return extractor
+    return None
+
+
+def media_path(media_dir, url, ct):
+    ext = mimetypes.guess_extension((ct or "").split(";")[0]) or ".bin"
+    name = url.rstrip("/").split("/")[-1].split("?")[0] or "file" + ext
+    # Keep files from different URLs with the same basename apart
+    tag = hashlib.blake2b(url.encode("utf-8"), digest_size=4).hexdigest()
+    stem, suffix = Path(name).stem, Path(name).suffix or ext
+    return Path(media_dir) / f"{stem}_{tag}{suffix}"
+
+
+async def stream_to_file(resp, path, max_bytes):
+    """
+    Write an aiohttp response body to path in chunks, hashing as it goes.
+    Returns a MediaFile, or None if the body exceeds max_bytes.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".part")
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp, "wb") as f:
+            async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    return None
+                sha.update(chunk)
+                f.write(chunk)
+        tmp.replace(path)
+        return MediaFile(path, resp.headers.get("content-type", ""), size, sha.hexdigest())
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def extract(name, path):
+    """Look up an extractor by name and run it in this process"""
+    for extractor in EXTRACTORS:
+        if extractor.name == name:
+            return extractor.fn(Path(path))
+    raise KeyError(name)
+
+
+def run_extractor(name, path, timeout=None):
+    """
+    Run an extractor in a child process; used as the pool entry point.
+    Raises subprocess.TimeoutExpired (after killing the child) past timeout seconds.
+    """
+    # Text goes through a file: libraries may print to stdout on import
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / "text.txt"
+        proc = subprocess.run([sys.executable, __file__, name, str(path), str(out)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout)
+        if proc.returncode != 0:
+            lines = proc.stderr.decode("utf-8", "replace").strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f"{name} extractor exited with {proc.returncode}")
+        return out.read_text(encoding="utf-8")
+
+
+# ---------------- Extractors ---------------- #
+
+@register_extractor("pdf", ["application/pdf"], [".pdf"], timeout=120)
+def pdf_to_text(path):
+    import fitz  # PyMuPDF
+
+    text = ""
+    with fitz.open(path) as doc:
+        for page in doc:
+            text += page.get_text()
+    return text.strip()
+
+
+@register_extractor(
+    "docx",
+    ["application/vnd.openxmlformats-officedocument.wordprocessingml.document"],
+    [".docx"],
+    timeout=60,
+)
+def docx_to_text(path):
+    from docx import Document
+
+    doc = Document(path)
+    return "\n".join([p.text for p in doc.paragraphs])
+
+
+@register_extractor(
+    "table",
+    ["text/csv", "application/vnd.ms-excel",
+     "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"],
+    [".csv", ".xls", ".xlsx"],
+    timeout=120,
+)
+def csv_xlsx_to_text(path):
+    import pandas as pd
+
+    path = Path(path)
+    try:
+        df = pd.read_excel(path) if path.suffix in [".xlsx", ".xls"] else pd.read_csv(path)
+        return df.to_string()
+    except Exception as e:
+        return f"[ERROR READING TABLE] {e}"
+
+
+@register_extractor("audio", ["audio/"], [".wav", ".mp3", ".m4a", ".ogg", ".flac"], timeout=300)
+def audio_to_text(path):
+    import speech_recognition as sr
+
+    path = Path(path)
+    recognizer = sr.Recognizer()
+    with tempfile.NamedTemporaryFile(suffix=".wav") as tmp:
+        if path.suffix != ".wav":
+            subprocess.run(["ffmpeg", "-y", "-i", str(path), str(tmp.name)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=240)
+            audio_path = tmp.name
+        else:
+            audio_path = str(path)
+        with sr.AudioFile(audio_path) as source:
+            audio = recognizer.record(source)
+            return recognizer.recognize_google(audio, language="en-IN")
+
+
+if __name__ == "__main__":
+    Path(sys.argv[3]).write_text(extract(sys.argv[1], sys.argv[2]) or "", encoding="utf-8")
@@ -0,0 +1,191 @@
+"""
+crawl_scheduler.py
+
+Per-host politeness and adaptive concurrency for the crawler.
+
+Every request to a host goes through that host's HostPolicy:
+- robots.txt rules and Crawl-delay are honoured
+- a token bucket caps the request rate (Crawl-delay lowers it further)
+- an AIMD limiter adapts the number of in-flight requests: it grows by one
+  after a window of fast successes and halves on errors, throttling or
+  latency above the target
+- transient failures (network errors, 429, 5xx) are retried with
+  exponential backoff and jitter, honouring Retry-After
+"""
+import asyncio
+import random
+import time
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import aiohttp
+
+USER_AGENT = "AstroBotCrawler/1.0 (+https://www.mosdac.gov.in)"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def make_connector(limit=32, limit_per_host=16):
+    """Pooled keep-alive connector sized for the crawler's maximum concurrency"""
+    return aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host,
+                                keepalive_timeout=30, ttl_dns_cache=300)
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AdaptiveLimiter:
+    """Additive-increase / multiplicative-decrease cap on in-flight requests"""
+
+    def __init__(self, initial, minimum, maximum, target_latency):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._successes = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self, latency=None, ok=True):
+        async with self._cond:
+            self.in_flight -= 1
+            if not ok or (latency is not None and latency > self.target_latency):
+                self.limit = max(self.minimum, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.limit:
+                    self.limit = min(self.maximum, self.limit + 1)
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+class HostPolicy:
+    def __init__(self, rate, burst, limiter):
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = limiter
+        self.robots = None
+        self.robots_lock = asyncio.Lock()
+
+
+class CrawlScheduler:
+    def __init__(self, fetch_fn, rate=5.0, burst=5, initial_concurrency=4, min_concurrency=1,
+                 max_concurrency=16, target_latency=5.0, max_retries=3, backoff_base=1.0,
+                 respect_robots=True):
+        """
+        fetch_fn(session, url, headers, on_headers=None) -> (content, content_type, status, headers,
+        response_url),
+        with status None on network errors. fetch_fn calls on_headers() when the
+        response headers arrive, so latency excludes body download time.
+        """
+        self.fetch_fn = fetch_fn
+        self.rate = rate
+        self.burst = burst
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.respect_robots = respect_robots
+        self.hosts = {}
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "robots_blocked": 0}
+
+    def _policy(self, host):
+        policy = self.hosts.get(host)
+        if policy is None:
+            limiter = AdaptiveLimiter(self.initial_concurrency, self.min_concurrency,
+                                      self.max_concurrency, self.target_latency)
+            policy = self.hosts[host] = HostPolicy(self.rate, self.burst, limiter)
+        return policy
+
+    async def _load_robots(self, session, parsed, policy):
+        async with policy.robots_lock:
+            if policy.robots is not None:
+                return policy.robots
+            robots = RobotFileParser()
+            try:
+                async with session.get(f"{parsed.scheme}://{parsed.netloc}/robots.txt", timeout=15,
+                                       headers={"User-Agent": USER_AGENT}) as resp:
+                    if resp.status == 200:
+                        robots.parse((await resp.text(errors="ignore")).splitlines())
+                    else:
+                        robots.parse([])
+            except Exception:
+                robots.parse([])
+            delay = robots.crawl_delay(USER_AGENT)
+            if delay:
+                policy.bucket.rate = min(policy.bucket.rate, 1.0 / float(delay))
+                policy.bucket.capacity = 1
+                policy.bucket.tokens = min(policy.bucket.tokens, 1)
+            policy.robots = robots
+            return robots
+
+    async def fetch(self, session, url, headers=None):
+        """Polite fetch with retries; returns the fetch_fn tuple, or all None if disallowed"""
+        parsed = urlparse(url)
+        policy = self._policy(parsed.netloc)
+        if self.respect_robots:
+            robots = await self._load_robots(session, parsed, policy)
+            if not robots.can_fetch(USER_AGENT, url):
+                self.stats["robots_blocked"] += 1
+                return None, None, None, None, None
+
+        headers = {"User-Agent": USER_AGENT, **(headers or {})}
+        for attempt in range(self.max_retries + 1):
+            await policy.bucket.acquire()
+            await policy.limiter.acquire()
+            started = time.monotonic()
+            headers_at = []
+            result = None
+            try:
+                self.stats["requests"] += 1
+                result = await self.fetch_fn(session, url, headers,
+                                             on_headers=lambda: headers_at.append(time.monotonic()))
+            finally:
+                status = result[2] if result else None
+                transient = status is None or status in RETRY_STATUSES
+                # Time to first byte: a large body is not a sign of an overloaded server
+                latency = (headers_at[0] if headers_at else time.monotonic()) - started
+                await policy.limiter.release(latency, ok=not transient)
+
+            if not transient:
+                return result
+            if attempt == self.max_retries:
+                break
+            self.stats["retries"] += 1
+            delay = self.backoff_base * (2 ** attempt) * random.uniform(0.5, 1.5)
+            retry_after = (result[3] or {}).get("Retry-After") if result else None
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            await asyncio.sleep(delay)
+
+        self.stats["failures"] += 1
+        return result
+
+    def report(self):
+        limits = ", ".join(f"{host}: {p.limiter.limit}" for host, p in self.hosts.items())
+        return (f"[SCHEDULER] requests={self.stats['requests']} retries={self.stats['retries']} "
+                f"failures={self.stats['failures']} robots_blocked={self.stats['robots_blocked']} "
+                f"concurrency limit [{limits}]")
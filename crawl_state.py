@@ -0,0 +1,129 @@
+"""
+crawl_state.py
+
+Per-URL state for incremental crawls.
+
+Stores the validators (ETag, Last-Modified), a SHA-256 of the body, the
+outgoing links and the extracted node of every page seen, so the next run
+can send conditional requests, skip unchanged pages while still following
+their links, and report what changed.
+"""
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+class CrawlStateStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT, "
+            "links TEXT, node BLOB, fetched_at REAL, seen_run INTEGER)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, started_at REAL, finished_at REAL)")
+        self.conn.commit()
+        self.run_id = None
+        self.changes = {"new": [], "changed": [], "removed": [], "unchanged": 0}
+
+    def begin_run(self, run_id=None):
+        """Start a run, or continue run_id when resuming an interrupted crawl"""
+        if run_id is None:
+            cur = self.conn.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),))
+            self.conn.commit()
+            run_id = cur.lastrowid
+        self.run_id = run_id
+        return self.run_id
+
+    def get(self, url):
+        row = self.conn.execute(
+            "SELECT etag, last_modified, content_hash, links, node FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "content_hash": row[2],
+            "links": json.loads(row[3]) if row[3] else [],
+            "node": json.loads(zlib.decompress(row[4])) if row[4] else None,
+        }
+
+    def conditional_headers(self, url):
+        """If-None-Match / If-Modified-Since headers for a previously seen URL"""
+        row = self.conn.execute("SELECT etag, last_modified FROM pages WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if row:
+            if row[0]:
+                headers["If-None-Match"] = row[0]
+            if row[1]:
+                headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def mark_seen(self, url):
+        """Keep a page this run without counting it (e.g. its fetch failed)"""
+        self.conn.execute("UPDATE pages SET seen_run = ? WHERE url = ?", (self.run_id, url))
+
+    def mark_unchanged(self, url):
+        self.mark_seen(url)
+        self.changes["unchanged"] += 1
+
+    def record(self, url, digest, node, links, etag=None, last_modified=None):
+        """
+        Store a fetched page. Returns "new", "changed" or "unchanged" (same
+        content hash as last run, e.g. a server without validators).
+        """
+        row = self.conn.execute("SELECT content_hash FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            status = "new"
+        elif row[0] != digest:
+            status = "changed"
+        else:
+            status = "unchanged"
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages (url, etag, last_modified, content_hash, links, node, fetched_at, seen_run) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, etag, last_modified, digest, json.dumps(links),
+             zlib.compress(json.dumps(node, ensure_ascii=False).encode("utf-8")), time.time(), self.run_id)
+        )
+        if status == "unchanged":
+            self.changes["unchanged"] += 1
+        else:
+            self.changes[status].append(url)
+        return status
+
+    def finish_run(self, complete=True):
+        """
+        Close the run. Pages not seen are reported as removed and dropped,
+        but only when the crawl covered the whole frontier (complete=True);
+        a capped crawl cannot tell unvisited pages from deleted ones. The
+        crawler marks pages whose fetch failed as seen, so only pages that
+        answered 404/410 or are no longer linked count as removed.
+        """
+        if complete:
+            removed = [r[0] for r in self.conn.execute(
+                "SELECT url FROM pages WHERE seen_run IS NOT ? ", (self.run_id,)
+            )]
+            self.conn.executemany("DELETE FROM pages WHERE url = ?", [(u,) for u in removed])
+            self.changes["removed"] = removed
+        self.conn.execute("UPDATE runs SET finished_at = ? WHERE id = ?", (time.time(), self.run_id))
+        self.conn.commit()
+        return self.changes
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
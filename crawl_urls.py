@@ -0,0 +1,241 @@
+"""
+crawl_urls.py
+
+URL canonicalization and compact visited-set structures for the crawler.
+
+canonicalize_url() maps the variants of one page (fragments, default ports,
+trailing slashes, query parameter order, tracking/session parameters) to a
+single URL so each page is fetched once.
+
+Visited sets never store URL strings:
+- HashedVisitedSet keeps a 64-bit BLAKE2b digest per URL (exact in practice;
+  collision probability is ~n^2 / 2^65)
+- BloomVisitedSet keeps a fixed-size Bloom filter sized from a capacity and
+  false-positive rate, and confirms positives against an on-disk SQLite
+  table of digests so false positives never drop a page
+
+With a DigestLog attached, every digest added is also appended to a file,
+so a checkpoint only records how far the log had been flushed instead of
+re-serializing the whole set; resuming replays the log up to that point.
+"""
+import base64
+import hashlib
+import math
+import os
+import posixpath
+import sqlite3
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Only parameters that never select content; generic names such as "sid" or
+# "ref" often do (a station id, a git ref) and must be added with --drop-param
+DEFAULT_DROP_PARAMS = frozenset({
+    "fbclid", "gclid", "msclkid", "phpsessid", "jsessionid", "sessionid",
+})
+DROP_PARAM_PREFIXES = ("utm_",)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url, drop_params=DEFAULT_DROP_PARAMS, keep_trailing_slash=False):
+    """Normalize a URL so equivalent variants compare equal"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+
+    path = parts.path or "/"
+    # Resolve "." and ".." segments and duplicate slashes
+    trailing = path.endswith("/")
+    path = posixpath.normpath(path)
+    if path.startswith("//"):
+        path = "/" + path.lstrip("/")
+    if trailing and keep_trailing_slash and path != "/":
+        path += "/"
+
+    params = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in drop_params and not k.lower().startswith(DROP_PARAM_PREFIXES)
+    ]
+    query = urlencode(sorted(params))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def url_digest(url):
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class DigestLog:
+    """Append-only file of the 64-bit digests added to a visited set"""
+
+    def __init__(self, path, length=None):
+        """Start a new log at path, or reopen it truncated to a checkpointed length"""
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if length is None:
+            self._f = open(self.path, "wb")
+        else:
+            # Never recreate the log on resume: a missing or short log means the checkpoint is unusable
+            self._f = open(self.path, "r+b")
+            if self._f.seek(0, os.SEEK_END) < length:
+                self._f.close()
+                raise ValueError(f"{self.path} is shorter than the checkpoint's {length} bytes")
+            # Digests added after the checkpoint belong to pages missing from its frontier
+            self._f.truncate(length)
+            self._f.seek(0, os.SEEK_END)
+
+    def append(self, digest):
+        self._f.write(digest.to_bytes(8, "big"))
+
+    def flush(self):
+        """Flush to disk; returns the log length a checkpoint can resume from"""
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        return self._f.tell()
+
+    def digests(self):
+        """Every digest in the log, in the order they were added"""
+        self._f.flush()
+        with open(self.path, "rb") as f:
+            data = f.read()
+        for i in range(0, len(data) - 7, 8):
+            yield int.from_bytes(data[i:i + 8], "big")
+
+    def close(self):
+        self._f.close()
+
+
+class HashedVisitedSet:
+    def __init__(self, log=None):
+        self._digests = set()
+        self.log = log
+
+    def add(self, url):
+        digest = url_digest(url)
+        if digest not in self._digests:
+            self._digests.add(digest)
+            if self.log:
+                self.log.append(digest)
+
+    def __contains__(self, url):
+        return url_digest(url) in self._digests
+
+    def __len__(self):
+        return len(self._digests)
+
+    def dump(self):
+        if self.log:
+            return {"kind": "hashed", "log": str(self.log.path), "length": self.log.flush()}
+        return {"kind": "hashed", "digests": list(self._digests)}
+
+    def load(self, data):
+        if "log" in data:
+            self.log = DigestLog(data["log"], data["length"])
+            self._digests.update(self.log.digests())
+        else:
+            self._digests.update(data["digests"])
+
+
+class BloomVisitedSet:
+    def __init__(self, capacity=1_000_000, error_rate=1e-4, exact_path=None, fresh=True, log=None):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self.log = log
+        self.exact_path = Path(exact_path) if exact_path else None
+        self._db = None
+        if self.exact_path:
+            self.exact_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.exact_path)
+            self._db.execute("CREATE TABLE IF NOT EXISTS visited (digest INTEGER PRIMARY KEY)")
+            if fresh:
+                # Digests from an earlier crawl would turn Bloom false positives into skipped pages
+                self._db.execute("DELETE FROM visited")
+
+    def _positions(self, digest):
+        # Double hashing over the two halves of the URL digest, so the
+        # filter can be rebuilt from a DigestLog
+        h1 = digest >> 32
+        h2 = (digest & 0xFFFFFFFF) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def _maybe_contains(self, digest):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(digest))
+
+    def _set(self, digest):
+        for p in self._positions(digest):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def add(self, url):
+        if url in self:
+            return
+        digest = url_digest(url)
+        self._set(digest)
+        if self._db:
+            # Signed 64-bit range for SQLite INTEGER
+            self._db.execute("INSERT OR IGNORE INTO visited VALUES (?)", (digest - 2 ** 63,))
+        if self.log:
+            self.log.append(digest)
+
+    def __contains__(self, url):
+        digest = url_digest(url)
+        if not self._maybe_contains(digest):
+            return False
+        if self._db is None:
+            return True
+        row = self._db.execute("SELECT 1 FROM visited WHERE digest = ?", (digest - 2 ** 63,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self.count
+
+    def dump(self):
+        if self._db:
+            self._db.commit()
+        data = {"kind": "bloom", "size": self.size, "hashes": self.hashes}
+        if self.log:
+            return dict(data, log=str(self.log.path), length=self.log.flush())
+        return dict(data, count=self.count, bits=base64.b64encode(bytes(self.bits)).decode("ascii"))
+
+    def load(self, data):
+        self.size = data["size"]
+        self.hashes = data["hashes"]
+        if "log" in data:
+            self.log = DigestLog(data["log"], data["length"])
+            self.bits = bytearray((self.size + 7) // 8)
+            self.count = 0
+            for digest in self.log.digests():
+                self._set(digest)
+        else:
+            self.count = data["count"]
+            self.bits = bytearray(base64.b64decode(data["bits"]))
+
+    def memory_bytes(self):
+        return len(self.bits)
+
+
+def make_visited(kind="hashed", capacity=1_000_000, error_rate=1e-4, exact_path=None, fresh=True, log_path=None):
+    log = DigestLog(log_path) if log_path else None
+    if kind == "bloom":
+        return BloomVisitedSet(capacity, error_rate, exact_path, fresh=fresh, log=log)
+    return HashedVisitedSet(log)
+
+
+def load_visited(data, **kwargs):
+    """
+    Rebuild a visited set from a checkpoint (a dump() dict or a legacy URL list).
+    A set dumped with a DigestLog reopens that log where the checkpoint left it;
+    the other forms come back without a log and are dumped in full.
+    """
+    if isinstance(data, dict):
+        visited = make_visited(data.get("kind", "hashed"), fresh=False, **kwargs)
+        visited.load(data)
+        return visited
+    visited = make_visited("hashed")
+    for url in data:
+        visited.add(canonicalize_url(url))
+    return visited
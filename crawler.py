@@ -4,78 +4,105 @@ import os
 import json
 from bs4 import BeautifulSoup
 from pathlib import Path
-import mimetypes
-import speech_recognition as sr
-import tempfile
-import subprocess
-import fitz  # PyMuPDF for PDFs
-from docx import Document
-import pandas as pd
 from urllib.parse import urljoin, urlparse
 from collections import deque
+from datetime import datetime
+import argparse
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from crawl_state import CrawlStateStore, content_hash
+from crawl_checkpoint import NodeWriter, Checkpoint, ndjson_to_legacy
+from crawl_scheduler import CrawlScheduler, make_connector
+from crawl_urls import canonicalize_url, make_visited, load_visited, DEFAULT_DROP_PARAMS
+from crawl_extract import (
+    MediaFile, CHUNK_SIZE, find_extractor, media_path, stream_to_file, run_extractor,
+)
 
 BASE_URL = "https://www.mosdac.gov.in"
 OUTPUT_DIR = Path("output")
 MEDIA_DIR = OUTPUT_DIR / "media"
-VISITED = set()
-SITE_DATA = {"url": BASE_URL, "children": []}
+STATE_PATH = OUTPUT_DIR / "crawl_state.db"
+CHANGESET_PATH = OUTPUT_DIR / "changeset.json"
+NODES_PATH = OUTPUT_DIR / "nodes.ndjson"
+CHECKPOINT_PATH = OUTPUT_DIR / "crawl_checkpoint.json"
+CHECKPOINT_EVERY = 50
+PARSE_IN_FLIGHT_PER_WORKER = 2
+VISITED_EXACT_PATH = OUTPUT_DIR / "visited.db"
+VISITED_LOG_PATH = OUTPUT_DIR / "visited.log"
+VISITED_ERROR_RATE = 1e-4
+MAX_HTML_BYTES = 5 * 1024 * 1024
+MAX_MEDIA_BYTES = 200 * 1024 * 1024
+# No total deadline: a large media body may take minutes on a slow link,
+# but connecting and every read between chunks must make progress
+FETCH_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=30)
+# Statuses that mean a page is really gone; other failures keep its last state
+GONE_STATUSES = (404, 410)
 
 OUTPUT_DIR.mkdir(exist_ok=True)
 MEDIA_DIR.mkdir(exist_ok=True)
 
 # ---------------- Utilities ---------------- #
 
-async def fetch(session, url):
+async def read_limited(resp, max_bytes):
+    """Read a body into memory, or None if it exceeds max_bytes"""
+    chunks = []
+    size = 0
+    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+async def fetch(session, url, headers=None, on_headers=None):
+    """
+    Returns (content, content_type, status, response_headers, response_url).
+
+    response_url is the URL the body was served from after redirects; relative
+    links on the page resolve against it, not against the canonical URL.
+
+    HTML bodies are returned as bytes. Bodies an extractor can handle are
+    streamed to MEDIA_DIR and returned as a MediaFile. Anything else, and
+    bodies over the size limits, are not downloaded (content is None).
+    on_headers() is called once the response headers have arrived.
+    """
     try:
-        async with session.get(url, timeout=30) as resp:
-            if resp.status == 200:
-                ct = resp.headers.get("content-type", "")
-                return await resp.read(), ct
+        async with session.get(url, timeout=FETCH_TIMEOUT, headers=headers) as resp:
+            if on_headers:
+                on_headers()
+            final_url = str(resp.url)
+            if resp.status != 200:
+                return None, None, resp.status, resp.headers, final_url
+            ct = resp.headers.get("content-type", "")
+            length = resp.content_length or 0
+            if "html" in ct:
+                if length > MAX_HTML_BYTES:
+                    print(f"[SKIP] {url}: {length} bytes exceeds HTML limit")
+                    return None, ct, resp.status, resp.headers, final_url
+                return await read_limited(resp, MAX_HTML_BYTES), ct, resp.status, resp.headers, final_url
+            if find_extractor(ct, url) is None:
+                return None, ct, resp.status, resp.headers, final_url
+            if length > MAX_MEDIA_BYTES:
+                print(f"[SKIP] {url}: {length} bytes exceeds media limit")
+                return None, ct, resp.status, resp.headers, final_url
+            media = await stream_to_file(resp, media_path(MEDIA_DIR, url, ct), MAX_MEDIA_BYTES)
+            if media is None:
+                print(f"[SKIP] {url}: body exceeds media limit")
+            return media, ct, resp.status, resp.headers, final_url
     except Exception as e:
         print(f"[ERROR] {url}: {e}")
-    return None, None
-
-def save_file(content, url, ct):
-    ext = mimetypes.guess_extension(ct.split(";")[0]) or ".bin"
-    fname = MEDIA_DIR / (url.split("/")[-1].split("?")[0] or "file" + ext)
-    with open(fname, "wb") as f:
-        f.write(content)
-    return fname
-
-def pdf_to_text(path):
-    text = ""
-    with fitz.open(path) as doc:
-        for page in doc:
-            text += page.get_text()
-    return text.strip()
-
-def docx_to_text(path):
-    doc = docx.Document(path)
-    return "\n".join([p.text for p in doc.paragraphs])
-
-def csv_xlsx_to_text(path):
-    try:
-        df = pd.read_excel(path) if path.suffix in [".xlsx", ".xls"] else pd.read_csv(path)
-        return df.to_string()
-    except Exception as e:
-        return f"[ERROR READING TABLE] {e}"
-
-def audio_to_text(path):
-    recognizer = sr.Recognizer()
-    with tempfile.NamedTemporaryFile(suffix=".wav") as tmp:
-        if path.suffix != ".wav":
-            subprocess.run(["ffmpeg", "-i", str(path), str(tmp.name)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            audio_path = tmp.name
-        else:
-            audio_path = str(path)
-        with sr.AudioFile(audio_path) as source:
-            audio = recognizer.record(source)
-            return recognizer.recognize_google(audio, language="en-IN")
+    return None, None, None, None, None
 
 # ---------------- Parsing ---------------- #
 
-def extract_html_structure(html, url):
-    soup = BeautifulSoup(html, "html.parser")
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+def _structure_from_soup(soup, url):
     structure = {"url": url, "text": "", "children": []}
 
     for header in soup.find_all(["h1","h2","h3","h4","h5","h6"]):
@@ -90,83 +117,381 @@ def extract_html_structure(html, url):
         structure["text"] = soup.get_text(" ", strip=True)
     return structure
 
-async def crawl_website(session, start_url, max_pages=1000):
+def _links_from_soup(soup, url, netloc):
+    links = []
+    for link in soup.find_all("a", href=True):
+        full_url = urljoin(url, link["href"])
+        # Only follow same-domain links
+        if urlparse(full_url).netloc == netloc:
+            links.append(full_url)
+    return links
+
+def extract_html_structure(html, url):
+    return _structure_from_soup(BeautifulSoup(html, HTML_PARSER), url)
+
+def extract_links(html, url):
+    return _links_from_soup(BeautifulSoup(html, HTML_PARSER), url, urlparse(BASE_URL).netloc)
+
+def parse_html(html, url, netloc, base_url=None):
+    """
+    Parse a page once and return (structure, links); runs in the parse pool.
+
+    Links resolve against base_url (the response URL, defaulting to url) and
+    any <base href> on the page, so a canonical url that lost its trailing
+    slash does not move relative links up a directory.
+    """
+    soup = BeautifulSoup(html, HTML_PARSER)
+    base_url = base_url or url
+    base = soup.find("base", href=True)
+    if base:
+        base_url = urljoin(base_url, base["href"])
+    return _structure_from_soup(soup, url), _links_from_soup(soup, base_url, netloc)
+
+def _timed(fn, *args):
+    """Run fn in the parse pool and return (result, seconds spent parsing)"""
+    started = time.perf_counter()
+    return fn(*args), time.perf_counter() - started
+
+class CrawlStats:
+    """Fetch and parse throughput, tracked separately"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.fetched = 0
+        self.fetch_bytes = 0
+        self.fetch_seconds = 0.0
+        self.parsed = 0
+        self.parse_seconds = 0.0
+        self.extract_errors = 0
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        fetch_rate = self.fetched / elapsed if elapsed else 0
+        parse_rate = self.parsed / self.parse_seconds if self.parse_seconds else 0
+        return (f"[STATS] {elapsed:.1f}s wall | fetch: {self.fetched} pages, "
+                f"{self.fetch_bytes / 1e6:.1f} MB, {fetch_rate:.1f} pages/s, "
+                f"avg {self.fetch_seconds / max(self.fetched, 1) * 1000:.0f} ms | "
+                f"parse: {self.parsed} docs, {parse_rate:.1f} docs/s per worker, "
+                f"avg {self.parse_seconds / max(self.parsed, 1) * 1000:.1f} ms, "
+                f"{self.extract_errors} extraction errors")
+
+async def crawl_website(session, start_url, max_pages=1000, state=None, sink=None,
+                        checkpoint=None, resume=None, parse_pool=None, stats=None,
+                        scheduler=None, workers=10, visited=None, drop_params=DEFAULT_DROP_PARAMS):
+    """
+    Crawl same-domain pages from start_url.
+
+    With a CrawlStateStore, requests are conditional and pages answering 304
+    (or returning an identical body) reuse their stored node and links
+    instead of being parsed again. state.changes then holds the changeset.
+
+    With a sink, each finished node is passed to sink(node, fresh) instead of
+    being collected in the returned list; fresh is False for nodes reused from
+    the incremental state. The sink may be a coroutine function, which lets
+    downstream stages apply backpressure to the crawl. With a Checkpoint, the
+    visited set and pending frontier are saved every checkpoint.every pages;
+    passing a loaded checkpoint as resume continues from that state.
+    """
     queue = asyncio.Queue()
-    visited = set()
+    if visited is None:
+        visited = make_visited("hashed")
+    pending = set()
+    stats = stats or CrawlStats()
+    netloc = urlparse(start_url).netloc
+    loop = asyncio.get_running_loop()
+    pool_size = getattr(parse_pool, "_max_workers", 1)
+    parse_slots = asyncio.Semaphore(pool_size * PARSE_IN_FLIGHT_PER_WORKER)
+
+    async def run_parser(fn, *args, timeout=None):
+        if parse_pool is None:
+            result, seconds = _timed(fn, *args)
+        else:
+            async with parse_slots:
+                future = loop.run_in_executor(parse_pool, _timed, fn, *args)
+                result, seconds = await asyncio.wait_for(future, timeout)
+        stats.parsed += 1
+        stats.parse_seconds += seconds
+        return result
     results = []
-    
-    await queue.put(start_url)
-    visited.add(start_url)
+    capped = False
+    done = 0
+
+    if resume:
+        frontier = resume["frontier"]
+        capped = resume.get("capped", False)
+    else:
+        start_url = canonicalize_url(start_url, drop_params)
+        visited.add(start_url)
+        frontier = [start_url]
+    for url in frontier:
+        pending.add(url)
+        await queue.put(url)
+
+    async def emit(node, fresh=True):
+        if sink:
+            result = sink(node, fresh)
+            if asyncio.iscoroutine(result):
+                await result
+        else:
+            results.append(node)
+
+    def finish(url):
+        nonlocal done
+        pending.discard(url)
+        done += 1
+        if checkpoint and done % checkpoint.every == 0:
+            if state:
+                state.commit()
+            checkpoint.save(pending, visited.dump(), capped=capped,
+                            run_id=state.run_id if state else None,
+                            changes=state.changes if state else None)
+
+    async def extract_media(media, url):
+        """Run the matching extractor on the parse pool; returns (text, media metadata)"""
+        extractor = find_extractor(media.content_type, url)
+        meta = {"path": str(media.path), "content_type": media.content_type,
+                "bytes": media.size, "extractor": extractor.name}
+        try:
+            # The timeout is enforced in the pool worker, which kills the
+            # extractor's child process, so a hung extractor cannot hold a worker
+            text = await run_parser(run_extractor, extractor.name, str(media.path), extractor.timeout)
+            return text or "", meta
+        except subprocess.TimeoutExpired:
+            meta["error"] = f"timed out after {extractor.timeout}s"
+        except Exception as e:
+            meta["error"] = str(e)
+        stats.extract_errors += 1
+        return "", meta
+
+    async def enqueue(links):
+        nonlocal capped
+        for full_url in links:
+            full_url = canonicalize_url(full_url, drop_params)
+            if full_url in visited:
+                continue
+            if len(visited) >= max_pages:
+                capped = True
+                break
+            visited.add(full_url)
+            pending.add(full_url)
+            await queue.put(full_url)
+
+    async def reuse_previous(url, previous):
+        state.mark_unchanged(url)
+        if previous["node"]:
+            await emit(previous["node"], fresh=False)
+        await enqueue(previous["links"])
     
     async def worker():
         while True:
             try:
                 url = await queue.get()
-                if len(visited) >= max_pages:
-                    queue.task_done()
-                    continue
-                
-                content, ct = await fetch(session, url)
-                if not content:
-                    queue.task_done()
-                    continue
                 
-                node = {"url": url, "text": "", "children": []}
-                results.append(node)
-                
-                if "html" in ct:
-                    html_structure = extract_html_structure(content, url)
-                    node.update(html_structure)
-                    
-                    # Extract and queue new links
-                    soup = BeautifulSoup(content, "html.parser")
-                    for link in soup.find_all("a", href=True):
-                        href = link["href"]
-                        full_url = urljoin(url, href)
+                headers = state.conditional_headers(url) if state else None
+                fetch_started = time.perf_counter()
+                if scheduler:
+                    content, ct, status, resp_headers, resp_url = await scheduler.fetch(session, url, headers)
+                else:
+                    content, ct, status, resp_headers, resp_url = await fetch(session, url, headers)
+                stats.fetched += 1
+                stats.fetch_seconds += time.perf_counter() - fetch_started
+                if isinstance(content, MediaFile):
+                    stats.fetch_bytes += content.size
+                else:
+                    stats.fetch_bytes += len(content or b"")
+                previous = state.get(url) if state and status in (200, 304) else None
+
+                if status == 304 and previous:
+                    await reuse_previous(url, previous)
+                elif content:
+                    digest = content.digest if isinstance(content, MediaFile) else content_hash(content)
+                    if previous and previous["content_hash"] == digest:
+                        await reuse_previous(url, previous)
+                    else:
+                        node = {"url": url, "text": "", "children": []}
+                        links = []
                         
-                        # Only follow same-domain links
-                        if (urlparse(full_url).netloc == urlparse(BASE_URL).netloc and 
-                            full_url not in visited and 
-                            len(visited) < max_pages):
-                            visited.add(full_url)
-                            await queue.put(full_url)
-                
-                elif "pdf" in ct:
-                    path = save_file(content, url, ct)
-                    node["text"] = pdf_to_text(path)
-                
-                # Handle other file types similarly...
+                        if isinstance(content, MediaFile):
+                            node["text"], node["media"] = await extract_media(content, url)
+                        
+                        elif "html" in ct:
+                            html_structure, links = await run_parser(parse_html, content, url, netloc, resp_url)
+                            node.update(html_structure)
+
+                        await emit(node)
+                        if state:
+                            state.record(url, digest, node, links,
+                                         etag=resp_headers.get("ETag"),
+                                         last_modified=resp_headers.get("Last-Modified"))
+                        await enqueue(links)
+                elif state and status not in GONE_STATUSES:
+                    # Fetch failed or body skipped: keep the page as it was last
+                    # run instead of reporting it removed; only 404/410 remove it
+                    previous = state.get(url)
+                    if previous:
+                        await reuse_previous(url, previous)
                 
+                finish(url)
                 queue.task_done()
                 
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 print(f"Worker error: {e}")
+                if state:
+                    state.mark_seen(url)
+                finish(url)
                 queue.task_done()
     
     # Start multiple workers
-    workers = [asyncio.create_task(worker()) for _ in range(10)]
-    await queue.join()
-    
-    # Cancel workers
-    for w in workers:
-        w.cancel()
-    await asyncio.gather(*workers, return_exceptions=True)
+    if scheduler:
+        workers = scheduler.max_concurrency
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    try:
+        await queue.join()
+    finally:
+        # Cancel workers (also when the crawl itself is cancelled)
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if state:
+        state.finish_run(complete=not capped)
     
     return results
 
 # ---------------- Main ---------------- #
 
-async def main():
-    async with aiohttp.ClientSession() as session:
-        all_pages = await crawl_website(session, BASE_URL, max_pages=1000)
-        
-        # Build hierarchical structure if needed
-        SITE_DATA["children"] = all_pages
+async def main(max_pages=1000, incremental=False, resume=False, compress=False, parse_workers=None,
+               rate=5.0, max_concurrency=16, respect_robots=True, visited_kind="hashed",
+               visited_capacity=1_000_000, extra_drop_params=None, index=False):
+    nodes_path = NODES_PATH.with_suffix(".ndjson.gz") if compress else NODES_PATH
+    checkpoint_state = None
+    if resume:
+        checkpoint_state = Checkpoint(CHECKPOINT_PATH).load()
+        if checkpoint_state:
+            nodes_path = Path(checkpoint_state.get("nodes_path", nodes_path))
+            print(f"[RESUME] {len(checkpoint_state['frontier'])} pending")
+        else:
+            print("[RESUME] No checkpoint found, starting a fresh crawl")
+
+    visited_options = {"capacity": visited_capacity, "error_rate": VISITED_ERROR_RATE,
+                       "exact_path": VISITED_EXACT_PATH}
+    if checkpoint_state:
+        visited = load_visited(checkpoint_state["visited"], **visited_options)
+    else:
+        # Checkpoints record how far the visited log was flushed, not the whole set
+        visited = make_visited(visited_kind, log_path=VISITED_LOG_PATH, **visited_options)
+    drop_params = DEFAULT_DROP_PARAMS | {p.lower() for p in (extra_drop_params or [])}
+
+    state = None
+    if incremental:
+        state = CrawlStateStore(STATE_PATH)
+        state.begin_run(checkpoint_state.get("run_id") if checkpoint_state else None)
+        if checkpoint_state and checkpoint_state.get("changes"):
+            state.changes = checkpoint_state["changes"]
+
+    writer = NodeWriter(nodes_path, resume=checkpoint_state)
+    stats = CrawlStats()
+    parse_pool = ProcessPoolExecutor(max_workers=parse_workers or os.cpu_count())
+    checkpoint = Checkpoint(CHECKPOINT_PATH, writer=writer, every=CHECKPOINT_EVERY)
+    scheduler = CrawlScheduler(fetch, rate=rate, burst=max(1, int(rate)),
+                               max_concurrency=max_concurrency, respect_robots=respect_robots)
+
+    pipeline = None
+    if index:
+        # Imported lazily: it pulls in the embedding model
+        from index_pipeline import IndexPipeline
+        pipeline = IndexPipeline()
+        await pipeline.start()
+
+    async def sink(node, fresh):
+        writer.write(node)
+        # Unchanged pages are already in the index
+        if pipeline and fresh:
+            await pipeline.submit(node)
+
+    try:
+        connector = make_connector(limit=max_concurrency * 2, limit_per_host=max_concurrency)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await crawl_website(session, BASE_URL, max_pages=max_pages, state=state,
+                                sink=sink, checkpoint=checkpoint, resume=checkpoint_state,
+                                parse_pool=parse_pool, stats=stats, scheduler=scheduler,
+                                visited=visited, drop_params=drop_params)
+        writer.close()
+        print(stats.report())
+        print(scheduler.report())
+
+        # Legacy single-document output for model.py
+        count = ndjson_to_legacy(nodes_path, OUTPUT_DIR / "output.json", BASE_URL)
+        print(f"[OUTPUT] {count} pages written to {nodes_path} and output.json")
+        if pipeline:
+            if state:
+                await pipeline.remove(state.changes["removed"])
+            # Final publish after output.json so the app sees the index as up to date
+            await pipeline.close()
+            print(pipeline.report())
+        if state:
+            write_changeset(state)
+        checkpoint.clear()
+    finally:
+        parse_pool.shutdown(cancel_futures=True)
+        if pipeline:
+            pipeline.cancel()
+        if state:
+            state.close()
+
+def write_changeset(state):
+    """Write output/changeset.json with new/changed nodes and removed URLs for downstream indexing"""
+    changes = state.changes
+
+    def nodes(urls):
+        return [row["node"] for row in map(state.get, urls) if row and row["node"]]
 
-    with open(OUTPUT_DIR / "output.json", "w", encoding="utf-8") as f:
-        json.dump(SITE_DATA, f, ensure_ascii=False, indent=2)
+    changeset = {
+        "run_at": datetime.utcnow().isoformat(),
+        "new": nodes(changes["new"]),
+        "changed": nodes(changes["changed"]),
+        "removed": changes["removed"],
+        "unchanged": changes["unchanged"],
+    }
+    with open(CHANGESET_PATH, "w", encoding="utf-8") as f:
+        json.dump(changeset, f, ensure_ascii=False, indent=2)
+    print(f"[CHANGESET] new={len(changeset['new'])} changed={len(changeset['changed'])} "
+          f"removed={len(changeset['removed'])} unchanged={changeset['unchanged']}")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Crawl mosdac.gov.in into output/output.json")
+    parser.add_argument("--max-pages", type=int, default=1000)
+    parser.add_argument("--incremental", action="store_true",
+                        help="Send conditional requests, skip unchanged pages and write output/changeset.json")
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint")
+    parser.add_argument("--compress", action="store_true", help="Write nodes as output/nodes.ndjson.gz")
+    parser.add_argument("--parse-workers", type=int, default=None,
+                        help="Processes used for HTML/PDF parsing (default: CPU count)")
+    parser.add_argument("--rate", type=float, default=5.0,
+                        help="Maximum requests per second per host (robots.txt Crawl-delay can lower it)")
+    parser.add_argument("--max-concurrency", type=int, default=16,
+                        help="Upper bound for the adaptive per-host concurrency")
+    parser.add_argument("--ignore-robots", action="store_true", help="Do not fetch or honour robots.txt")
+    parser.add_argument("--visited", choices=["hashed", "bloom"], default="hashed",
+                        help="Visited-set structure: 64-bit digests, or a fixed-size Bloom filter")
+    parser.add_argument("--visited-capacity", type=int, default=1_000_000,
+                        help="Expected number of URLs when sizing the Bloom filter")
+    parser.add_argument("--drop-param", action="append", default=[],
+                        help="Extra query parameter to strip during URL canonicalization (repeatable)")
+    parser.add_argument("--index", action="store_true",
+                        help="Chunk, embed and publish crawled pages to the vector index as they arrive")
+    parser.add_argument("--convert", metavar="NDJSON",
+                        help="Only convert an existing NDJSON node file into output/output.json")
+    args = parser.parse_args()
+    if args.convert:
+        ndjson_to_legacy(args.convert, OUTPUT_DIR / "output.json", BASE_URL)
+    else:
+        asyncio.run(main(max_pages=args.max_pages, incremental=args.incremental,
+                         resume=args.resume, compress=args.compress,
+                         parse_workers=args.parse_workers, rate=args.rate,
+                         max_concurrency=args.max_concurrency,
+                         respect_robots=not args.ignore_robots, visited_kind=args.visited,
+                         visited_capacity=args.visited_capacity, extra_drop_params=args.drop_param,
+                         index=args.index))
\ No newline at end of file
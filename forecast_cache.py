@@ -0,0 +1,131 @@
+"""
+forecast_cache.py
+
+Forecast cache keyed by location grid cell and requested variables.
+
+Nearby coordinates are snapped to a grid cell (FORECAST_GRID_DEGREES, about
+11 km at the default 0.1) so users picking the same city share one entry.
+Entries are fresh until the next forecast model update (FORECAST_UPDATE_MINUTES
+past the hour boundary plus a publication lag). After that they are served
+stale for up to FORECAST_STALE_HOURS while a background refresh runs, so a
+request only waits on the upstream when there is no usable entry at all.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+GRID_DEGREES = float(os.getenv('FORECAST_GRID_DEGREES', '0.1'))
+UPDATE_MINUTES = int(os.getenv('FORECAST_UPDATE_MINUTES', '60'))
+PUBLISH_LAG_MINUTES = int(os.getenv('FORECAST_PUBLISH_LAG_MINUTES', '10'))
+STALE_HOURS = float(os.getenv('FORECAST_STALE_HOURS', '6'))
+MAX_ENTRIES = int(os.getenv('FORECAST_CACHE_SIZE', '2048'))
+REFRESH_WORKERS = int(os.getenv('FORECAST_REFRESH_WORKERS', '4'))
+
+
+def grid_cell(lat: float, lon: float, step: float = GRID_DEGREES):
+    """Snap coordinates to the centre of their grid cell"""
+    def snap(v):
+        return round(round(v / step) * step, 4)
+    return snap(lat), snap(lon)
+
+
+def next_update(now=None, cadence_minutes=UPDATE_MINUTES, lag_minutes=PUBLISH_LAG_MINUTES):
+    """Epoch seconds when the next model run is expected to be published"""
+    now = time.time() if now is None else now
+    cadence = cadence_minutes * 60
+    lag = lag_minutes * 60
+    boundary = ((now - lag) // cadence + 1) * cadence + lag
+    return boundary
+
+
+class ForecastCache:
+    def __init__(self, loader, stale_seconds=STALE_HOURS * 3600, max_entries=MAX_ENTRIES,
+                 workers=REFRESH_WORKERS):
+        """
+        loader(lat, lon, variables) fetches a forecast for a grid cell and
+        returns the decoded JSON, or None on failure.
+        """
+        self.loader = loader
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='forecast-refresh')
+        self.stats = {'fresh': 0, 'stale': 0, 'miss': 0, 'refresh': 0, 'errors': 0}
+
+    @staticmethod
+    def key(lat, lon, variables):
+        return grid_cell(lat, lon) + (variables,)
+
+    def expires_at(self, key):
+        """Epoch seconds when the entry stops being fresh, or None if absent"""
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def put(self, key, data):
+        with self._lock:
+            self._entries[key] = (data, next_update())
+            if len(self._entries) > self.max_entries:
+                # Evict the entries closest to (or furthest past) expiry
+                for old in sorted(self._entries, key=lambda k: self._entries[k][1])[:len(self._entries) - self.max_entries]:
+                    del self._entries[old]
+
+    def _load(self, key):
+        lat, lon, variables = key
+        data = self.loader(lat, lon, variables)
+        if data is None:
+            self.stats['errors'] += 1
+            return None
+        self.put(key, data)
+        return data
+
+    def reload(self, lat, lon, variables):
+        """Fetch the cell synchronously, bypassing any cached entry"""
+        self.stats['refresh'] += 1
+        return self._load(self.key(lat, lon, variables))
+
+    def _refresh(self, key):
+        try:
+            self.stats['refresh'] += 1
+            self._load(key)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.warning(f'Forecast refresh failed for {key[:2]}: {e}')
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def refresh_async(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._pool.submit(self._refresh, key)
+
+    def peek(self, key):
+        """Cached data for key if fresh or within the stale window (scheduling a refresh), else None"""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry:
+            data, expires = entry
+            if now < expires:
+                self.stats['fresh'] += 1
+                return data
+            if now < expires + self.stale_seconds:
+                self.stats['stale'] += 1
+                self.refresh_async(key)
+                return data
+        return None
+
+    def get(self, lat, lon, variables):
+        key = self.key(lat, lon, variables)
+        data = self.peek(key)
+        if data is not None:
+            return data
+        self.stats['miss'] += 1
+        return self._load(key)
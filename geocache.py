@@ -0,0 +1,206 @@
+"""
+geocache.py
+
+Cached geocoding for region lookups.
+
+Lookups are keyed by a normalized place name and served from an in-memory
+LRU backed by a small SQLite table, so a region is sent to Nominatim at most
+once per TTL across restarts. Unknown names are cached too (with a shorter
+TTL) and upstream calls go through geopy's RateLimiter to respect the
+Nominatim usage policy. Set GEOCODER=stub to use the offline StubGeocoder.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_PATH = Path(os.getenv('GEOCODE_CACHE_PATH', 'data/geocode_cache.db'))
+MEMORY_SIZE = int(os.getenv('GEOCODE_CACHE_SIZE', '1024'))
+POSITIVE_TTL = float(os.getenv('GEOCODE_TTL_DAYS', '30')) * 86400
+NEGATIVE_TTL = float(os.getenv('GEOCODE_NEGATIVE_TTL_HOURS', '24')) * 3600
+MIN_DELAY_SECONDS = float(os.getenv('GEOCODE_MIN_DELAY', '1.0'))
+ERROR_WAIT_SECONDS = float(os.getenv('GEOCODE_ERROR_WAIT', '0.5'))
+USER_AGENT = "weather_app"
+
+# Sentinel stored for names the geocoder could not resolve
+NOT_FOUND = ()
+
+
+def normalize_place(name: str) -> str:
+    """Case-fold and collapse whitespace/punctuation so 'New  Delhi, ' == 'new delhi'"""
+    name = re.sub(r'\s+', ' ', name or '').strip().casefold()
+    name = re.sub(r'\s*,\s*', ', ', name)
+    return name.strip(' ,.')
+
+
+class _StubLocation:
+    def __init__(self, latitude, longitude):
+        self.latitude = latitude
+        self.longitude = longitude
+
+
+class StubGeocoder:
+    """Offline geocoder for tests and load runs; resolves only the places it knows"""
+
+    PLACES = {
+        'delhi': (28.6139, 77.2090),
+        'new delhi': (28.6139, 77.2090),
+        'mumbai': (19.0760, 72.8777),
+        'bengaluru': (12.9716, 77.5946),
+        'bangalore': (12.9716, 77.5946),
+        'chennai': (13.0827, 80.2707),
+        'kolkata': (22.5726, 88.3639),
+        'hyderabad': (17.3850, 78.4867),
+        'ahmedabad': (23.0225, 72.5714),
+        'pune': (18.5204, 73.8567),
+        'jaipur': (26.9124, 75.7873),
+        'thiruvananthapuram': (8.5241, 76.9366),
+    }
+
+    def __init__(self, places=None, delay=0.0):
+        self.places = dict(self.PLACES if places is None else places)
+        self.delay = delay
+        self.calls = 0
+
+    def geocode(self, query, **kwargs):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        coords = self.places.get(normalize_place(query))
+        return _StubLocation(*coords) if coords else None
+
+
+def _default_geocode():
+    if os.getenv('GEOCODER', 'nominatim') == 'stub':
+        return StubGeocoder().geocode
+    from geopy.geocoders import Nominatim
+    from geopy.extra.rate_limiter import RateLimiter
+
+    domain = os.getenv('NOMINATIM_DOMAIN', 'nominatim.openstreetmap.org')
+    scheme = os.getenv('NOMINATIM_SCHEME', 'https')
+    geolocator = Nominatim(user_agent=USER_AGENT, domain=domain, scheme=scheme, timeout=10)
+    # Let timeouts and 5xx reach GeocodeCache.lookup instead of coming back as
+    # None, which would be cached as NOT_FOUND
+    return RateLimiter(geolocator.geocode, min_delay_seconds=MIN_DELAY_SECONDS, max_retries=2,
+                       error_wait_seconds=ERROR_WAIT_SECONDS, swallow_exceptions=False)
+
+
+class GeocodeCache:
+    def __init__(self, geocode=None, path=CACHE_PATH, size=MEMORY_SIZE):
+        self._geocode = geocode
+        self.path = Path(path) if path else None
+        self.size = size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.stats = {'hits': 0, 'misses': 0, 'upstream': 0, 'errors': 0}
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS geocode ("
+                    "key TEXT PRIMARY KEY, lat REAL, lon REAL, fetched_at REAL NOT NULL)"
+                )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    @property
+    def geocode(self):
+        if self._geocode is None:
+            self._geocode = _default_geocode()
+        return self._geocode
+
+    def _remember(self, key, value, fetched_at):
+        with self._lock:
+            self._memory[key] = (value, fetched_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.size:
+                self._memory.popitem(last=False)
+
+    def _fresh(self, value, fetched_at):
+        ttl = NEGATIVE_TTL if value == NOT_FOUND else POSITIVE_TTL
+        return time.time() - fetched_at < ttl
+
+    def _lookup_local(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                self._memory.move_to_end(key)
+        if entry and self._fresh(*entry):
+            return entry[0]
+        if self.path:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT lat, lon, fetched_at FROM geocode WHERE key = ?", (key,)
+                ).fetchone()
+            if row:
+                value = NOT_FOUND if row[0] is None else (row[0], row[1])
+                if self._fresh(value, row[2]):
+                    self._remember(key, value, row[2])
+                    return value
+        return None
+
+    def _store(self, key, value):
+        now = time.time()
+        self._remember(key, value, now)
+        if self.path:
+            lat, lon = value if value != NOT_FOUND else (None, None)
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO geocode (key, lat, lon, fetched_at) VALUES (?, ?, ?, ?)",
+                    (key, lat, lon, now)
+                )
+
+    def lookup(self, name):
+        """Return (lat, lon) for a place name, or None if it cannot be resolved"""
+        key = normalize_place(name)
+        if not key:
+            return None
+        value = self._lookup_local(key)
+        if value is not None:
+            self.stats['hits'] += 1
+            return value or None
+
+        # Collapse concurrent lookups of the same name into one upstream call
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+        if not leader:
+            event.wait(30)
+            value = self._lookup_local(key)
+            self.stats['hits' if value is not None else 'errors'] += 1
+            return value or None
+
+        self.stats['misses'] += 1
+        try:
+            self.stats['upstream'] += 1
+            location = self.geocode(name)
+            value = (location.latitude, location.longitude) if location else NOT_FOUND
+            self._store(key, value)
+            return value or None
+        except Exception:
+            # Upstream failures are not cached; the next request retries
+            self.stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_geocode_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = GeocodeCache()
+        return _default_cache
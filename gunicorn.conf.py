@@ -0,0 +1,60 @@
+"""
+gunicorn.conf.py
+
+Picked up automatically by `gunicorn app:app` (see Procfile).
+
+By default the app is preloaded in the master: the embedding model, FAISS
+index and chunk texts are loaded once and shared copy-on-write by the forked
+workers instead of being loaded again in each one. gc.freeze() before forking
+keeps the garbage collector from touching (and so copying) those objects in
+the workers. With INDEX_MMAP=1 the index and chunk store are memory-mapped
+as well, so reloads after a new index is published stay shared too.
+
+Each worker logs its memory after start-up. `private` is the per-worker
+overhead; GET /api/memory reports the same for the worker serving it.
+
+Workers, threads, timeout and bind keep gunicorn's defaults unless set in
+the environment: gunicorn itself reads WEB_CONCURRENCY (workers) and PORT
+(binds 0.0.0.0:$PORT), and GUNICORN_THREADS / GUNICORN_TIMEOUT are applied
+here. Also: GUNICORN_PRELOAD (default 1), TORCH_THREADS.
+"""
+import gc
+import os
+
+if os.getenv('GUNICORN_THREADS'):
+    threads = int(os.getenv('GUNICORN_THREADS'))
+if os.getenv('GUNICORN_TIMEOUT'):
+    timeout = int(os.getenv('GUNICORN_TIMEOUT'))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+# app.py leaves its background threads to post_fork (threads do not survive fork)
+os.environ['DEFER_BACKGROUND_JOBS'] = '1'
+
+
+def when_ready(server):
+    from memory_report import process_memory, format_memory
+    server.log.info(f"master ready (preload={preload_app}) {format_memory(process_memory())}")
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the GC's reach so workers don't dirty it
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    torch_threads = os.getenv('TORCH_THREADS')
+    if torch_threads:
+        import torch
+        torch.set_num_threads(int(torch_threads))
+
+    from app import app, start_background_jobs
+    from models import db
+    # Connections opened in the master must not be shared with the worker
+    with app.app_context():
+        db.engine.dispose(close=False)
+    start_background_jobs()
+
+
+def post_worker_init(worker):
+    from memory_report import process_memory, format_memory
+    worker.log.info(f"worker {worker.pid} started {format_memory(process_memory())}")
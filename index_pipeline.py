@@ -0,0 +1,200 @@
+"""
+index_pipeline.py
+
+Streams crawled nodes into the vector index while the crawl runs.
+
+    crawler sink -> [node queue] -> chunker -> [chunk queue] -> embedder -> FAISS
+
+Both queues are bounded, so a slow embedder pushes back on chunking and,
+through the crawler's awaited sink, on fetching. Chunks are embedded in
+batches of EMBED_BATCH_SIZE (a good CPU throughput point for MiniLM) in a
+worker thread and appended to a copy of the live index. Every
+PUBLISH_EVERY_CHUNKS chunks, and at the end, the index is published with
+vector_index.publish(); serving processes pick it up via model.get_retriever().
+"""
+import asyncio
+import time
+
+from index_types import supports_incremental
+from vector_index import (FALLBACK_TEXT, INDEX_DIR, chunk_id, make_embeddings, make_splitter, load_or_build,
+                          node_to_text, publish, rebuild_vectorstore)
+
+EMBED_BATCH_SIZE = 32
+NODE_QUEUE_SIZE = 64
+CHUNK_QUEUE_SIZE = EMBED_BATCH_SIZE * 8
+PUBLISH_EVERY_CHUNKS = 2000
+PUBLISH_EVERY_SECONDS = 300
+
+_DONE = object()
+
+
+class _Removed:
+    def __init__(self, url):
+        self.url = url
+
+
+class IndexPipeline:
+    def __init__(self, embeddings=None, index_dir=INDEX_DIR, batch_size=EMBED_BATCH_SIZE,
+                 publish_every=PUBLISH_EVERY_CHUNKS, publish_seconds=PUBLISH_EVERY_SECONDS):
+        self.embeddings = embeddings or make_embeddings()
+        self.index_dir = index_dir
+        self.batch_size = batch_size
+        self.publish_every = publish_every
+        self.publish_seconds = publish_seconds
+        self.splitter = make_splitter()
+        self.nodes = asyncio.Queue(maxsize=NODE_QUEUE_SIZE)
+        self.chunks = asyncio.Queue(maxsize=CHUNK_QUEUE_SIZE)
+        self.vectorstore = None
+        self.ids_by_url = {}
+        self.stats = {"nodes": 0, "chunks": 0, "embed_seconds": 0.0, "published": 0}
+        self._tasks = []
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.vectorstore, _ = await loop.run_in_executor(None, load_or_build, self.embeddings, self.index_dir)
+        if any(not doc.metadata.get("url") and doc.page_content != FALLBACK_TEXT
+               for _, doc in self._documents()):
+            # Index built before chunks carried their page url: its chunks could
+            # never be replaced, so rebuild it page by page first
+            self.vectorstore, _ = await loop.run_in_executor(None, rebuild_vectorstore, self.embeddings,
+                                                             self.index_dir)
+        if not supports_incremental(self.vectorstore.index):
+            raise RuntimeError(f"{type(self.vectorstore.index).__name__} indexes cannot be updated in place; "
+                               "crawl without --index and rebuild with `python index_tune.py build`")
+        for doc_id, doc in self._documents():
+            url = doc.metadata.get("url")
+            if url:
+                self.ids_by_url.setdefault(url, []).append(doc_id)
+        self._tasks = [asyncio.create_task(self._chunker()), asyncio.create_task(self._embedder())]
+
+    def _documents(self):
+        """(id, Document) for every chunk in the index, through the public docstore API"""
+        docstore = self.vectorstore.docstore
+        for doc_id in self.vectorstore.index_to_docstore_id.values():
+            yield doc_id, docstore.search(doc_id)
+
+    def _check_stages(self):
+        """Re-raise the error of a stage that died; nothing would drain the queue after it"""
+        for task in self._tasks:
+            if task.done():
+                if not task.cancelled() and task.exception():
+                    raise task.exception()
+                raise RuntimeError("index pipeline stages have stopped")
+
+    async def _put(self, item):
+        """Queue an item for the chunker, waiting for room unless a stage fails meanwhile"""
+        self._check_stages()
+        if not self.nodes.full():
+            self.nodes.put_nowait(item)
+            return
+        put = asyncio.ensure_future(self.nodes.put(item))
+        done, _ = await asyncio.wait([put, *self._tasks], return_when=asyncio.FIRST_COMPLETED)
+        if put not in done:
+            put.cancel()
+            self._check_stages()
+
+    async def submit(self, node):
+        """Crawler sink; waits while the queue is full (backpressure) and raises if a stage failed"""
+        await self._put(node)
+
+    async def remove(self, urls):
+        """Delete every chunk of pages the crawl reported as removed"""
+        for url in urls:
+            await self._put(_Removed(url))
+
+    async def _chunker(self):
+        while True:
+            node = await self.nodes.get()
+            if node is _DONE:
+                await self.chunks.put(_DONE)
+                return
+            if isinstance(node, _Removed):
+                # A page with no chunks left: _drop_stale deletes all of them
+                await self.chunks.put(("replace", node.url, 0))
+                continue
+            url = node.get("url", "")
+            texts = self.splitter.split_text(node_to_text(node))
+            self.stats["nodes"] += 1
+            for i, text in enumerate(texts):
+                await self.chunks.put((chunk_id(url, i), text, {"url": url}))
+            # Marker so the embedder can drop stale chunks of a re-crawled page
+            await self.chunks.put(("replace", url, len(texts)))
+
+    async def _embedder(self):
+        loop = asyncio.get_running_loop()
+        batch, replaced = [], []
+        added_since_publish = 0
+        last_publish = time.monotonic()
+        done = False
+        while not done:
+            item = await self.chunks.get()
+            if item is _DONE:
+                done = True
+            elif item[0] == "replace":
+                replaced.append(item[1:])
+            else:
+                batch.append(item)
+
+            if batch and (len(batch) >= self.batch_size or done):
+                await loop.run_in_executor(None, self._add_batch, batch)
+                added_since_publish += len(batch)
+                batch = []
+            if not batch:
+                # Every chunk before these markers is now in the index
+                for url, count in replaced:
+                    self._drop_stale(url, count)
+                replaced = []
+
+            if done or added_since_publish >= self.publish_every or \
+                    (added_since_publish and time.monotonic() - last_publish >= self.publish_seconds):
+                if added_since_publish or done:
+                    await loop.run_in_executor(None, self._publish)
+                added_since_publish = 0
+                last_publish = time.monotonic()
+
+    def _add_batch(self, batch):
+        started = time.perf_counter()
+        ids = [b[0] for b in batch]
+        texts = [b[1] for b in batch]
+        vectors = self.embeddings.embed_documents(texts)
+        self.stats["embed_seconds"] += time.perf_counter() - started
+
+        # Re-crawled pages reuse their ids; remove the old vectors first
+        existing = [doc_id for doc_id, _, meta in batch if doc_id in self.ids_by_url.get(meta["url"], ())]
+        if existing:
+            self.vectorstore.delete(existing)
+        self.vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=[b[2] for b in batch], ids=ids)
+        for doc_id, _, meta in batch:
+            known = self.ids_by_url.setdefault(meta["url"], [])
+            if doc_id not in known:
+                known.append(doc_id)
+        self.stats["chunks"] += len(batch)
+
+    def _drop_stale(self, url, count):
+        """Delete chunks beyond `count` left over from a longer earlier version of the page"""
+        current = {chunk_id(url, i) for i in range(count)}
+        stale = [i for i in self.ids_by_url.get(url, []) if i not in current]
+        if stale:
+            self.vectorstore.delete(stale)
+            self.ids_by_url[url] = [i for i in self.ids_by_url[url] if i in current]
+
+    def _publish(self):
+        version = publish(self.vectorstore, self.index_dir)
+        self.stats["published"] += 1
+        print(f"[INDEX] published {version}: {self.stats['chunks']} chunks from {self.stats['nodes']} nodes")
+        return version
+
+    async def close(self):
+        """Drain the queues, publish a final version and stop the stages"""
+        await self._put(_DONE)
+        await asyncio.gather(*self._tasks)
+
+    def cancel(self):
+        """Stop the stages without publishing (crawl aborted)"""
+        for task in self._tasks:
+            task.cancel()
+
+    def report(self):
+        rate = self.stats["chunks"] / self.stats["embed_seconds"] if self.stats["embed_seconds"] else 0
+        return (f"[INDEX] {self.stats['nodes']} nodes, {self.stats['chunks']} chunks, "
+                f"{rate:.0f} chunks/s embedding, {self.stats['published']} publishes")
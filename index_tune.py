@@ -0,0 +1,143 @@
+"""
+index_tune.py
+
+Build and tune the retrieval index.
+
+    python index_tune.py build --type ivf-pq [--nlist N] [--nprobe N] [--ef-search N]
+        Embed the corpus, build the index type and publish it (see vector_index.py)
+
+    python index_tune.py tune [--types flat,sq8,ivf,ivf-pq,hnsw] [--vectors PATH] [--synthetic N]
+        Build each index type over the same vectors and report memory, build time,
+        single-query latency and recall@k against exact search, sweeping nprobe
+        (IVF) and efSearch (HNSW)
+
+Tuning uses the embedded corpus (cached in --vectors so repeated runs skip
+embedding), or --synthetic N clustered random vectors to project behaviour
+for corpora larger than the current crawl. Queries are perturbed corpus
+vectors, so the nearest neighbours are realistic.
+"""
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from index_types import INDEX_TYPE, INDEX_TYPES, build_index, set_search_params, index_bytes, describe
+
+
+def corpus_vectors(cache=None):
+    """Embedded corpus chunks, loaded from / saved to cache when given"""
+    if cache:
+        try:
+            return np.load(cache)
+        except FileNotFoundError:
+            pass
+    from vector_index import make_embeddings, build_documents
+    documents = build_documents()
+    print(f"Embedding {len(documents)} chunks...")
+    vectors = np.asarray(make_embeddings().embed_documents([d.page_content for d in documents]), dtype=np.float32)
+    if cache:
+        np.save(cache, vectors)
+    return vectors
+
+
+def synthetic_vectors(n, dim=384, clusters=200, seed=0):
+    """Unit vectors around random topic centres, roughly like sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(clusters, size=n)] + rng.normal(scale=0.6, size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(vectors, count, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)]
+    queries = picks + rng.normal(scale=0.05, size=picks.shape).astype(np.float32)
+    return np.ascontiguousarray(queries, dtype=np.float32)
+
+
+def measure(index, queries, truth, k):
+    """(p50 ms, p95 ms, recall@k) for one query at a time, as the chat endpoint searches"""
+    latencies = []
+    hits = 0
+    for q, expected in zip(queries, truth):
+        started = time.perf_counter()
+        _, found = index.search(q[None, :], k)
+        latencies.append(time.perf_counter() - started)
+        hits += len(set(found[0]) & set(expected))
+    latencies = np.array(latencies) * 1000
+    return np.percentile(latencies, 50), np.percentile(latencies, 95), hits / (len(queries) * k)
+
+
+def tune(vectors, types, queries=200, k=3, nprobes=(1, 4, 16, 64), ef_searches=(16, 32, 64, 128)):
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    queries = make_queries(vectors, queries)
+    exact = faiss.IndexFlatL2(dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    threads = faiss.omp_get_max_threads()
+    print(f"{n} vectors x {dim} dims, {len(queries)} queries, recall@{k} vs exact search\n")
+    print(f"{'type':<10} {'setting':<13} {'MB':>8} {'B/vec':>7} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+    for kind in types:
+        started = time.perf_counter()
+        index = build_index(vectors, kind)
+        build_seconds = time.perf_counter() - started
+        size = index_bytes(index)
+
+        if faiss.try_extract_index_ivf(index) is not None:
+            nlist = faiss.extract_index_ivf(index).nlist
+            settings = [("nprobe", v) for v in nprobes if v <= nlist]
+        elif hasattr(index, "hnsw"):
+            settings = [("efSearch", v) for v in ef_searches]
+        else:
+            settings = [(None, None)]
+
+        for name, value in settings:
+            set_search_params(index, value if name == "nprobe" else None, value if name == "efSearch" else None)
+            # Latency of a single request, not of faiss's batch parallelism
+            faiss.omp_set_num_threads(1)
+            p50, p95, recall = measure(index, queries, truth, k)
+            faiss.omp_set_num_threads(threads)
+            label = f"{name}={value}" if name else "-"
+            print(f"{kind:<10} {label:<13} {size / 1e6:8.2f} {size / n:7.0f} {build_seconds:8.2f} "
+                  f"{p50:8.3f} {p95:8.3f} {recall:7.3f}")
+
+
+def build(kind, nlist=None, nprobe=None, ef_search=None, ef_construction=None):
+    from vector_index import make_embeddings, build_vectorstore, publish
+    options = {name: value for name, value in
+               {"nlist": nlist, "nprobe": nprobe, "ef_search": ef_search, "ef_construction": ef_construction}.items()
+               if value is not None}
+    vectorstore = build_vectorstore(make_embeddings(), kind, **options)
+    # Recorded in the version's manifest, so rebuilds after a crawl keep this type
+    version = publish(vectorstore, settings={"type": kind, "options": options})
+    print(f"Published {version}: {describe(vectorstore.index)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="Build and publish the index")
+    build_parser.add_argument("--type", choices=INDEX_TYPES, default=INDEX_TYPE)
+    build_parser.add_argument("--nlist", type=int, help="IVF clusters (default: about 4*sqrt(n))")
+    build_parser.add_argument("--nprobe", type=int, help="IVF clusters searched per query")
+    build_parser.add_argument("--ef-search", type=int, help="HNSW candidate list size at query time")
+    build_parser.add_argument("--ef-construction", type=int, help="HNSW candidate list size while building")
+
+    tune_parser = commands.add_parser("tune", help="Compare index types on memory, latency and recall")
+    tune_parser.add_argument("--types", default=",".join(INDEX_TYPES),
+                             help="Comma-separated index types (default: all)")
+    tune_parser.add_argument("--vectors", help="Cache file (.npy) for the embedded corpus")
+    tune_parser.add_argument("--synthetic", type=int, help="Use N synthetic vectors instead of the corpus")
+    tune_parser.add_argument("--queries", type=int, default=200)
+    tune_parser.add_argument("--k", type=int, default=3, help="Results per query (model.py retrieves 3)")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        build(args.type, args.nlist, args.nprobe, args.ef_search, args.ef_construction)
+    else:
+        vectors = synthetic_vectors(args.synthetic) if args.synthetic else corpus_vectors(args.vectors)
+        tune(vectors, [t.strip() for t in args.types.split(",") if t.strip()], args.queries, args.k)
@@ -0,0 +1,115 @@
+"""
+index_types.py
+
+FAISS index types for the retrieval index, beyond the default exact search.
+
+    flat      exact search over float32 vectors (4 bytes/dim)
+    sq8       exact scan over 8-bit scalar-quantized vectors (1 byte/dim)
+    pq        product quantization, DIM/8 sub-quantizers (1 byte per 8 dims)
+    ivf       inverted file: k-means centroids, search only nprobe clusters
+    ivf-sq8   IVF over SQ8 codes
+    ivf-pq    IVF over PQ codes, the smallest and fastest for large corpora
+    hnsw      HNSW graph over float32 vectors, efSearch controls recall
+    hnsw-sq8  HNSW graph over SQ8 codes
+
+nlist (IVF cluster count) and the PQ code size are derived from the number of
+vectors unless given. Search-time settings (nprobe, efSearch) are stored in
+the FAISS file, so a tuned index keeps them after publishing.
+
+Only flat-code indexes (flat, sq8, pq) support the in-place deletes that the
+crawl-to-index pipeline relies on; IVF and HNSW indexes are rebuilt instead.
+"""
+import math
+import os
+
+import faiss
+import numpy as np
+
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+INDEX_TYPES = ("flat", "sq8", "pq", "ivf", "ivf-sq8", "ivf-pq", "hnsw", "hnsw-sq8")
+HNSW_M = 32
+# faiss warns below 39 training points per centroid
+MIN_POINTS_PER_CENTROID = 39
+
+
+def default_nlist(n):
+    """About 4*sqrt(n) clusters, with enough training points for each"""
+    return max(1, min(int(4 * math.sqrt(n)), n // MIN_POINTS_PER_CENTROID))
+
+
+def pq_code(dim, n):
+    """PQ sub-quantizers and bits per code for dim-dimensional vectors, or None if n is too small to train"""
+    m = max(1, dim // 8)
+    while dim % m:
+        m -= 1
+    nbits = min(8, int(math.log2(max(n // MIN_POINTS_PER_CENTROID, 1))))
+    return (m, nbits) if nbits >= 4 else None
+
+
+def factory_string(kind, n, dim, nlist=None):
+    """faiss.index_factory description for one of INDEX_TYPES"""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"unknown index type {kind!r}; expected one of {', '.join(INDEX_TYPES)}")
+    nlist = nlist or default_nlist(n)
+    code = pq_code(dim, n)
+    if kind.endswith("pq") and code is None:
+        print(f"⚠️ {n} vectors are too few to train PQ; using SQ8 codes")
+        kind = kind.replace("pq", "sq8")
+    if kind.startswith("ivf") and nlist < 2:
+        print(f"⚠️ {n} vectors are too few for IVF; using a flat scan")
+        kind = kind.replace("ivf-", "").replace("ivf", "flat")
+
+    storage = {"sq8": "SQ8", "pq": "PQ{}x{}".format(*code) if code else ""}
+    if kind == "flat":
+        return "Flat"
+    if kind in storage:
+        return storage[kind]
+    if kind.startswith("ivf"):
+        return f"IVF{nlist}," + storage.get(kind[4:], "Flat")
+    return f"HNSW{HNSW_M}" + ("," + storage[kind[5:]] if kind != "hnsw" else "")
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """Apply query-time settings where the index type has them"""
+    params = faiss.ParameterSpace()
+    if nprobe is not None and faiss.try_extract_index_ivf(index) is not None:
+        params.set_index_parameter(index, "nprobe", nprobe)
+    if ef_search is not None and hasattr(index, "hnsw"):
+        params.set_index_parameter(index, "efSearch", ef_search)
+    return index
+
+
+def build_index(vectors, kind=INDEX_TYPE, nlist=None, nprobe=None, ef_search=None, ef_construction=None):
+    """Train (if needed) and fill a FAISS index of the given type with vectors"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    index = faiss.index_factory(dim, factory_string(kind, n, dim, nlist))
+    if ef_construction and hasattr(index, "hnsw"):
+        index.hnsw.efConstruction = ef_construction
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    # Defaults that keep recall high; tune with `python index_tune.py tune`
+    if faiss.try_extract_index_ivf(index) is not None:
+        nprobe = nprobe or max(1, faiss.extract_index_ivf(index).nlist // 16)
+    return set_search_params(index, nprobe, ef_search)
+
+
+def supports_incremental(index):
+    """Whether LangChain's FAISS.delete()/add_embeddings() keep row ids consistent"""
+    return isinstance(index, faiss.IndexFlatCodes)
+
+
+def describe(index):
+    ivf = faiss.try_extract_index_ivf(index)
+    parts = [type(index).__name__, f"{index.ntotal} vectors", f"{index_bytes(index) / 1e6:.1f} MB"]
+    if ivf is not None:
+        parts.append(f"nlist={ivf.nlist} nprobe={ivf.nprobe}")
+    if hasattr(index, "hnsw"):
+        parts.append(f"efSearch={index.hnsw.efSearch}")
+    return ", ".join(parts)
+
+
+def index_bytes(index):
+    """Serialized size, a close proxy for the memory the index needs"""
+    return len(faiss.serialize_index(index))
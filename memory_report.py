@@ -0,0 +1,44 @@
+"""
+memory_report.py
+
+Per-process memory figures for comparing server layouts.
+
+RSS counts shared pages in full in every process, so it overstates the cost
+of each gunicorn worker. On Linux the report also reads
+/proc/<pid>/smaps_rollup:
+- pss: resident memory with shared pages split between the processes sharing them
+- private: pages only this process maps, i.e. what one more worker costs
+- shared: pages also mapped by other processes (preloaded model, mmapped index)
+"""
+import os
+import resource
+import sys
+
+FIELDS = {'Rss': 'rss', 'Pss': 'pss', 'Shared_Clean': 'shared', 'Shared_Dirty': 'shared',
+          'Private_Clean': 'private', 'Private_Dirty': 'private'}
+
+
+def process_memory(pid='self'):
+    """Memory of a process in bytes: rss, plus pss/private/shared where /proc is available"""
+    report = {'pid': os.getpid() if pid == 'self' else pid}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in FIELDS:
+                    name = FIELDS[key]
+                    report[name] = report.get(name, 0) + int(value.split()[0]) * 1024
+        return report
+    except OSError:
+        pass
+    if pid == 'self':
+        # Peak rather than current RSS; ru_maxrss is KiB on Linux and bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        report['rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    return report
+
+
+def format_memory(report):
+    parts = [f"{name} {report[name] / 1e6:.0f} MB" for name in ('rss', 'pss', 'private', 'shared')
+             if name in report]
+    return f"pid {report['pid']}: " + ", ".join(parts)
@@ -1,67 +1,55 @@
 import os
-import json
+import threading
+import time
 from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage, AIMessage
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_core.documents import Document
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from dotenv import load_dotenv
-from PyPDF2 import PdfReader
+from vector_index import make_embeddings, load_or_build, load_version, current_version
 
 # Load environment variables
 load_dotenv()
 groq_api_key = os.getenv("GROQ_API_KEY") or "gsk_dummy_key_for_startup_prevent_crash"
 
-# Step 1: Extract text from PDFs in output/media
-pdf_text = ""
-pdf_folder = "output/media"
-
-# Ensure directories exist
-if not os.path.exists(pdf_folder):
-    os.makedirs(pdf_folder, exist_ok=True)
-
-for file in os.listdir(pdf_folder):
-    if file.endswith(".pdf"):
-        try:
-            reader = PdfReader(os.path.join(pdf_folder, file))
-            for page in reader.pages:
-                pdf_text += page.extract_text() + "\n"
-        except Exception as e:
-            print(f"⚠️ Could not read {file}: {e}")
-
-# Step 2: Load JSON text
-json_text = ""
-json_path = "output/output.json"
-if os.path.exists(json_path):
-    with open(json_path, "r", encoding="utf-8") as f:
-        try:
-            json_data = json.load(f)
-            json_text = json.dumps(json_data, indent=2)
-        except:
-            pass # json_text remains empty if load fails
-
-all_text = pdf_text + "\n" + json_text
-
-# Step 3: Split into documents
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=500,
-    chunk_overlap=50,
-    length_function=len,
-)
-
-split_docs = text_splitter.split_text(all_text)
-if not split_docs:
-    # Fallback to avoid FAISS error on empty documents
-    split_docs = ["Welcome to AstroBot! I am ready to help you with ISRO and MOSDAC information once data is loaded."]
-
-documents = [Document(page_content=chunk) for chunk in split_docs]
-
-# Step 4: Create embeddings and vector store
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-vectorstore = FAISS.from_documents(documents=documents, embedding=embeddings)
+# Steps 1-4: Load the published vector index (building it from output/ if needed).
+# INDEX_MMAP=1 memory-maps the index and chunk store so server processes share one copy.
+INDEX_MMAP = os.getenv("INDEX_MMAP", "0") == "1"
+embeddings = make_embeddings()
+vectorstore, index_version = load_or_build(embeddings, mapped=INDEX_MMAP)
 retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 3})
 
+# Hot-swap to a newer published index (e.g. from the crawl-to-index pipeline)
+INDEX_CHECK_SECONDS = 30
+_index_lock = threading.Lock()
+_last_index_check = time.monotonic()
+_index_loading = False
+
+def _swap_index(version):
+    global vectorstore, retriever, index_version, _index_loading
+    try:
+        new_store = load_version(version, embeddings, mapped=INDEX_MMAP)
+        new_retriever = new_store.as_retriever(search_type="similarity", search_kwargs={"k": 3})
+        # Single assignments are atomic; in-flight requests keep the old retriever
+        vectorstore, retriever, index_version = new_store, new_retriever, version
+        print(f"🔄 Switched to index {version}")
+    except Exception as e:
+        print(f"⚠️ Could not load index {version}: {e}")
+    finally:
+        _index_loading = False
+
+def get_retriever():
+    """Current retriever, starting a background reload when a newer index has been published"""
+    global _last_index_check, _index_loading
+    now = time.monotonic()
+    if now - _last_index_check >= INDEX_CHECK_SECONDS:
+        with _index_lock:
+            if now - _last_index_check >= INDEX_CHECK_SECONDS and not _index_loading:
+                _last_index_check = now
+                version = current_version()
+                if version and version != index_version:
+                    _index_loading = True
+                    threading.Thread(target=_swap_index, args=(version,), daemon=True).start()
+    return retriever
+
 # Step 5: Initialize the ChatGroq model
 model = ChatGroq(model="llama-3.1-8b-instant", groq_api_key=groq_api_key, temperature=0.7)
 
@@ -93,7 +81,7 @@ def get_response(question, chat_history=[]):
     if question.lower() in ["/new", "/reset", "new chat", "reset chat"]:
         return "Starting a new chat session. Previous context has been cleared.", []
 
-    docs = retriever.invoke(question)
+    docs = get_retriever().invoke(question)
     context = format_docs(docs)
 
     if not is_relevant_question(question, context):
@@ -17,4 +17,10 @@ class ChatMessage(db.Model):
     role = db.Column(db.String(10), nullable=False)  # 'user' or 'assistant'
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    mode = db.Column(db.String(20), default='isro')  # 'isro', 'weather', 'auto'
\ No newline at end of file
+    mode = db.Column(db.String(20), default='isro')  # 'isro', 'weather', 'auto'
+
+class JobLease(db.Model):
+    """Database-wide lease so a periodic job runs in one process at a time"""
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
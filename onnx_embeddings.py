@@ -0,0 +1,181 @@
+"""
+onnx_embeddings.py
+
+ONNX Runtime backend for the all-MiniLM-L6-v2 embeddings, selected with
+EMBEDDING_BACKEND=onnx (see vector_index.make_embeddings).
+
+It produces the same vectors as sentence-transformers (mean pooling over
+the attention mask, then L2 normalisation) without importing torch, which
+dominates the app's import time and RSS. The int8 model is the default;
+EMBEDDING_ONNX_INT8=0 uses the float32 export.
+
+Concurrent embed_query() calls from the server threads are micro-batched:
+a single inference thread waits up to EMBEDDING_BATCH_WAIT_MS for more
+queries (at most EMBEDDING_MAX_BATCH) and runs them as one batch.
+
+    python onnx_embeddings.py export   download the ONNX export and tokenizer, quantize to int8
+    python onnx_embeddings.py parity   compare against the sentence-transformers vectors
+"""
+import argparse
+import os
+import queue
+import shutil
+import sys
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+from langchain_core.embeddings import Embeddings
+from tokenizers import Tokenizer
+
+MODEL_REPO = "sentence-transformers/all-MiniLM-L6-v2"
+MODEL_DIR = Path(os.getenv("EMBEDDING_ONNX_DIR", "data/onnx/all-MiniLM-L6-v2"))
+USE_INT8 = os.getenv("EMBEDDING_ONNX_INT8", "1") == "1"
+THREADS = int(os.getenv("EMBEDDING_THREADS", "0")) or None
+MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "16"))
+BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "2"))
+MAX_LENGTH = 256  # the model's max_seq_length in sentence-transformers
+DOCUMENT_BATCH = 32
+PARITY_MIN_COSINE = 0.99
+
+
+def model_path(model_dir=MODEL_DIR, int8=USE_INT8):
+    return Path(model_dir) / ("model.int8.onnx" if int8 else "model.onnx")
+
+
+def make_session(path, threads=THREADS):
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+    # One batch at a time; parallelism comes from intra-op threads
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    return ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+
+
+class OnnxEmbeddings(Embeddings):
+    def __init__(self, model_dir=MODEL_DIR, int8=USE_INT8, threads=THREADS,
+                 max_batch=MAX_BATCH, batch_wait_ms=BATCH_WAIT_MS):
+        path = model_path(model_dir, int8)
+        if not path.exists():
+            raise FileNotFoundError(f"{path} not found; run `python onnx_embeddings.py export`")
+        self.session = make_session(path, threads)
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(str(Path(model_dir) / "tokenizer.json"))
+        self.tokenizer.enable_truncation(MAX_LENGTH)
+        self.tokenizer.enable_padding()
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait_ms / 1000
+        self._queries = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self.batches = 0
+        self.batched_queries = 0
+
+    def _encode(self, texts):
+        """Token embeddings -> mean pooling over the attention mask -> unit vectors"""
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        tokens = self.session.run(None, feeds)[0]
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (tokens * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        vectors = [self._encode(texts[i:i + DOCUMENT_BATCH]) for i in range(0, len(texts), DOCUMENT_BATCH)]
+        return np.concatenate(vectors).tolist() if vectors else []
+
+    def embed_query(self, text):
+        if self.max_batch <= 1:
+            return self._encode([text])[0].tolist()
+        self._ensure_worker()
+        future = Future()
+        self._queries.put((text, future))
+        return future.result()
+
+    def _ensure_worker(self):
+        # is_alive(): a thread started before a fork does not exist in the child
+        if self._worker is None or not self._worker.is_alive():
+            with self._worker_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._batch_loop, name="embed-batcher", daemon=True)
+                    self._worker.start()
+
+    def _batch_loop(self):
+        while True:
+            batch = [self._queries.get()]
+            # Collect whatever else arrives within the wait window
+            try:
+                while len(batch) < self.max_batch:
+                    batch.append(self._queries.get(timeout=self.batch_wait))
+            except queue.Empty:
+                pass
+            try:
+                vectors = self._encode([text for text, _ in batch])
+                for (_, future), vector in zip(batch, vectors):
+                    future.set_result(vector.tolist())
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            self.batches += 1
+            self.batched_queries += len(batch)
+
+
+# ---------------- CLI ---------------- #
+
+def export(model_dir=MODEL_DIR):
+    """Fetch the ONNX export and tokenizer published with the model and write an int8 copy"""
+    from huggingface_hub import hf_hub_download
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model_dir = Path(model_dir)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    for remote, local in (("onnx/model.onnx", "model.onnx"), ("tokenizer.json", "tokenizer.json")):
+        shutil.copy(hf_hub_download(MODEL_REPO, remote), model_dir / local)
+    # Weights only; activations are quantized per batch at run time
+    quantize_dynamic(model_dir / "model.onnx", model_dir / "model.int8.onnx", weight_type=QuantType.QInt8)
+    for name in ("model.onnx", "model.int8.onnx"):
+        print(f"{model_dir / name}: {(model_dir / name).stat().st_size / 1e6:.1f} MB")
+
+
+def parity(samples=200):
+    """
+    Cosine similarity between sentence-transformers and ONNX vectors for corpus
+    chunks and sample questions. Exits non-zero if any falls below PARITY_MIN_COSINE.
+    """
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from vector_index import EMBEDDING_MODEL, build_documents
+
+    texts = [doc.page_content for doc in build_documents()[:samples]] + [
+        "What is MOSDAC?", "Which satellites carry a scatterometer?",
+        "How do I download INSAT-3D rainfall products?", "ocean colour data",
+    ]
+    reference = np.array(HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL).embed_documents(texts))
+    ok = True
+    for int8 in (False, True):
+        vectors = np.array(OnnxEmbeddings(int8=int8, max_batch=1).embed_documents(texts))
+        cosine = (reference * vectors).sum(axis=1) / (
+            np.linalg.norm(reference, axis=1) * np.linalg.norm(vectors, axis=1))
+        label = "int8" if int8 else "fp32"
+        print(f"{label}: {len(texts)} texts, cosine min {cosine.min():.4f} mean {cosine.mean():.4f}")
+        ok &= bool(cosine.min() >= PARITY_MIN_COSINE)
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("--samples", type=int, default=200, help="Corpus chunks compared by parity")
+    args = parser.parse_args()
+    if args.command == "export":
+        export()
+    elif not parity(args.samples):
+        print(f"Parity check failed: cosine below {PARITY_MIN_COSINE}")
+        sys.exit(1)
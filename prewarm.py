@@ -0,0 +1,137 @@
+"""
+prewarm.py
+
+Background pre-warming of weather data for popular regions.
+
+/set_region reports each region choice to RegionPopularity, which keeps
+exponentially decayed counts so recent demand outweighs old demand. A
+daemon thread wakes every PREWARM_INTERVAL_SECONDS (with jitter), and also
+just after each forecast model run is published, takes the top PREWARM_TOP_N
+regions and refreshes the forecast and advisory of any that are not cached
+or whose cached forecast has expired, using at most PREWARM_CONCURRENCY
+upstream calls at a time. A forecast expires when the next model run is
+published (forecast_cache.next_update), so refreshing earlier would only
+fetch the same run again. The thread only runs when PREWARM_ENABLED=1.
+"""
+import logging
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from forecast_cache import next_update
+from geocache import normalize_place
+
+logger = logging.getLogger(__name__)
+
+TOP_N = int(os.getenv('PREWARM_TOP_N', '20'))
+INTERVAL_SECONDS = float(os.getenv('PREWARM_INTERVAL_SECONDS', '300'))
+JITTER = float(os.getenv('PREWARM_JITTER', '0.2'))
+CONCURRENCY = int(os.getenv('PREWARM_CONCURRENCY', '2'))
+HALF_LIFE_HOURS = float(os.getenv('PREWARM_HALF_LIFE_HOURS', '24'))
+MAX_TRACKED = 1000
+
+
+class RegionPopularity:
+    """Exponentially decayed request counts per normalized region name"""
+
+    def __init__(self, half_life_hours=HALF_LIFE_HOURS, max_tracked=MAX_TRACKED):
+        self.decay = math.log(2) / (half_life_hours * 3600)
+        self.max_tracked = max_tracked
+        self._scores = {}  # key -> [score, updated_at, display name]
+        self._lock = threading.Lock()
+
+    def _decayed(self, score, updated_at, now):
+        return score * math.exp(-self.decay * (now - updated_at))
+
+    def record(self, region, now=None):
+        key = normalize_place(region)
+        if not key:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._scores.get(key)
+            score = self._decayed(entry[0], entry[1], now) if entry else 0.0
+            self._scores[key] = [score + 1.0, now, region]
+            if len(self._scores) > self.max_tracked:
+                coldest = min(self._scores, key=lambda k: self._decayed(*self._scores[k][:2], now))
+                del self._scores[coldest]
+
+    def top(self, n=TOP_N, now=None):
+        """Display names of the n most popular regions"""
+        now = time.time() if now is None else now
+        with self._lock:
+            ranked = sorted(
+                self._scores.values(),
+                key=lambda e: self._decayed(e[0], e[1], now),
+                reverse=True
+            )
+        return [e[2] for e in ranked[:n]]
+
+
+popularity = RegionPopularity()
+
+METRICS = {'cycles': 0, 'refreshed': 0, 'skipped': 0, 'errors': 0, 'last_cycle_seconds': None}
+
+
+def prewarm_cycle(refresh_region, expires_at, top_n=TOP_N, concurrency=CONCURRENCY):
+    """
+    Refresh popular regions that are missing or whose forecast has expired.
+
+    refresh_region(region) rebuilds forecast and advisory for a region;
+    expires_at(region) returns the epoch expiry of its cached forecast or None.
+    Returns the list of regions refreshed.
+    """
+    started = time.time()
+    due = []
+    for region in popularity.top(top_n):
+        expiry = expires_at(region)
+        # Before expiry the upstream still serves the run already cached
+        if expiry is None or time.time() >= expiry:
+            due.append(region)
+        else:
+            METRICS['skipped'] += 1
+
+    refreshed = []
+
+    def run(region):
+        try:
+            refresh_region(region)
+            refreshed.append(region)
+        except Exception as e:
+            METRICS['errors'] += 1
+            logger.warning(f'Pre-warm failed for {region}: {e}')
+
+    if due:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='prewarm') as pool:
+            list(pool.map(run, due))
+
+    METRICS['cycles'] += 1
+    METRICS['refreshed'] += len(refreshed)
+    METRICS['last_cycle_seconds'] = round(time.time() - started, 3)
+    return refreshed
+
+
+def start_scheduler(refresh_region, expires_at, interval_seconds=INTERVAL_SECONDS, jitter=JITTER):
+    """Run prewarm_cycle periodically in a daemon thread. Returns the stop event."""
+    stop = threading.Event()
+
+    def loop():
+        while True:
+            delay = interval_seconds * random.uniform(1 - jitter, 1 + jitter)
+            # Wake soon after the next model run is published; the jitter keeps
+            # every worker process from hitting the upstream at the same moment
+            until_published = next_update() - time.time()
+            delay = min(delay, until_published + random.uniform(0, jitter * interval_seconds))
+            if stop.wait(delay):
+                break
+            try:
+                prewarm_cycle(refresh_region, expires_at)
+            except Exception as e:
+                METRICS['errors'] += 1
+                logger.error(f'Pre-warm cycle failed: {e}')
+
+    threading.Thread(target=loop, name='weather-prewarm', daemon=True).start()
+    return stop
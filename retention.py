@@ -0,0 +1,256 @@
+"""
+retention.py
+
+Retention, archival and compaction for chat_history.db.
+
+Policies (environment variables, 0 disables a policy):
+- CHAT_RETENTION_DAYS: sessions not updated for this many days are archived and deleted
+- CHAT_MAX_MESSAGES_PER_SESSION: older messages beyond this cap are archived and deleted
+
+Archived rows are appended to a gzip-compressed NDJSON file in the same
+format as chat_transfer exports, so they can be restored with import-chats.
+Deletes run in small batches, each in its own short transaction, so the
+SQLite write lock is never held for long.
+
+The scheduler runs in every gunicorn worker, so a run first takes a lease
+row in job_lease (CHAT_RETENTION_LEASE_SECONDS long, released when the run
+ends); workers that find it held skip their run instead of archiving the
+same rows twice.
+"""
+import gzip
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import delete, func, or_, select, text, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ChatSession, ChatMessage, JobLease
+from chat_transfer import session_to_record, message_to_record
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = int(os.getenv('CHAT_RETENTION_DAYS', '180'))
+MAX_MESSAGES_PER_SESSION = int(os.getenv('CHAT_MAX_MESSAGES_PER_SESSION', '0'))
+ARCHIVE_DIR = Path(os.getenv('CHAT_ARCHIVE_DIR', 'archive'))
+BATCH_SIZE = int(os.getenv('CHAT_RETENTION_BATCH_SIZE', '200'))
+BATCH_PAUSE = float(os.getenv('CHAT_RETENTION_BATCH_PAUSE', '0.05'))
+VACUUM_PAGES = int(os.getenv('CHAT_RETENTION_VACUUM_PAGES', '500'))
+INTERVAL_HOURS = float(os.getenv('CHAT_RETENTION_INTERVAL_HOURS', '24'))
+LEASE_SECONDS = int(os.getenv('CHAT_RETENTION_LEASE_SECONDS', '3600'))
+LEASE_NAME = 'chat-retention'
+
+METRICS = {
+    'runs': 0,
+    'last_run_started': None,
+    'last_run_seconds': None,
+    'last_error': None,
+    'sessions_archived': 0,
+    'messages_archived': 0,
+    'pages_freed': 0,
+}
+_lock = threading.Lock()
+_holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _acquire_lease(seconds=LEASE_SECONDS):
+    """Take the retention lease if it is free or expired. Returns True if this process holds it."""
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=seconds)
+    try:
+        db.session.add(JobLease(name=LEASE_NAME, holder=_holder, expires_at=expires))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+    # The row exists: claim it only if it has expired (a crashed run) or is already ours
+    claimed = db.session.execute(
+        update(JobLease)
+        .where(JobLease.name == LEASE_NAME, or_(JobLease.expires_at < now, JobLease.holder == _holder))
+        .values(holder=_holder, expires_at=expires)
+    ).rowcount
+    db.session.commit()
+    return claimed == 1
+
+
+def _release_lease():
+    db.session.execute(delete(JobLease).where(JobLease.name == LEASE_NAME, JobLease.holder == _holder))
+    db.session.commit()
+
+
+def _archive_path():
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    return ARCHIVE_DIR / f"chat_archive_{datetime.utcnow().strftime('%Y%m%d')}.ndjson.gz"
+
+
+def _write_archive(records):
+    # Appending creates a new gzip member; readers (gzip.open) concatenate them transparently
+    with gzip.open(_archive_path(), 'at', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def archive_expired_sessions(days=RETENTION_DAYS, batch_size=BATCH_SIZE):
+    """Archive and delete sessions not updated in `days` days. Returns (sessions, messages)."""
+    if days <= 0:
+        return 0, 0
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    total_sessions = total_messages = 0
+
+    while True:
+        sessions = db.session.execute(
+            select(ChatSession)
+            .where(ChatSession.updated_at < cutoff)
+            .order_by(ChatSession.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not sessions:
+            break
+        ids = [s.id for s in sessions]
+        records = [session_to_record(s) for s in sessions]
+        messages = db.session.execute(
+            select(ChatMessage)
+            .where(ChatMessage.session_id.in_(ids))
+            .order_by(ChatMessage.session_id, ChatMessage.id)
+        ).scalars().all()
+        records.extend(message_to_record(m) for m in messages)
+
+        # Archive first: a crash after this point only re-archives the batch
+        _write_archive(records)
+        db.session.execute(delete(ChatMessage).where(ChatMessage.session_id.in_(ids)))
+        db.session.execute(delete(ChatSession).where(ChatSession.id.in_(ids)))
+        db.session.commit()
+        db.session.expunge_all()
+
+        total_sessions += len(ids)
+        total_messages += len(messages)
+        time.sleep(BATCH_PAUSE)
+
+    return total_sessions, total_messages
+
+
+def trim_long_sessions(cap=MAX_MESSAGES_PER_SESSION, batch_size=BATCH_SIZE):
+    """Archive and delete the oldest messages of sessions holding more than `cap`. Returns messages removed."""
+    if cap <= 0:
+        return 0
+    over = db.session.execute(
+        select(ChatMessage.session_id, func.count(ChatMessage.id))
+        .group_by(ChatMessage.session_id)
+        .having(func.count(ChatMessage.id) > cap)
+    ).all()
+    total = 0
+
+    for session_id, count in over:
+        excess = count - cap
+        while excess > 0:
+            messages = db.session.execute(
+                select(ChatMessage)
+                .where(ChatMessage.session_id == session_id)
+                .order_by(ChatMessage.id)
+                .limit(min(batch_size, excess))
+            ).scalars().all()
+            if not messages:
+                break
+            _write_archive(message_to_record(m) for m in messages)
+            db.session.execute(delete(ChatMessage).where(ChatMessage.id.in_([m.id for m in messages])))
+            db.session.commit()
+            db.session.expunge_all()
+
+            excess -= len(messages)
+            total += len(messages)
+            time.sleep(BATCH_PAUSE)
+
+    return total
+
+
+def incremental_vacuum(pages=VACUUM_PAGES, convert=False):
+    """
+    Return up to `pages` free pages to the filesystem (SQLite only).
+
+    Incremental vacuum needs auto_vacuum=INCREMENTAL; switching an existing
+    database requires one full VACUUM, which only happens when convert=True.
+    Returns the number of pages freed.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return 0
+    with db.engine.connect() as conn:
+        mode = conn.execute(text('PRAGMA auto_vacuum')).scalar()
+        if mode != 2:
+            if not convert:
+                return 0
+            conn.execute(text('PRAGMA auto_vacuum = INCREMENTAL'))
+            conn.execute(text('VACUUM'))
+        before = conn.execute(text('PRAGMA freelist_count')).scalar()
+        # Each step of the pragma frees one page and execute() steps it only once;
+        # executescript on the driver connection runs it to completion
+        conn.connection.dbapi_connection.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+        after = conn.execute(text('PRAGMA freelist_count')).scalar()
+        conn.commit()
+    return before - after
+
+
+def run_retention(convert_vacuum=False):
+    """Apply all retention policies once and update METRICS"""
+    if not _lock.acquire(blocking=False):
+        logger.info('Retention run already in progress, skipping')
+        return dict(METRICS)
+    try:
+        leased = _acquire_lease()
+    except Exception as e:
+        db.session.rollback()
+        _lock.release()
+        logger.error(f'Retention lease failed: {e}')
+        return dict(METRICS)
+    if not leased:
+        _lock.release()
+        logger.info('Retention run in progress in another process, skipping')
+        return dict(METRICS)
+    started = time.time()
+    METRICS['last_run_started'] = datetime.utcnow().isoformat()
+    try:
+        sessions, messages = archive_expired_sessions()
+        messages += trim_long_sessions()
+        pages = incremental_vacuum(convert=convert_vacuum)
+
+        METRICS['sessions_archived'] += sessions
+        METRICS['messages_archived'] += messages
+        METRICS['pages_freed'] += pages
+        METRICS['last_error'] = None
+        logger.info(f'Retention: archived {sessions} sessions, {messages} messages, freed {pages} pages')
+    except Exception as e:
+        db.session.rollback()
+        METRICS['last_error'] = str(e)
+        logger.error(f'Retention run failed: {e}')
+    finally:
+        METRICS['runs'] += 1
+        METRICS['last_run_seconds'] = round(time.time() - started, 3)
+        try:
+            _release_lease()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f'Retention lease release failed (expires on its own): {e}')
+        _lock.release()
+    return dict(METRICS)
+
+
+def start_scheduler(app, interval_hours=INTERVAL_HOURS):
+    """Run retention periodically in a daemon thread. Returns the stop event."""
+    stop = threading.Event()
+
+    def loop():
+        # Jitter the first run so multiple workers don't start together
+        delay = random.uniform(60, 300)
+        while not stop.wait(delay):
+            with app.app_context():
+                run_retention()
+            delay = interval_hours * 3600
+
+    threading.Thread(target=loop, name='chat-retention', daemon=True).start()
+    return stop
@@ -0,0 +1,87 @@
+"""
+bench_face_store.py
+
+Benchmark face matching: the previous path (a Python list of encodings passed
+to face_recognition.face_distance on every capture) against FaceStore's
+vectorized top-k over a memory-mapped matrix, and its opt-in HNSW index.
+
+Encodings are synthetic 128-d vectors shaped like dlib's (clusters of a few
+photos per student), so no images or dlib are needed.
+
+Usage: python benchmarks/bench_face_store.py [--students 1000,10000,50000] [--queries 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from face_store import FaceStore, faiss  # noqa: E402
+
+try:
+    from face_recognition import face_distance
+except ImportError:
+    # Same computation as face_recognition.face_distance
+    def face_distance(face_encodings, face_to_compare):
+        if len(face_encodings) == 0:
+            return np.empty((0))
+        return np.linalg.norm(face_encodings - face_to_compare, axis=1)
+
+
+def synthetic_roster(students, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0, 0.09, size=(students, 128))
+    encodings = centres + rng.normal(0, 0.02, size=centres.shape)
+    return encodings, centres
+
+
+def timed(label, fn, queries, expected):
+    started = time.perf_counter()
+    found = [fn(q) for q in queries]
+    elapsed = time.perf_counter() - started
+    accuracy = np.mean([f == e for f, e in zip(found, expected)])
+    print(f"  {label:<28} {elapsed / len(queries) * 1000:9.3f} ms/query  top-1 agreement {accuracy:6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', default="1000,10000,50000")
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    for students in [int(s) for s in args.students.split(",")]:
+        encodings, centres = synthetic_roster(students)
+        rng = np.random.default_rng(1)
+        picks = rng.integers(students, size=args.queries)
+        queries = centres[picks] + rng.normal(0, 0.02, size=(args.queries, 128))
+        # The list-of-arrays path's own answers are the reference
+        legacy = [e for e in encodings]
+        expected = [int(face_distance(legacy, q).argmin()) for q in queries]
+
+        print(f"\n{students} students")
+        with tempfile.TemporaryDirectory() as store_dir:
+            started = time.perf_counter()
+            store = FaceStore(store_dir, use_ann=False)
+            store.write(encodings, [{'student_id': str(i)} for i in range(students)])
+            print(f"  write + map                  {(time.perf_counter() - started) * 1000:9.1f} ms")
+
+            timed("list + face_distance", lambda q: int(face_distance(legacy, q).argmin()), queries, expected)
+            timed("FaceStore matrix top-1", lambda q: store.search(q, 1)[0][0], queries, expected)
+            if faiss is not None:
+                started = time.perf_counter()
+                FaceStore(store_dir, use_ann=True)
+                print(f"  HNSW build + save            {(time.perf_counter() - started) * 1000:9.1f} ms")
+                started = time.perf_counter()
+                ann_store = FaceStore(store_dir, use_ann=True)
+                print(f"  HNSW load (saved)            {(time.perf_counter() - started) * 1000:9.1f} ms")
+                timed("FaceStore HNSW top-1", lambda q: ann_store.search(q, 1)[0][0], queries, expected)
+            else:
+                print("  (faiss not installed; skipping HNSW)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+bench_local_store.py
+
+Time a day of offline attendance marks with the previous JSON queue (load,
+append and rewrite the whole file per mark) against the SQLite journal, then
+one sync pass of reading the pending entries and acknowledging them.
+
+Usage: python benchmarks/bench_local_store.py [--marks 500,2000,5000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from local_store import LocalStore  # noqa: E402
+
+
+def json_queue_marks(path, marks):
+    """The previous LocalStore.log_attendance; returns the seconds taken by the last mark"""
+    with open(path, 'w') as f:
+        json.dump([], f)
+    last = 0.0
+    for i in range(marks):
+        t = time.perf_counter()
+        with open(path, 'r') as f:
+            data = json.load(f)
+        data.append({'student_id': str(i), 'student_name': str(i), 'class': '10', 'section': 'A',
+                     'timestamp': '2026-01-01T09:00:00'})
+        with open(path, 'w') as f:
+            json.dump(data, f)
+        last = time.perf_counter() - t
+    return last
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--marks', default="500,2000,5000")
+    args = parser.parse_args()
+
+    print(f"{'marks':>6} {'json total s':>13} {'json last ms':>13} {'journal total s':>16} {'sync read+ack ms':>17}")
+    for marks in [int(m) for m in args.marks.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            started = time.perf_counter()
+            json_last = json_queue_marks(os.path.join(tmp, 'queue.json'), marks)
+            json_total = time.perf_counter() - started
+
+            store = LocalStore(os.path.join(tmp, 'journal.db'), os.path.join(tmp, 'none.json'))
+            started = time.perf_counter()
+            for i in range(marks):
+                store.log_attendance(str(i), str(i), '10', 'A')
+            journal_total = time.perf_counter() - started
+            started = time.perf_counter()
+            pending = store.pending()
+            store.acknowledge(pending[-1][0])
+            sync = time.perf_counter() - started
+            store.conn.close()
+        print(f"{marks:>6} {json_total:13.2f} {json_last * 1000:13.2f} {journal_total:16.2f} {sync * 1000:17.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+bench_sync.py
+
+Sync a backlog of offline attendance marks to the local Supabase stub with
+the previous Syncer (one POST per entry, no session, whole queue re-sent
+unless every POST succeeded) and with the batched Syncer, at a given
+failure rate. Reports wall time, passes until the journal is empty, HTTP
+requests and duplicate rows stored.
+
+Usage: python benchmarks/bench_sync.py [--marks 500] [--latency-ms 20] [--fail-rate 0.02] [--modes legacy,batched]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from local_store import LocalStore  # noqa: E402
+from stub_supabase import StubSupabase  # noqa: E402
+from sync import Syncer  # noqa: E402
+
+MAX_PASSES = 5
+
+
+def legacy_sync(store, url):
+    """The previous Syncer.sync, minus the connectivity probe"""
+    success = True
+    for entry in store.get_queue():
+        resp = requests.post(url, json=entry, headers={"Content-Type": "application/json"})
+        if not resp.ok:
+            success = False
+    if success:
+        store.clear_queue()
+    return success
+
+
+def run(mode, marks, latency_ms, fail_rate):
+    server = StubSupabase(('127.0.0.1', 0), latency_ms, fail_rate).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LocalStore(os.path.join(tmp, 'journal.db'), os.path.join(tmp, 'none.json'))
+        for i in range(marks):
+            store.log_attendance(f"S{i:05d}", f"Student {i}", '10', 'A')
+        syncer = Syncer(store, url=server.url) if mode == 'batched' else None
+        started = time.perf_counter()
+        for passes in range(1, MAX_PASSES + 1):
+            done = syncer.sync() if syncer else legacy_sync(store, server.url)
+            if done:
+                break
+        elapsed = time.perf_counter() - started
+        left = len(store.pending())
+        store.conn.close()
+    server.shutdown()
+    stats = server.stats
+    print(f"{mode:<8} {elapsed:8.2f} {passes:>7} {left:>6} {stats['requests']:>9} "
+          f"{stats['stored']:>7} {stats['duplicates']:>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--marks', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--fail-rate', type=float, default=0.02, help="Share of requests the stub answers 503")
+    parser.add_argument('--modes', default="legacy,batched")
+    args = parser.parse_args()
+
+    print(f"{args.marks} marks, {args.latency_ms:.0f} ms latency, {args.fail_rate:.0%} of requests fail\n")
+    print(f"{'mode':<8} {'time s':>8} {'passes':>7} {'left':>6} {'requests':>9} {'stored':>7} {'duplicates':>11}")
+    for mode in args.modes.split(','):
+        run(mode, args.marks, args.latency_ms, args.fail_rate)
+
+
+if __name__ == '__main__':
+    main()
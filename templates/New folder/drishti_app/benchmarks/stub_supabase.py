@@ -0,0 +1,101 @@
+"""
+stub_supabase.py
+
+Local stand-in for the Supabase attendance_logs REST endpoint, for testing
+sync without a network.
+
+Accepts POSTs of one row or a list of rows. Rows are keyed by their `id`
+(or by their content when they have none); with on_conflict and
+ignore-duplicates a repeated key is skipped, otherwise it is stored again
+and counted as a duplicate. Latency and a share of 503 answers are
+configurable. GET /stats returns the counters.
+
+Usage: python benchmarks/stub_supabase.py [--port 54321] [--latency-ms 50] [--fail-rate 0.1]
+Then: SUPABASE_URL=http://127.0.0.1:54321/rest/v1/attendance_logs
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATH = '/rest/v1/attendance_logs'
+
+
+class StubSupabase(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=50, fail_rate=0.0, seed=0):
+        super().__init__(address, Handler)
+        self.latency_ms = latency_ms
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.rows = {}
+        self.stats = {'requests': 0, 'failed': 0, 'rows_received': 0, 'stored': 0, 'duplicates': 0, 'ignored': 0}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{PATH}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=None):
+        data = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.startswith('/stats'):
+            with self.server.lock:
+                return self._reply(200, dict(self.server.stats, unique=len(self.server.rows)))
+        self._reply(404)
+
+    def do_POST(self):
+        server = self.server
+        if not self.path.startswith(PATH):
+            return self._reply(404)
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'null')
+        rows = body if isinstance(body, list) else [body]
+        if server.latency_ms:
+            time.sleep(max(0.0, server.rng.gauss(server.latency_ms, server.latency_ms * 0.25)) / 1000)
+        with server.lock:
+            server.stats['requests'] += 1
+            if server.rng.random() < server.fail_rate:
+                server.stats['failed'] += 1
+                return self._reply(503, {'message': 'stub unavailable'})
+            ignore = 'on_conflict=' in self.path and 'ignore-duplicates' in self.headers.get('Prefer', '')
+            for row in rows:
+                server.stats['rows_received'] += 1
+                key = row.get('id') or json.dumps(row, sort_keys=True)
+                if key in server.rows:
+                    server.stats['ignored' if ignore else 'duplicates'] += 1
+                    if ignore:
+                        continue
+                server.rows[key] = row
+                server.stats['stored'] += 1
+        self._reply(201)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="Share of requests answered 503")
+    args = parser.parse_args()
+    server = StubSupabase((args.host, args.port), args.latency_ms, args.fail_rate)
+    print(f"SUPABASE_URL={server.url}")
+    server.serve_forever()
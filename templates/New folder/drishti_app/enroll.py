@@ -0,0 +1,158 @@
+"""
+enroll.py
+
+Incremental enrollment of student photos from database/ into the face store.
+
+The store keeps a manifest of every photo it has seen (size, mtime, sha1 and
+whether a face was found). An update only encodes photos that are new or
+whose content changed, spreads that work over a process pool, keeps the rows
+of unchanged photos as they are, drops rows of photos that were removed, and
+publishes the result as one new store version. A photo that cannot be read
+or encoded is recorded in the manifest with its error instead of failing the
+whole update, and is retried on the next one.
+
+Usage: python enroll.py [--workers N]
+"""
+import argparse
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from face_store import DIM, FaceStore
+
+DATABASE_DIR = os.path.join(os.path.dirname(__file__), 'database')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def encode_image(path):
+    """Encoding of the first face in one photo, or None (runs in a pool worker)"""
+    import face_recognition
+    image = face_recognition.load_image_file(path)
+    encs = face_recognition.face_encodings(image)
+    return encs[0] if encs else None
+
+
+def plan(store, database_dir=DATABASE_DIR):
+    """
+    Compare database_dir with the store's manifest.
+    Returns (manifest for the photos on disk, names of photos to encode).
+    """
+    previous = store.files
+    # A store imported from encodings.pkl has rows but no manifest: trust its rows
+    # for photos still on disk rather than re-encoding the whole school
+    adopt = {m['filename'] for m in store.metadata} if previous is None else set()
+    previous = previous or {}
+    manifest = {}
+    pending = []
+    for fname in sorted(os.listdir(database_dir)):
+        if not fname.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        path = os.path.join(database_dir, fname)
+        st = os.stat(path)
+        entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+        old = previous.get(fname)
+        if old and 'error' in old:
+            old = None  # failed last time: encode again
+        if old and old['size'] == st.st_size and old['mtime_ns'] == st.st_mtime_ns:
+            manifest[fname] = old
+            continue
+        entry['sha1'] = file_digest(path)
+        if old and old['sha1'] == entry['sha1']:
+            manifest[fname] = dict(old, **entry)  # touched but not changed
+        elif fname in adopt:
+            manifest[fname] = dict(entry, faces=1)
+        else:
+            manifest[fname] = entry
+            pending.append(fname)
+    return manifest, pending
+
+
+def update(store, database_dir=DATABASE_DIR, workers=None, progress=None):
+    """
+    Bring the store up to date with database_dir.
+    progress(done, total, filename) is called as each photo finishes encoding.
+    Returns a summary dict; 'version' is None when nothing changed and
+    'errors' counts photos that failed to encode.
+    """
+    summary = {'added': 0, 'updated': 0, 'removed': 0, 'no_face': 0, 'errors': 0, 'unchanged': 0,
+               'version': None}
+    if not os.path.isdir(database_dir):
+        return summary
+    manifest, pending = plan(store, database_dir)
+    known = set(store.files or {}) | {m['filename'] for m in store.metadata}
+    removed = known - set(manifest)
+    summary['removed'] = len(removed)
+    summary['unchanged'] = len(manifest) - len(pending)
+    if not pending and manifest == store.files:
+        return summary
+
+    encoded = {}
+    failed = {}
+    paths = {fname: os.path.join(database_dir, fname) for fname in pending}
+    if workers == 1 or len(pending) <= 1:
+        for done, fname in enumerate(pending, 1):
+            try:
+                encoded[fname] = encode_image(paths[fname])
+            except Exception as e:
+                failed[fname] = f"{type(e).__name__}: {e}"
+            if progress:
+                progress(done, len(pending), fname)
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(encode_image, paths[fname]): fname for fname in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                fname = futures[future]
+                try:
+                    encoded[fname] = future.result()
+                except Exception as e:
+                    failed[fname] = f"{type(e).__name__}: {e}"
+                if progress:
+                    progress(done, len(pending), fname)
+
+    rows_by_file = {m['filename']: i for i, m in enumerate(store.metadata)}
+    encodings = []
+    metadata = []
+    for fname, entry in manifest.items():
+        if fname in failed:
+            summary['errors'] += 1
+            entry.update(faces=0, error=failed[fname])
+        elif fname in encoded:
+            summary['updated' if fname in known else 'added'] += 1
+            entry['faces'] = int(encoded[fname] is not None)
+            if encoded[fname] is None:
+                summary['no_face'] += 1
+                continue
+            encodings.append(encoded[fname])
+            metadata.append({'student_id': os.path.splitext(fname)[0], 'filename': fname})
+        elif fname in rows_by_file:
+            row = rows_by_file[fname]
+            encodings.append(np.asarray(store.matrix[row]))
+            metadata.append(store.metadata[row])
+    if manifest == store.files:
+        # Only photos that failed again, the same way
+        return summary
+    summary['version'] = store.write(np.array(encodings).reshape(-1, DIM), metadata, manifest)
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default=DATABASE_DIR)
+    parser.add_argument('--workers', type=int, default=None, help="Encoding processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    def report(done, total, fname):
+        print(f"[{done}/{total}] {fname}")
+
+    result = update(FaceStore(), args.database, args.workers, report)
+    print(', '.join(f"{k} {v}" for k, v in result.items()))
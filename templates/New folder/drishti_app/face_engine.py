@@ -3,47 +3,74 @@ face_engine.py
 
 Handles all face encoding and recognition logic for Drishti App.
 Runs 100% offline. Uses face_recognition (dlib-based) for encoding and matching.
+
+Enrollment can run on a background thread (start_enrollment) while the
+current store keeps serving recognition; the updated store replaces it in
+one reference swap once its new version is published.
 """
 
 import os
-import pickle
+import threading
 import face_recognition
+import numpy as np
+import enroll as enrollment
+from enroll import DATABASE_DIR
+from face_store import FaceStore, LEGACY_PKL_PATH
 
-ENCODINGS_PATH = os.path.join(os.path.dirname(__file__), 'encodings.pkl')
-DATABASE_DIR = os.path.join(os.path.dirname(__file__), 'database')
+DETECT_STEP = 4  # Detect faces on every 4th pixel row/column, encode at full resolution
 
 class FaceEngine:
-    def __init__(self):
-        self.encodings = []
-        self.metadata = []
-        if os.path.exists(ENCODINGS_PATH):
-            self._load_encodings()
-        else:
-            self._encode_database()
+    def __init__(self, store=None, enroll=True):
+        self.store = store or FaceStore()
+        if self.store.version is None and os.path.exists(LEGACY_PKL_PATH):
+            self.store.import_legacy()
+        if enroll:
+            self.enroll()
+
+    @property
+    def metadata(self):
+        return self.store.metadata
+
+    def enroll(self, workers=None, progress=None):
+        """
+        Encodes new or changed photos in database/ and publishes them to the face store.
+        """
+        # Update a separate store object so readers of self.store never see a half-loaded version
+        store = FaceStore(self.store.store_dir, self.store.use_ann)
+        summary = enrollment.update(store, DATABASE_DIR, workers, progress)
+        self.store = store
+        return summary
 
-    def _encode_database(self):
+    def start_enrollment(self, on_done=None, workers=None):
         """
-        Loads all images from database/, encodes faces, saves encodings.pkl, clears images from memory.
+        Run enroll() on a background thread. on_done(summary, error) is called
+        from that thread with the enroll() summary, or None and the exception.
         """
-        for fname in os.listdir(DATABASE_DIR):
-            if fname.lower().endswith(('.jpg', '.jpeg', '.png')):
-                path = os.path.join(DATABASE_DIR, fname)
-                image = face_recognition.load_image_file(path)
-                encs = face_recognition.face_encodings(image)
-                if encs:
-                    self.encodings.append(encs[0])
-                    self.metadata.append({
-                        'student_id': os.path.splitext(fname)[0],
-                        'filename': fname
-                    })
-        with open(ENCODINGS_PATH, 'wb') as f:
-            pickle.dump({'encodings': self.encodings, 'metadata': self.metadata}, f)
+        def run():
+            try:
+                summary = self.enroll(workers)
+            except Exception as e:
+                if on_done:
+                    on_done(None, e)
+                return
+            if on_done:
+                on_done(summary, None)
+
+        thread = threading.Thread(target=run, name='enrollment', daemon=True)
+        thread.start()
+        return thread
 
-    def _load_encodings(self):
-        with open(ENCODINGS_PATH, 'rb') as f:
-            data = pickle.load(f)
-            self.encodings = data['encodings']
-            self.metadata = data['metadata']
+    def match(self, face_enc, threshold=0.45, k=1):
+        """
+        Top-k store matches for one encoding as [(student_id, confidence)] with confidence >= threshold
+        """
+        store = self.store
+        matches = []
+        for row, dist in store.search(face_enc, k):
+            confidence = 1 - dist  # Lower distance = higher confidence
+            if confidence >= threshold:
+                matches.append((store.metadata[row]['student_id'], confidence))
+        return matches
 
     def recognize(self, image, threshold=0.45):
         """
@@ -52,13 +79,29 @@ class FaceEngine:
         encs = face_recognition.face_encodings(image)
         if not encs:
             return None, None
-        face_enc = encs[0]
-        if not self.encodings:
-            return None, None
-        dists = face_recognition.face_distance(self.encodings, face_enc)
-        min_idx = dists.argmin()
-        min_dist = dists[min_idx]
-        confidence = 1 - min_dist  # Lower distance = higher confidence
-        if confidence >= threshold:
-            return self.metadata[min_idx]['student_id'], confidence
+        matches = self.match(encs[0], threshold)
+        if matches:
+            return matches[0]
         return None, None
+
+    def recognize_faces(self, image, threshold=0.45, step=DETECT_STEP):
+        """
+        Every face in one RGB frame as [(student_id or None, confidence, (top, right, bottom, left))].
+        Detection runs on a downscaled copy; all faces are encoded and matched as one batch.
+        """
+        small = np.ascontiguousarray(image[::step, ::step])
+        locations = [(top * step, right * step, bottom * step, left * step)
+                     for top, right, bottom, left in face_recognition.face_locations(small)]
+        if not locations:
+            return []
+        encs = face_recognition.face_encodings(image, known_face_locations=locations)
+        store = self.store  # one version for the whole frame, even if enrollment swaps it
+        faces = []
+        for location, matches in zip(locations, store.search_many(encs, 1)):
+            student_id, confidence = None, None
+            if matches:
+                row, dist = matches[0]
+                if 1 - dist >= threshold:
+                    student_id, confidence = store.metadata[row]['student_id'], 1 - dist
+            faces.append((student_id, confidence, location))
+        return faces
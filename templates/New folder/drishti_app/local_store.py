@@ -2,39 +2,100 @@
 local_store.py
 
 Handles local attendance storage and queuing for offline-first operation.
+
+Attendance is an append-only journal in SQLite (WAL mode): each mark is one
+INSERT, so logging stays O(1) however long the app has been offline, and a
+crash mid-write can't corrupt earlier entries. Each new entry gets a random
+uuid4 `id`, its idempotency key when synced, so two identical marks stay two
+rows. Entries carry an increasing sequence number; the sync cursor records the highest one the server has
+acknowledged, and acknowledged entries are compacted away.
 """
 import os
 import json
+import sqlite3
+import threading
+import uuid
 from datetime import datetime
 
-ATTENDANCE_PATH = os.path.join(os.path.dirname(__file__), 'attendance_queue.json')
+JOURNAL_PATH = os.path.join(os.path.dirname(__file__), 'attendance.db')
+LEGACY_QUEUE_PATH = os.path.join(os.path.dirname(__file__), 'attendance_queue.json')
 
 class LocalStore:
-    def __init__(self):
-        if not os.path.exists(ATTENDANCE_PATH):
-            with open(ATTENDANCE_PATH, 'w') as f:
-                json.dump([], f)
+    def __init__(self, path=JOURNAL_PATH, legacy_path=LEGACY_QUEUE_PATH):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # NORMAL in WAL mode fsyncs at checkpoints rather than on every mark;
+        # committed marks survive an app crash, a power cut may lose the latest few
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS attendance '
+                          '(seq INTEGER PRIMARY KEY AUTOINCREMENT, entry TEXT NOT NULL)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        self._migrate_legacy(legacy_path)
+
+    def _migrate_legacy(self, legacy_path):
+        """Import the old attendance_queue.json once, then remove it"""
+        if not os.path.exists(legacy_path):
+            return
+        with self.lock:
+            if self._state('legacy_imported') is None:
+                with open(legacy_path, 'r') as f:
+                    entries = json.load(f)
+                with self.conn:
+                    self.conn.execute('BEGIN')
+                    self.conn.executemany('INSERT INTO attendance (entry) VALUES (?)',
+                                          [(json.dumps(e),) for e in entries])
+                    self._set_state('legacy_imported', 1)
+        os.remove(legacy_path)
+
+    def _state(self, name):
+        row = self.conn.execute('SELECT value FROM sync_state WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, name, value):
+        self.conn.execute('INSERT OR REPLACE INTO sync_state (name, value) VALUES (?, ?)', (name, value))
 
     def log_attendance(self, student_id, student_name, class_name, section):
         entry = {
+            'id': str(uuid.uuid4()),
             'student_id': student_id,
             'student_name': student_name,
             'class': class_name,
             'section': section,
             'timestamp': datetime.utcnow().isoformat()
         }
-        data = self._load_all()
-        data.append(entry)
-        with open(ATTENDANCE_PATH, 'w') as f:
-            json.dump(data, f)
+        with self.lock:
+            return self.conn.execute('INSERT INTO attendance (entry) VALUES (?)', (json.dumps(entry),)).lastrowid
+
+    @property
+    def cursor(self):
+        """Sequence number of the last entry the server acknowledged"""
+        with self.lock:
+            return self._state('cursor') or 0
+
+    def pending(self, limit=None, after=None):
+        """Unsynced entries as [(seq, entry)] in log order, starting after the cursor (or `after`)"""
+        with self.lock:
+            start = (self._state('cursor') or 0) if after is None else after
+            rows = self.conn.execute('SELECT seq, entry FROM attendance WHERE seq > ? ORDER BY seq LIMIT ?',
+                                     (start, -1 if limit is None else limit)).fetchall()
+        return [(seq, json.loads(entry)) for seq, entry in rows]
+
+    def acknowledge(self, seq):
+        """Advance the cursor to seq (never backwards) and compact everything up to it"""
+        with self.lock:
+            with self.conn:
+                self.conn.execute('BEGIN')
+                cursor = max(seq, self._state('cursor') or 0)
+                self._set_state('cursor', cursor)
+                self.conn.execute('DELETE FROM attendance WHERE seq <= ?', (cursor,))
+            self.conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
 
     def get_queue(self):
-        return self._load_all()
+        return [entry for _, entry in self.pending()]
 
     def clear_queue(self):
-        with open(ATTENDANCE_PATH, 'w') as f:
-            json.dump([], f)
-
-    def _load_all(self):
-        with open(ATTENDANCE_PATH, 'r') as f:
-            return json.load(f)
+        with self.lock:
+            last = self.conn.execute('SELECT MAX(seq) FROM attendance').fetchone()[0]
+        if last is not None:
+            self.acknowledge(last)
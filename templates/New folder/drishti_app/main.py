@@ -11,12 +11,13 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.image import Image
 from kivy.uix.button import Button
 from kivy.uix.label import Label
-from kivy.clock import Clock
+from kivy.clock import Clock, mainthread
 from kivy.graphics.texture import Texture
 from kivy.uix.screenmanager import ScreenManager, Screen
 import cv2
 import numpy as np
 from face_engine import FaceEngine
+from recognition_worker import RecognitionWorker
 from local_store import LocalStore
 from sync import Syncer
 from splash import SplashScreen
@@ -25,7 +26,10 @@ class DrishtiMainScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         layout = BoxLayout(orientation='vertical')
-        self.face_engine = FaceEngine()
+        # Enrolling new photos can take a while: do it off the UI thread
+        self.face_engine = FaceEngine(enroll=False)
+        self.face_engine.start_enrollment(self.on_enrolled)
+        self.recognizer = RecognitionWorker(self.face_engine, self.on_recognized, on_error=self.on_recognition_failed)
         self.local_store = LocalStore()
         self.syncer = Syncer()
         self.camera = cv2.VideoCapture(0)
@@ -57,13 +61,31 @@ class DrishtiMainScreen(Screen):
             self.status_label.text = "No frame captured. Try again."
             return
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        student_id, confidence = self.face_engine.recognize(rgb_frame)
-        if student_id:
+        self.recognizer.submit(rgb_frame)
+        self.status_label.text = "Recognizing..."
+
+    @mainthread
+    def on_recognized(self, fresh, repeated, unknown):
+        for student_id, confidence in fresh:
             # For demo, use dummy name/class/section
             self.local_store.log_attendance(student_id, student_id, "10", "A")
-            self.status_label.text = f"{student_id} – Present (Confidence: {int(confidence*100)}%)"
-        else:
-            self.status_label.text = "Face not recognized."
+        lines = [f"{student_id} – Present (Confidence: {int(confidence*100)}%)" for student_id, confidence in fresh]
+        if repeated:
+            lines.append("Already marked: " + ", ".join(student_id for student_id, _ in repeated))
+        if unknown:
+            lines.append(f"{unknown} face(s) not recognized.")
+        self.status_label.text = "\n".join(lines) or "Face not recognized."
+
+    @mainthread
+    def on_enrolled(self, summary, error):
+        if error is not None:
+            self.status_label.text = f"Enrollment failed ({error}). Using existing faces."
+        elif summary['errors']:
+            self.status_label.text = f"{summary['errors']} photo(s) could not be enrolled."
+
+    @mainthread
+    def on_recognition_failed(self, exc):
+        self.status_label.text = f"Recognition failed ({exc}). Try again."
 
     def sync_attendance(self, instance):
         if self.syncer.sync():
@@ -72,6 +94,7 @@ class DrishtiMainScreen(Screen):
             self.status_label.text = "Offline or sync failed."
 
     def on_stop(self):
+        self.recognizer.stop()
         self.camera.release()
 
 
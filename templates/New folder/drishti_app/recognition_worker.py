@@ -0,0 +1,76 @@
+"""
+recognition_worker.py
+
+Runs face recognition on a background thread so the camera preview keeps
+updating while frames are processed.
+
+Frames are handed over through a one-slot queue: if the worker is still busy,
+a newer frame replaces the waiting one instead of piling up. Each result
+separates students seen for the first time within COOLDOWN_SECONDS from
+repeat detections, so holding the camera on a class doesn't re-log anyone.
+A frame that fails to process is reported through on_error and the worker
+moves on to the next one.
+"""
+import queue
+import threading
+import time
+
+COOLDOWN_SECONDS = 300
+
+
+class RecognitionWorker:
+    def __init__(self, face_engine, on_result, cooldown=COOLDOWN_SECONDS, on_error=None):
+        """
+        on_result(fresh, repeated, unknown) is called from the worker thread with
+        fresh/repeated as [(student_id, confidence)] and unknown as a face count.
+        on_error(exc) is called from the worker thread instead when a frame fails.
+        """
+        self.face_engine = face_engine
+        self.on_result = on_result
+        self.on_error = on_error
+        self.cooldown = cooldown
+        self.last_seen = {}
+        self._frames = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, name='recognition', daemon=True)
+        self._thread.start()
+
+    def submit(self, rgb_frame):
+        """Queue a frame for recognition, replacing any frame still waiting"""
+        while True:
+            try:
+                self._frames.put_nowait(rgb_frame)
+                return
+            except queue.Full:
+                try:
+                    self._frames.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def stop(self):
+        self.submit(None)
+
+    def _run(self):
+        while True:
+            frame = self._frames.get()
+            if frame is None:
+                return
+            try:
+                self._process(frame)
+            except Exception as exc:
+                # Keep the thread alive for the next capture
+                if self.on_error:
+                    self.on_error(exc)
+
+    def _process(self, frame):
+        faces = self.face_engine.recognize_faces(frame)
+        now = time.monotonic()
+        fresh, repeated, unknown = [], [], 0
+        for student_id, confidence, _ in faces:
+            if student_id is None:
+                unknown += 1
+            elif now - self.last_seen.get(student_id, -self.cooldown) >= self.cooldown:
+                self.last_seen[student_id] = now
+                fresh.append((student_id, confidence))
+            else:
+                repeated.append((student_id, confidence))
+        self.on_result(fresh, repeated, unknown)
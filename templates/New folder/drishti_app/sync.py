@@ -3,39 +3,95 @@ sync.py
 
 Handles syncing of attendance logs to Supabase.
 If offline, queues logs for later sync.
+
+Unsynced journal entries are uploaded in batches over one pooled session,
+with several batches in flight at once. Each row carries an idempotency key
+(its `id`) and is inserted with on_conflict=id / ignore-duplicates, so a
+batch that is retried or re-sent after a failure never creates duplicates.
+The journal cursor only advances past batches the server acknowledged, in
+log order, so an interrupted sync resumes where it stopped.
 """
 import os
+import json
+import uuid
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from local_store import LocalStore
 
-SUPABASE_URL = "https://YOUR_SUPABASE_PROJECT.supabase.co/rest/v1/attendance_logs"
-SUPABASE_API_KEY = "YOUR_SUPABASE_API_KEY"  # Store securely in production
+SUPABASE_URL = os.environ.get('SUPABASE_URL', "https://YOUR_SUPABASE_PROJECT.supabase.co/rest/v1/attendance_logs")
+SUPABASE_API_KEY = os.environ.get('SUPABASE_API_KEY', "YOUR_SUPABASE_API_KEY")  # Store securely in production
+BATCH_SIZE = 200
+CONCURRENCY = 4
+RETRIES = 3
+TIMEOUT = (5, 30)  # connect, read seconds
+ENTRY_NAMESPACE = uuid.UUID('6f1c2a52-3c1d-4a57-9a52-4d2f0b6e8d11')
+
+
+def entry_key(entry):
+    """
+    Idempotency key for one attendance entry: the `id` log_attendance stores,
+    or for entries imported from the old JSON queue (which have none) a uuid5
+    of the content, so identical legacy entries collapse to one row.
+    """
+    if entry.get('id'):
+        return entry['id']
+    return str(uuid.uuid5(ENTRY_NAMESPACE, json.dumps(entry, sort_keys=True)))
+
 
 class Syncer:
-    def __init__(self):
-        self.store = LocalStore()
+    def __init__(self, store=None, url=SUPABASE_URL, api_key=SUPABASE_API_KEY,
+                 batch_size=BATCH_SIZE, concurrency=CONCURRENCY):
+        self.store = store or LocalStore()
+        self.url = url
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.session = requests.Session()
+        # Retrying POSTs is safe because every row is keyed
+        retry = Retry(total=RETRIES, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=None, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            "apikey": api_key,
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Prefer": "resolution=ignore-duplicates,return=minimal"
+        })
+        self.synced = 0
 
-    def is_online(self):
+    def _post(self, batch):
+        rows = [dict(entry, id=entry_key(entry)) for _, entry in batch]
         try:
-            requests.get("https://www.google.com", timeout=2)
-            return True
+            resp = self.session.post(self.url, params={'on_conflict': 'id'}, json=rows, timeout=TIMEOUT)
         except requests.RequestException:
             return False
+        return resp.ok
 
     def sync(self):
-        if not self.is_online():
-            return False
-        queue = self.store.get_queue()
-        headers = {
-            "apikey": SUPABASE_API_KEY,
-            "Authorization": f"Bearer {SUPABASE_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        success = True
-        for entry in queue:
-            resp = requests.post(SUPABASE_URL, json=entry, headers=headers)
-            if not resp.ok:
-                success = False
-        if success:
-            self.store.clear_queue()
-        return success
+        """
+        Upload everything pending. Returns True once the journal is fully
+        acknowledged, False if offline or a batch failed (the rest resumes next time).
+        """
+        self.synced = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while True:
+                window = self.store.pending(limit=self.batch_size * self.concurrency)
+                if not window:
+                    return True
+                batches = [window[i:i + self.batch_size] for i in range(0, len(window), self.batch_size)]
+                results = list(pool.map(self._post, batches))
+                # Advance over the acknowledged prefix only; batches after a
+                # failure are re-sent next time and ignored by the server as duplicates
+                acked = None
+                for batch, ok in zip(batches, results):
+                    if not ok:
+                        break
+                    acked = batch[-1][0]
+                    self.synced += len(batch)
+                if acked is not None:
+                    self.store.acknowledge(acked)
+                if not all(results):
+                    return False
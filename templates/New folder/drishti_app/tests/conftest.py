@@ -0,0 +1,6 @@
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.join(APP_DIR, 'benchmarks'))
@@ -0,0 +1,56 @@
+import pytest
+
+import sync
+from local_store import LocalStore
+from stub_supabase import StubSupabase
+from sync import Syncer
+
+MARKS = 200
+
+
+@pytest.fixture
+def server():
+    server = StubSupabase(('127.0.0.1', 0), latency_ms=0, seed=7).start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalStore(str(tmp_path / 'journal.db'), str(tmp_path / 'none.json'))
+    for i in range(MARKS):
+        store.log_attendance(f"S{i:05d}", f"Student {i}", '10', 'A')
+    yield store
+    store.conn.close()
+
+
+@pytest.fixture(autouse=True)
+def no_http_retries(monkeypatch):
+    # Let every injected 503 reach Syncer instead of being retried away
+    monkeypatch.setattr(sync, 'RETRIES', 0)
+
+
+def test_cursor_only_advances_over_acknowledged_batches(server, store):
+    ids = {seq: entry['id'] for seq, entry in store.pending()}
+    server.fail_rate = 0.3
+    syncer = Syncer(store, url=server.url, batch_size=10, concurrency=4)
+    for _ in range(50):
+        done = syncer.sync()
+        cursor = store.cursor
+        assert all(ids[seq] in server.rows for seq in ids if seq <= cursor)
+        if done:
+            break
+    assert done and store.pending() == []
+    assert server.stats['failed'] > 0
+    assert len(server.rows) == MARKS and server.stats['duplicates'] == 0
+
+
+def test_failed_sync_resumes_without_duplicates(server, store):
+    syncer = Syncer(store, url=server.url, batch_size=10, concurrency=4)
+    server.fail_rate = 1.0
+    assert syncer.sync() is False
+    assert store.cursor == 0 and len(store.pending()) == MARKS
+
+    server.fail_rate = 0.0
+    assert syncer.sync() is True
+    assert len(server.rows) == MARKS and server.stats['duplicates'] == 0
@@ -0,0 +1,89 @@
+import json
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from chat_transfer import import_lines, iter_export_lines
+from models import db, ChatSession, ChatMessage
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'chat.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def add_session(title, *contents, id=None):
+    session = ChatSession(id=id, title=title, created_at=datetime(2026, 1, 1), updated_at=datetime(2026, 1, 2))
+    db.session.add(session)
+    db.session.flush()
+    for i, content in enumerate(contents):
+        db.session.add(ChatMessage(session_id=session.id, role='user' if i % 2 == 0 else 'assistant',
+                                   content=content, timestamp=datetime(2026, 1, 1, 0, i), mode='isro'))
+    db.session.commit()
+    return session.id
+
+
+def snapshot():
+    sessions = db.session.execute(db.select(ChatSession.id, ChatSession.title, ChatSession.created_at)).all()
+    messages = db.session.execute(db.select(ChatMessage.session_id, ChatMessage.role, ChatMessage.content)
+                                  .order_by(ChatMessage.id)).all()
+    return sorted(map(tuple, sessions)), list(map(tuple, messages))
+
+
+def reset():
+    db.session.execute(db.delete(ChatMessage))
+    db.session.execute(db.delete(ChatSession))
+    db.session.commit()
+
+
+def test_export_import_round_trip(app):
+    for n in range(5):
+        add_session(f'chat {n}', *(f'message {n}.{i}' for i in range(3)))
+    before = snapshot()
+    lines = list(iter_export_lines(batch_size=2))
+
+    reset()
+    stats = import_lines(lines, batch_size=4)
+    assert stats['sessions'] == 5 and stats['messages'] == 15 and stats['errors'] == 0
+    assert snapshot() == before
+
+    again = import_lines(lines)
+    assert again['skipped'] == 20 and again['sessions'] == again['messages'] == 0
+    assert snapshot() == before
+
+
+def test_colliding_ids_are_remapped(app):
+    first = add_session('exported', 'hello', 'hi')
+    lines = list(iter_export_lines())
+    reset()
+    add_session('already here', 'other', id=first)
+
+    stats = import_lines(lines)
+    new_id = stats['session_ids'][first]
+    assert new_id != first and stats['remapped'] == 2  # the session and its message 1
+    contents = db.session.execute(db.select(ChatMessage.content).where(ChatMessage.session_id == new_id)).scalars()
+    assert sorted(contents) == ['hello', 'hi']
+    assert db.session.get(ChatSession, first).title == 'already here'
+
+
+def test_invalid_rows_are_reported_before_writing(app):
+    lines = [
+        json.dumps({'type': 'session', 'id': 1, 'title': 'ok'}),
+        json.dumps({'type': 'message', 'id': 1, 'session_id': 1, 'role': 'user', 'content': 'kept'}),
+        json.dumps({'type': 'session', 'id': 2, 'title': None}),
+        json.dumps({'type': 'message', 'id': 2, 'session_id': 2, 'role': 'user', 'content': 'orphan'}),
+        json.dumps({'type': 'message', 'id': 3, 'session_id': 9, 'role': 'user', 'content': 'missing'}),
+    ]
+    stats = import_lines(lines, batch_size=1)
+    assert stats['sessions'] == 1 and stats['messages'] == 1
+    assert [e['line'] for e in stats['error_lines']] == [3, 4, 5]
+    sessions, messages = snapshot()
+    assert [s[:2] for s in sessions] == [(1, 'ok')] and messages == [(1, 'user', 'kept')]
+    assert import_lines(lines)['skipped'] == 2
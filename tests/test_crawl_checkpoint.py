@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from crawl_checkpoint import Checkpoint
+from crawl_urls import load_visited, make_visited
+
+URLS = [f"https://a/{i}" for i in range(200)]
+
+
+def checkpoint_round_trip(tmp_path, visited):
+    checkpoint = Checkpoint(tmp_path / "checkpoint.json")
+    checkpoint.save(["https://a/pending"], visited.dump(), capped=False)
+    return checkpoint.load()
+
+
+@pytest.mark.parametrize("kind", ["hashed", "bloom"])
+def test_visited_survives_save_and_load(tmp_path, kind):
+    options = {"capacity": 1000, "exact_path": tmp_path / f"{kind}.db"}
+    visited = make_visited(kind, log_path=tmp_path / "visited.log", **options)
+    for url in URLS:
+        visited.add(url)
+    state = checkpoint_round_trip(tmp_path, visited)
+    # Added after the checkpoint, so not in its frontier: must not count as visited on resume
+    visited.add("https://a/late")
+    if kind == "bloom":
+        visited._db.commit()
+
+    resumed = load_visited(json.loads(json.dumps(state["visited"])), **options)
+    assert state["frontier"] == ["https://a/pending"]
+    assert len(resumed) == len(URLS)
+    assert all(url in resumed for url in URLS)
+    assert "https://a/late" not in resumed
+    assert (tmp_path / "visited.log").stat().st_size == 8 * len(URLS)
+
+    # The reopened log keeps growing from the checkpoint
+    resumed.add("https://a/next")
+    assert resumed.dump()["length"] == 8 * (len(URLS) + 1)
+
+
+def test_visited_without_log_is_dumped_in_full(tmp_path):
+    visited = make_visited("hashed")
+    for url in URLS:
+        visited.add(url)
+    resumed = load_visited(checkpoint_round_trip(tmp_path, visited)["visited"])
+    assert all(url in resumed for url in URLS)
+
+
+def test_resume_never_recreates_a_missing_log(tmp_path):
+    visited = make_visited("hashed", log_path=tmp_path / "visited.log")
+    visited.add(URLS[0])
+    state = checkpoint_round_trip(tmp_path, visited)
+    (tmp_path / "visited.log").unlink()
+    with pytest.raises(FileNotFoundError):
+        load_visited(state["visited"])
+    assert not (tmp_path / "visited.log").exists()
+
+
+def test_legacy_url_list_is_canonicalized(tmp_path):
+    resumed = load_visited(["https://a/x#frag", "https://a/y/"])
+    assert "https://a/x" in resumed and "https://a/y" in resumed
@@ -0,0 +1,35 @@
+import importlib
+
+import pytest
+
+from crawl_urls import canonicalize_url
+
+
+@pytest.fixture(scope="module")
+def crawler(tmp_path_factory):
+    # crawler creates its output directories relative to the working directory
+    with pytest.MonkeyPatch.context() as mp:
+        mp.chdir(tmp_path_factory.mktemp("crawl"))
+        yield importlib.import_module("crawler")
+
+
+PAGE = b'<html><body><h1>Products</h1><a href="a.html">A</a><a href="../up.html">Up</a></body></html>'
+
+
+def test_links_resolve_against_response_url(crawler):
+    url = canonicalize_url("https://site.test/products/")
+    assert url == "https://site.test/products"
+    structure, links = crawler.parse_html(PAGE, url, "site.test", "https://site.test/products/")
+    assert structure["url"] == url
+    assert links == ["https://site.test/products/a.html", "https://site.test/up.html"]
+
+
+def test_base_href_overrides_response_url(crawler):
+    page = b'<html><head><base href="/docs/"></head><body><a href="a.html">A</a></body></html>'
+    _, links = crawler.parse_html(page, "https://site.test/x", "site.test", "https://site.test/x")
+    assert links == ["https://site.test/docs/a.html"]
+
+
+def test_content_params_are_kept():
+    url = canonicalize_url("https://site.test/obs?sid=42&ref=main&utm_source=x&fbclid=y")
+    assert url == "https://site.test/obs?ref=main&sid=42"
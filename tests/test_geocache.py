@@ -0,0 +1,50 @@
+import pytest
+
+from geocache import GeocodeCache, StubGeocoder
+
+
+class FailingGeocoder(StubGeocoder):
+    """StubGeocoder whose first `failures` calls raise, like a Nominatim timeout"""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def geocode(self, query, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            self.calls += 1
+            raise TimeoutError("upstream timed out")
+        return super().geocode(query, **kwargs)
+
+
+def test_hits_are_served_without_the_upstream(tmp_path):
+    stub = StubGeocoder()
+    cache = GeocodeCache(stub.geocode, path=tmp_path / "geo.db")
+    assert cache.lookup("New  Delhi, ") == (28.6139, 77.2090)
+    assert cache.lookup("new delhi") == (28.6139, 77.2090)
+    assert stub.calls == 1
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+
+    # A fresh process reads the SQLite table instead of the upstream
+    restarted = GeocodeCache(stub.geocode, path=tmp_path / "geo.db")
+    assert restarted.lookup("NEW DELHI") == (28.6139, 77.2090)
+    assert stub.calls == 1
+
+
+def test_unknown_places_are_cached_as_not_found(tmp_path):
+    stub = StubGeocoder()
+    cache = GeocodeCache(stub.geocode, path=tmp_path / "geo.db")
+    assert cache.lookup("Atlantis") is None
+    assert cache.lookup("atlantis") is None
+    assert stub.calls == 1
+
+
+def test_upstream_errors_propagate_and_are_not_cached(tmp_path):
+    stub = FailingGeocoder(failures=1)
+    cache = GeocodeCache(stub.geocode, path=tmp_path / "geo.db")
+    with pytest.raises(TimeoutError):
+        cache.lookup("Pune")
+    assert cache.stats["errors"] == 1
+    assert cache.lookup("Pune") == (18.5204, 73.8567)
+    assert stub.calls == 2
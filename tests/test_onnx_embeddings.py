@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from onnx_embeddings import PARITY_MIN_COSINE, OnnxEmbeddings, model_path
+
+TEXTS = [
+    "What is MOSDAC?",
+    "Which satellites carry a scatterometer?",
+    "How do I download INSAT-3D rainfall products?",
+    "ocean colour data",
+]
+
+pytestmark = pytest.mark.skipif(
+    not (model_path(int8=False).exists() and model_path(int8=True).exists()),
+    reason="ONNX model not exported; run `python onnx_embeddings.py export`",
+)
+
+
+def cosine(a, b):
+    a, b = np.asarray(a), np.asarray(b)
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+@pytest.mark.parametrize("int8", [False, True])
+def test_onnx_matches_sentence_transformers(int8):
+    huggingface = pytest.importorskip("langchain_huggingface")
+    from vector_index import EMBEDDING_MODEL
+
+    reference = huggingface.HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL).embed_documents(TEXTS)
+    vectors = OnnxEmbeddings(int8=int8, max_batch=1).embed_documents(TEXTS)
+    assert cosine(reference, vectors).min() >= PARITY_MIN_COSINE
+
+
+def test_batched_queries_match_documents():
+    embeddings = OnnxEmbeddings(int8=False, max_batch=4, batch_wait_ms=20)
+    with ThreadPoolExecutor(len(TEXTS)) as pool:
+        queries = list(pool.map(embeddings.embed_query, TEXTS))
+    # Padding to the longest text in a batch must not change a vector
+    assert cosine(queries, embeddings.embed_documents(TEXTS)).min() > 0.9999
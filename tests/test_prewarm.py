@@ -0,0 +1,13 @@
+import time
+
+import prewarm
+
+
+def test_prewarm_skips_regions_until_their_forecast_expires(monkeypatch):
+    monkeypatch.setattr(prewarm, "popularity", prewarm.RegionPopularity())
+    for region in ("Pune", "Delhi", "Goa"):
+        prewarm.popularity.record(region)
+    now = time.time()
+    expiries = {"Pune": None, "Delhi": now - 1, "Goa": now + 60}
+    refreshed = prewarm.prewarm_cycle(lambda region: None, expiries.get)
+    assert sorted(refreshed) == ["Delhi", "Pune"]
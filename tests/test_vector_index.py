@@ -0,0 +1,41 @@
+import json
+import os
+import time
+
+import numpy as np
+
+import vector_index
+from vector_index import build_vectorstore, load_or_build, publish, read_manifest
+
+
+class HashEmbeddings:
+    """Deterministic stand-in for the MiniLM embeddings"""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        rng = np.random.default_rng(sum(text.encode("utf-8")))
+        return rng.normal(size=16).astype(np.float32).tolist()
+
+
+def test_rebuild_keeps_the_published_index_type(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    index_dir = tmp_path / "index"
+    embeddings = HashEmbeddings()
+    settings = {"type": "hnsw", "options": {"ef_search": 48}}
+    publish(build_vectorstore(embeddings, "hnsw", ef_search=48), index_dir, settings)
+
+    # A crawl writes newer output, so the next load rebuilds from the corpus
+    corpus = tmp_path / vector_index.JSON_PATH
+    corpus.parent.mkdir(parents=True, exist_ok=True)
+    corpus.write_text(json.dumps({"children": [{"url": "https://a/1", "text": "hello world"}]}))
+    later = time.time() + 60
+    os.utime(corpus, (later, later))
+
+    vectorstore, version = load_or_build(embeddings, index_dir)
+    assert read_manifest(version, index_dir) == settings
+    assert vectorstore.index.hnsw.efSearch == 48
+
+    # Incremental publishes carry the manifest forward
+    assert read_manifest(publish(vectorstore, index_dir), index_dir) == settings
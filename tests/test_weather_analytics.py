@@ -0,0 +1,31 @@
+from weather_analytics import summarize, summarize_many
+
+TIMES = [f"2026-01-01T{h:02d}:00" for h in range(24)]
+
+
+def forecast(pressure, temp=30.0):
+    return {"hourly": {
+        "time": TIMES,
+        "temperature_2m": [temp + h % 5 for h in range(24)],
+        "relativehumidity_2m": [60.0] * 24,
+        "precipitation": [0.0] * 20 + [1.0] * 4,
+        "windgusts_10m": [float(h % 7) for h in range(24)],
+        "pressure_msl": pressure,
+    }}
+
+
+def test_summarize_matches_batch_path():
+    responses = [forecast([1010.0 - h for h in range(24)]), forecast([1000.0] * 24, temp=20.0)]
+    assert [summarize(r) for r in responses] == summarize_many(responses)
+
+
+def test_rising_pressure_has_no_drop():
+    summary = summarize(forecast([1000.0 + h for h in range(24)]))
+    assert summary["pressure_max_drop_hpa"] == 0.0
+    assert summary["rapid_pressure_fall"] is False
+
+
+def test_falling_pressure_is_flagged():
+    summary = summarize(forecast([1010.0 - h for h in range(24)]))
+    assert summary["pressure_max_drop_hpa"] == 3.0
+    assert summary["rapid_pressure_fall"] is True
@@ -0,0 +1,27 @@
+import time
+
+import weather_advisory
+from weather_context import WeatherContextStore
+
+
+def test_expired_advisory_is_rebuilt(monkeypatch, tmp_path):
+    store = WeatherContextStore(max_entries=1, spill_dir=tmp_path)
+    monkeypatch.setattr(weather_advisory, "weather_contexts", store)
+    monkeypatch.setattr(weather_advisory, "save_weather_context", lambda city: f"rebuilt {city}")
+
+    store.put("Pune", "fresh", expires_at=time.time() + 60)
+    assert weather_advisory.get_weather_context("Pune") == "fresh"
+
+    store.put("Pune", "old", expires_at=time.time() - 1)
+    assert weather_advisory.get_weather_context("Pune") == "rebuilt Pune"
+
+
+def test_spilled_entry_keeps_its_age(tmp_path):
+    store = WeatherContextStore(max_entries=1, spill_dir=tmp_path)
+    store.put("Pune", "text")
+    stored_at = store.get("Pune")[1]
+    store.put("Delhi", "other")  # spills Pune
+    text, spilled_at, expires_at = store.get("Pune")
+    assert text == "text" and expires_at is None
+    assert abs(spilled_at - stored_at) < 2
+    assert store.get("Pune")[1] == spilled_at
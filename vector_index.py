@@ -0,0 +1,338 @@
+"""
+vector_index.py
+
+Building, publishing and loading the FAISS index used by model.py.
+
+Published indexes live in INDEX_DIR/versions/<version>/ and INDEX_DIR/CURRENT
+names the live one. Publishing writes a complete new version first and then
+replaces CURRENT with os.replace, so readers only ever see a whole index.
+
+Each version also carries a flat chunk store (chunks.bin plus an offsets
+array) next to the FAISS file. load_version(..., mapped=True) memory-maps
+both instead of unpickling the docstore, so several server processes on one
+host share a single read-only copy through the page cache.
+
+The index type (flat, IVF, PQ/SQ8, HNSW) is chosen with INDEX_TYPE or
+`index_tune.py build`; see index_types.py. Each version records the type and
+build options it was made with in manifest.json, and rebuilds after a crawl
+reuse them, so INDEX_TYPE only applies until a version has a manifest.
+INDEX_NPROBE / INDEX_EF_SEARCH override the search settings stored in the
+index when it is loaded.
+"""
+import json
+import mmap
+import os
+import time
+import uuid
+from pathlib import Path
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from PyPDF2 import PdfReader
+
+from index_types import INDEX_TYPE, build_index, set_search_params
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+INDEX_DIR = Path(os.getenv("INDEX_DIR", "data/index"))
+KEEP_VERSIONS = 3
+PDF_FOLDER = "output/media"
+JSON_PATH = "output/output.json"
+NPROBE = int(os.getenv("INDEX_NPROBE", "0")) or None
+EF_SEARCH = int(os.getenv("INDEX_EF_SEARCH", "0")) or None
+FALLBACK_TEXT = "Welcome to AstroBot! I am ready to help you with ISRO and MOSDAC information once data is loaded."
+
+
+def make_embeddings(backend=EMBEDDING_BACKEND):
+    """MiniLM embeddings via sentence-transformers, or ONNX Runtime (backend="onnx") without torch"""
+    if backend == "onnx":
+        from onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings()
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+
+def make_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=500,
+        chunk_overlap=50,
+        length_function=len,
+    )
+
+
+def node_to_text(node):
+    """Flatten a crawl node (url, text, header sections) into indexable text"""
+    parts = [node.get("url", "")]
+    if node.get("text"):
+        parts.append(node["text"])
+    for section in node.get("children", []):
+        header = section.get("header", "")
+        content = section.get("content", "").strip()
+        if header or content:
+            parts.append(f"{header}\n{content}".strip())
+    return "\n\n".join(parts)
+
+
+def chunk_id(url, i):
+    """Docstore id of chunk i of a page; re-crawls of the page reuse it"""
+    return f"{url}#{i}"
+
+
+def page_documents(url, text, splitter):
+    return [Document(page_content=chunk, metadata={"url": url}) for chunk in splitter.split_text(text)]
+
+
+def build_documents(pdf_folder=PDF_FOLDER, json_path=JSON_PATH):
+    """
+    Chunk the crawled PDFs and output.json into Documents, page by page.
+    Every chunk carries its page's url in metadata (PDFs use their path), so
+    the crawl's index pipeline can later replace or delete a page's chunks.
+    """
+    splitter = make_splitter()
+    documents = []
+
+    # Ensure directories exist
+    if not os.path.exists(pdf_folder):
+        os.makedirs(pdf_folder, exist_ok=True)
+
+    for file in sorted(os.listdir(pdf_folder)):
+        if file.endswith(".pdf"):
+            try:
+                reader = PdfReader(os.path.join(pdf_folder, file))
+                pdf_text = "".join((page.extract_text() or "") + "\n" for page in reader.pages)
+                documents += page_documents(os.path.join(pdf_folder, file), pdf_text, splitter)
+            except Exception as e:
+                print(f"⚠️ Could not read {file}: {e}")
+
+    if os.path.exists(json_path):
+        with open(json_path, "r", encoding="utf-8") as f:
+            try:
+                json_data = json.load(f)
+            except ValueError:
+                json_data = {}  # no pages if load fails
+        # output.json is {"url": <site>, "children": [<page node>, ...]}
+        for node in json_data.get("children", []) if isinstance(json_data, dict) else []:
+            if isinstance(node, dict) and node.get("url"):
+                documents += page_documents(node["url"], node_to_text(node), splitter)
+
+    if not documents:
+        # Fallback to avoid FAISS error on empty documents
+        documents = [Document(page_content=FALLBACK_TEXT)]
+    return documents
+
+
+def document_ids(documents):
+    """chunk_id(url, i) for page chunks, numbered in order within each url; random ids otherwise"""
+    counts = {}
+    ids = []
+    for doc in documents:
+        url = doc.metadata.get("url")
+        if url:
+            ids.append(chunk_id(url, counts.get(url, 0)))
+            counts[url] = counts.get(url, 0) + 1
+        else:
+            ids.append(str(uuid.uuid4()))
+    return ids
+
+
+def build_vectorstore(embeddings, kind=INDEX_TYPE, **index_options):
+    """Embed the corpus and index it with the given index type (see index_types.py)"""
+    documents = build_documents()
+    vectors = embeddings.embed_documents([doc.page_content for doc in documents])
+    return vectorstore_from_index(embeddings, documents, build_index(vectors, kind, **index_options))
+
+
+def vectorstore_from_index(embeddings, documents, index):
+    """Wrap a filled FAISS index whose row i holds documents[i]"""
+    ids = document_ids(documents)
+    return FAISS(embedding_function=embeddings, index=index,
+                 docstore=InMemoryDocstore(dict(zip(ids, documents))),
+                 index_to_docstore_id=dict(enumerate(ids)))
+
+
+MANIFEST_FILE = "manifest.json"
+
+
+def read_manifest(version, index_dir=INDEX_DIR):
+    """Build settings saved with a version ({"type": ..., "options": {...}}), or {} if it has none"""
+    try:
+        return json.loads((Path(index_dir) / "versions" / version / MANIFEST_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def build_settings(index_dir=INDEX_DIR):
+    """Index type and options of the current version, or INDEX_TYPE's defaults"""
+    version = current_version(index_dir)
+    settings = read_manifest(version, index_dir) if version else {}
+    return {"type": settings.get("type", INDEX_TYPE), "options": settings.get("options", {})}
+
+
+def rebuild_vectorstore(embeddings, index_dir=INDEX_DIR):
+    """build_vectorstore with the settings of the current version. Returns (vectorstore, settings)."""
+    settings = build_settings(index_dir)
+    return build_vectorstore(embeddings, settings["type"], **settings["options"]), settings
+
+
+def current_version(index_dir=INDEX_DIR):
+    """Name of the live index version, or None if nothing has been published"""
+    try:
+        return (Path(index_dir) / "CURRENT").read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_version(version, embeddings, index_dir=INDEX_DIR, mapped=False):
+    path = Path(index_dir) / "versions" / version
+    if mapped and (path / CHUNKS_FILE).exists():
+        vectorstore = load_mapped(path, embeddings)
+    else:
+        vectorstore = FAISS.load_local(str(path), embeddings, allow_dangerous_deserialization=True)
+    set_search_params(vectorstore.index, NPROBE, EF_SEARCH)
+    return vectorstore
+
+
+# ---------------- Memory-mapped serving ---------------- #
+
+CHUNKS_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks_offsets.npy"
+
+
+def write_chunk_store(vectorstore, path):
+    """Write the documents in FAISS row order as JSON records in one flat file"""
+    path = Path(path)
+    offsets = [0]
+    with open(path / CHUNKS_FILE, "wb") as f:
+        for row in range(vectorstore.index.ntotal):
+            doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[row])
+            record = json.dumps({"page_content": doc.page_content, "metadata": doc.metadata},
+                                ensure_ascii=False).encode("utf-8")
+            f.write(record)
+            offsets.append(offsets[-1] + len(record))
+    np.save(path / OFFSETS_FILE, np.asarray(offsets, dtype=np.int64))
+
+
+class MappedDocstore(Docstore):
+    """Read-only docstore over chunks.bin, keyed by FAISS row"""
+
+    def __init__(self, path):
+        path = Path(path)
+        self.offsets = np.load(path / OFFSETS_FILE, mmap_mode="r")
+        with open(path / CHUNKS_FILE, "rb") as f:
+            # mmap of an empty file is an error
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.offsets[-1] else b""
+
+    def search(self, search):
+        row = int(search)
+        if not 0 <= row < len(self.offsets) - 1:
+            return f"ID {search} not found."
+        record = json.loads(self.data[self.offsets[row]:self.offsets[row + 1]])
+        return Document(page_content=record["page_content"], metadata=record["metadata"])
+
+    def add(self, texts):
+        raise NotImplementedError("memory-mapped index is read-only")
+
+    def delete(self, ids):
+        raise NotImplementedError("memory-mapped index is read-only")
+
+
+class RowIds:
+    """index_to_docstore_id for MappedDocstore: FAISS row i has id i"""
+
+    def __init__(self, n):
+        self.n = n
+
+    def __getitem__(self, row):
+        return int(row)
+
+    def __len__(self):
+        return self.n
+
+    def values(self):
+        return range(self.n)
+
+
+def read_index_mapped(path):
+    """faiss.read_index with the vectors memory-mapped where the index type allows it"""
+    candidates = [faiss.IO_FLAG_MMAP]
+    if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        # Flat codes and IVF lists both mapped; older faiss only maps IVF lists
+        candidates = [faiss.IO_FLAG_MMAP | faiss.IO_FLAG_MMAP_IFC, faiss.IO_FLAG_MMAP_IFC, faiss.IO_FLAG_MMAP]
+    for flags in candidates:
+        try:
+            return faiss.read_index(str(path), flags | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            continue
+    print(f"⚠️ {path} cannot be memory-mapped; loading it into memory")
+    return faiss.read_index(str(path))
+
+
+def load_mapped(path, embeddings):
+    index = read_index_mapped(Path(path) / "index.faiss")
+    return FAISS(embedding_function=embeddings, index=index,
+                 docstore=MappedDocstore(path), index_to_docstore_id=RowIds(index.ntotal))
+
+
+def publish(vectorstore, index_dir=INDEX_DIR, settings=None):
+    """
+    Save vectorstore as a new version and atomically make it current. Returns the version.
+
+    settings ({"type": kind, "options": build_index options}) go in the
+    version's manifest; by default those of the current version are kept,
+    as when an incremental update appends to the live index.
+    """
+    index_dir = Path(index_dir)
+    versions = index_dir / "versions"
+    versions.mkdir(parents=True, exist_ok=True)
+    settings = settings or build_settings(index_dir)
+    version = f"v{time.time_ns()}"
+    vectorstore.save_local(str(versions / version))
+    write_chunk_store(vectorstore, versions / version)
+    (versions / version / MANIFEST_FILE).write_text(json.dumps(settings), encoding="utf-8")
+
+    tmp = index_dir / "CURRENT.tmp"
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, index_dir / "CURRENT")
+
+    # Old versions may still be loading in another process, so keep a few
+    for old in sorted(p.name for p in versions.iterdir())[:-KEEP_VERSIONS]:
+        for f in (versions / old).iterdir():
+            f.unlink()
+        (versions / old).rmdir()
+    return version
+
+
+def corpus_mtime(pdf_folder=PDF_FOLDER, json_path=JSON_PATH):
+    """Latest modification time of the files build_documents() reads"""
+    paths = [Path(json_path)]
+    if os.path.isdir(pdf_folder):
+        paths += [p for p in Path(pdf_folder).iterdir() if p.suffix == ".pdf"]
+    return max((p.stat().st_mtime for p in paths if p.exists()), default=0)
+
+
+def version_time(version):
+    return int(version[1:]) / 1e9
+
+
+def load_or_build(embeddings, index_dir=INDEX_DIR, mapped=False):
+    """
+    Load the current published index. If none exists, or the crawl output
+    is newer than it (a full crawl has run since), rebuild from the corpus
+    with the current version's index type and options, and publish the result.
+    """
+    version = current_version(index_dir)
+    if version and version_time(version) >= corpus_mtime():
+        try:
+            return load_version(version, embeddings, index_dir, mapped), version
+        except Exception as e:
+            print(f"⚠️ Could not load index {version}: {e}; rebuilding")
+    vectorstore, settings = rebuild_vectorstore(embeddings, index_dir)
+    version = publish(vectorstore, index_dir, settings)
+    if mapped:
+        vectorstore = load_version(version, embeddings, index_dir, mapped=True)
+    return vectorstore, version
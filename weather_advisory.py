@@ -1,32 +1,157 @@
 import requests
-from geopy.geocoders import Nominatim
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
-from pathlib import Path
+import time
+from concurrent.futures import ThreadPoolExecutor
+from geocache import get_geocode_cache
+from forecast_cache import ForecastCache, next_update
+from weather_context import weather_contexts
+from weather_analytics import summarize, summarize_many, format_summary
 
 def geocode_city(city_name: str):
-    geolocator = Nominatim(user_agent="weather_app")
-    location = geolocator.geocode(city_name)
-    if location:
-        return location.latitude, location.longitude
-    return None
+    """Resolve a place name to (lat, lon) via the shared geocoding cache"""
+    return get_geocode_cache().lookup(city_name)
+
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+HOURLY_VARS = (
+    "temperature_2m,precipitation,cloudcover,windspeed_10m,"
+    "apparent_temperature,relativehumidity_2m,weathercode,visibility,"
+    "shortwave_radiation,windgusts_10m,pressure_msl"
+)
+DAILY_VARS = (
+    "temperature_2m_max,temperature_2m_min,precipitation_sum,"
+    "windspeed_10m_max,windgusts_10m_max,sunrise,sunset"
+)
+# (connect, read) timeouts in seconds
+HTTP_TIMEOUT = (3.05, 10)
+# Coordinates per multi-location Open-Meteo request
+BATCH_LOCATIONS = 50
+GEOCODE_WORKERS = 4
+
+def _make_http_session():
+    """Pooled keep-alive session with retries on transient upstream errors"""
+    http = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset(["GET"]))
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+    return http
+
+http_session = _make_http_session()
 
-def fetch_weather(lat: float, lon: float):
-    url = (
-        f"https://api.open-meteo.com/v1/forecast?"
-        f"latitude={lat}&longitude={lon}"
-        f"&current_weather=true"
-        f"&hourly=temperature_2m,precipitation,cloudcover,windspeed_10m,"
-        f"apparent_temperature,relativehumidity_2m,weathercode,visibility,"
-        f"shortwave_radiation,windgusts_10m,pressure_msl"
-        f"&daily=temperature_2m_max,temperature_2m_min,precipitation_sum,"
-        f"windspeed_10m_max,windgusts_10m_max,sunrise,sunset"
-        f"&timezone=auto"
-    )
-    response = requests.get(url)
+def _request_forecast(lat: float, lon: float, variables):
+    hourly, daily = variables
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "current_weather": "true",
+        "hourly": hourly,
+        "daily": daily,
+        "timezone": "auto",
+    }
+    response = http_session.get(OPEN_METEO_URL, params=params, timeout=HTTP_TIMEOUT)
     if response.status_code == 200:
         return response.json()
     return None
 
+forecast_cache = ForecastCache(_request_forecast)
+
+def fetch_weather(lat: float, lon: float, hourly: str = HOURLY_VARS, daily: str = DAILY_VARS):
+    """Forecast for the grid cell containing (lat, lon), served from forecast_cache"""
+    return forecast_cache.get(lat, lon, (hourly, daily))
+
+def _request_forecast_batch(cells, variables):
+    """One Open-Meteo request for many grid cells; returns responses in input order"""
+    hourly, daily = variables
+    params = {
+        "latitude": ",".join(str(lat) for lat, _ in cells),
+        "longitude": ",".join(str(lon) for _, lon in cells),
+        "current_weather": "true",
+        "hourly": hourly,
+        "daily": daily,
+        "timezone": "auto",
+    }
+    response = http_session.get(OPEN_METEO_URL, params=params, timeout=HTTP_TIMEOUT)
+    if response.status_code != 200:
+        return [None] * len(cells)
+    data = response.json()
+    # A single location comes back as an object, several as a list
+    return data if isinstance(data, list) else [data]
+
+def fetch_weather_batch(coords_list, hourly: str = HOURLY_VARS, daily: str = DAILY_VARS):
+    """
+    Forecasts for many (lat, lon) pairs, in input order.
+
+    Cached cells are served from forecast_cache; the remaining distinct cells
+    are fetched with as few multi-coordinate requests as possible.
+    """
+    variables = (hourly, daily)
+    keys = [ForecastCache.key(lat, lon, variables) for lat, lon in coords_list]
+    found = {}
+    missing = []
+    for key in dict.fromkeys(keys):
+        data = forecast_cache.peek(key)
+        if data is not None:
+            found[key] = data
+        else:
+            missing.append(key)
+
+    for i in range(0, len(missing), BATCH_LOCATIONS):
+        chunk = missing[i:i + BATCH_LOCATIONS]
+        results = _request_forecast_batch([key[:2] for key in chunk], variables)
+        for key, data in zip(chunk, results):
+            if data is not None:
+                forecast_cache.put(key, data)
+                found[key] = data
+
+    return [found.get(key) for key in keys]
+
+def geocode_many(regions, max_workers: int = GEOCODE_WORKERS):
+    """Resolve many region names concurrently; returns {region: coords or None}"""
+    regions = list(dict.fromkeys(regions))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(zip(regions, pool.map(geocode_city, regions)))
+
+def compare_regions(regions):
+    """Side-by-side weather summary for several regions"""
+    coords = geocode_many(regions)
+    resolved = [r for r in coords if coords[r]]
+    forecasts = fetch_weather_batch([coords[r] for r in resolved])
+    outlooks = summarize_many(forecasts)
+
+    comparison = []
+    for region, data, outlook in zip(resolved, forecasts, outlooks):
+        if not data:
+            comparison.append({"region": region, "error": "Weather data fetch failed"})
+            continue
+        current = data.get("current_weather", {})
+        daily = data.get("daily", {})
+
+        def first(field):
+            values = daily.get(field) or [None]
+            return values[0]
+
+        comparison.append({
+            "region": region,
+            "latitude": coords[region][0],
+            "longitude": coords[region][1],
+            "temperature": current.get("temperature"),
+            "windspeed": current.get("windspeed"),
+            "weathercode": current.get("weathercode"),
+            "max_temp": first("temperature_2m_max"),
+            "min_temp": first("temperature_2m_min"),
+            "rain_sum": first("precipitation_sum"),
+            "max_gust": first("windgusts_10m_max"),
+            "next_24h": outlook,
+        })
+
+    return {
+        "regions": comparison,
+        "not_found": [r for r in coords if not coords[r]],
+    }
+
 def make_advisory(data: dict) -> str:
     """Turn JSON into plain English summary for LLM ingestion"""
     current = data.get("current_weather", {})
@@ -59,23 +184,16 @@ Daily Forecast:
 - Max Wind: {max_wind} km/h
 - Max Gusts: {max_gust} km/h
 
-Additional data available:
-- Humidity, Radiation (Solar), Pressure, Visibility
-- Can be used for advisories: Heat/Cold Waves, Cyclones, Rain, Solar/Wind, Sea State.
 """
+    hourly_summary = format_summary(summarize(data))
+    if hourly_summary:
+        summary += f"{hourly_summary}\n"
     return summary
 
-def save_weather_context(city: str):
-    # Clear any existing weather data
-    data_dir = Path("data")
-    data_dir.mkdir(exist_ok=True)
-    
-    # Remove existing weather context file
-    weather_file = data_dir / "weather_context.txt"
-    if weather_file.exists():
-        weather_file.unlink()
-    
-    coords = geocode_city(city)
+def save_weather_context(city: str, coords=None):
+    """Build the advisory for a region and keep it in the in-memory context store"""
+    if coords is None:
+        coords = geocode_city(city)
     if not coords:
         raise ValueError("City not found")
     
@@ -86,8 +204,35 @@ def save_weather_context(city: str):
         raise ValueError("Weather data fetch failed")
 
     advisory_text = make_advisory(data)
+    expires_at = forecast_cache.expires_at(ForecastCache.key(lat, lon, (HOURLY_VARS, DAILY_VARS)))
+    weather_contexts.put(city, advisory_text, expires_at=expires_at)
     
-    with open(weather_file, "w", encoding="utf-8") as f:
-        f.write(advisory_text)
-    
-    return str(weather_file)
\ No newline at end of file
+    return advisory_text
+
+def refresh_region(city: str):
+    """Re-fetch the forecast and rebuild the advisory for a region (used by pre-warming)"""
+    coords = geocode_city(city)
+    if not coords:
+        raise ValueError("City not found")
+    if forecast_cache.reload(*coords, (HOURLY_VARS, DAILY_VARS)) is None:
+        raise ValueError("Weather data fetch failed")
+    return save_weather_context(city, coords)
+
+def forecast_expires_at(city: str):
+    """Epoch expiry of the cached forecast for a region, or None if not cached"""
+    coords = geocode_city(city)
+    if not coords:
+        return None
+    return forecast_cache.expires_at(ForecastCache.key(*coords, (HOURLY_VARS, DAILY_VARS)))
+
+def get_weather_context(city: str):
+    """Advisory text for a region, rebuilding it if missing or its forecast has expired"""
+    entry = weather_contexts.get(city)
+    if entry:
+        text, stored_at, expires_at = entry
+        if expires_at is None:
+            # Read back from the spill directory: assume the forecast was fresh when stored
+            expires_at = next_update(stored_at)
+        if time.time() < expires_at:
+            return text
+    return save_weather_context(city)
\ No newline at end of file
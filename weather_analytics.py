@@ -0,0 +1,266 @@
+"""
+weather_analytics.py
+
+Vectorized analysis of Open-Meteo hourly forecasts.
+
+The hourly series returned by fetch_weather are converted once into compact
+float32 arrays and every indicator is computed with NumPy over the last
+axis, so the same functions work for one location (shape [hours]) or a
+batch of locations (shape [locations, hours]). summarize runs a single
+forecast through the same code as a batch of one, so both entry points
+always agree.
+"""
+import bisect
+
+import numpy as np
+
+HOURLY_FIELDS = (
+    "temperature_2m", "apparent_temperature", "relativehumidity_2m",
+    "precipitation", "windspeed_10m", "windgusts_10m", "cloudcover",
+    "visibility", "shortwave_radiation", "pressure_msl",
+)
+
+RAIN_THRESHOLD_MM = 0.2          # hourly precipitation counted as rain
+GUST_WINDOW_HOURS = 3
+PRESSURE_WINDOW_HOURS = 3
+RAPID_PRESSURE_FALL_HPA = 3.0    # fall over PRESSURE_WINDOW_HOURS worth flagging
+HEAT_INDEX_CAUTION_C = 32.0
+HEAT_INDEX_DANGER_C = 41.0
+
+
+def hourly_series(data: dict, horizon: int = 24):
+    """
+    Slice the next `horizon` hours of each series out of a forecast response.
+
+    Returns (series, times): plain lists as sent by Open-Meteo (None where a
+    value is missing) and the matching ISO timestamps, starting at the
+    current hour when the response includes current_weather. Open-Meteo
+    reports current_weather.time in 15-minute steps, so it is matched to the
+    hour slot containing it.
+    """
+    hourly = data.get("hourly") or {}
+    times = hourly.get("time") or []
+    start = 0
+    now = (data.get("current_weather") or {}).get("time")
+    if now and times:
+        # ISO timestamps of one format sort as strings
+        start = max(bisect.bisect_right(times, now) - 1, 0)
+    end = start + horizon
+    series = {field: hourly[field][start:end] for field in HOURLY_FIELDS if hourly.get(field) is not None}
+    return series, times[start:end]
+
+
+def hourly_arrays(data: dict, horizon: int = 24):
+    """Like hourly_series, but each series as a float32 array with NaN for missing values"""
+    series, times = hourly_series(data, horizon)
+    # a float dtype maps None to NaN without a Python-level pass
+    return {field: np.array(values, dtype=np.float32) for field, values in series.items()}, times
+
+
+def heat_index(temp_c, rh):
+    """NOAA heat index (Rothfusz regression with Steadman fallback), in °C"""
+    t = np.asarray(temp_c, dtype=np.float32) * 9 / 5 + 32
+    rh = np.asarray(rh, dtype=np.float32)
+    simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+    # Rothfusz regression, factored to keep the number of array passes down
+    trh = t * rh
+    full = (-42.379 + t * (2.04901523 - 6.83783e-3 * t) + rh * (10.14333127 - 5.481717e-2 * rh)
+            + trh * (-0.22475541 + 1.22874e-3 * t + 8.5282e-4 * rh - 1.99e-6 * trh))
+    # The adjustments rarely apply; skip their passes when no reading needs them
+    dry = (rh < 13) & (t >= 80) & (t <= 112)
+    if dry.any():
+        full = np.where(dry, full - (13 - rh) / 4 * np.sqrt(np.clip(17 - np.abs(t - 95), 0, None) / 17), full)
+    humid = (rh > 85) & (t >= 80) & (t <= 87)
+    if humid.any():
+        full = np.where(humid, full + (rh - 85) / 10 * (87 - t) / 5, full)
+    hi = np.where((simple + t) / 2 >= 80, full, simple)
+    return ((hi - 32) * 5 / 9).astype(np.float32)
+
+
+def rolling_mean(values, window):
+    """Trailing mean over the last axis; the first window-1 positions are NaN"""
+    values = np.asarray(values, dtype=np.float32)
+    out = np.full(values.shape, np.nan, dtype=np.float32)
+    if values.shape[-1] < window:
+        return out
+    csum = np.cumsum(np.nan_to_num(values), axis=-1, dtype=np.float64)
+    csum = np.concatenate([np.zeros(values.shape[:-1] + (1,)), csum], axis=-1)
+    out[..., window - 1:] = (csum[..., window:] - csum[..., :-window]) / window
+    return out
+
+
+def peak_window(values, window=GUST_WINDOW_HOURS):
+    """(start index, mean) of the highest trailing-window mean along the last axis"""
+    means = rolling_mean(values, window)
+    filled = np.where(np.isnan(means), -np.inf, means)
+    end = filled.argmax(axis=-1)
+    peak = np.take_along_axis(means, end[..., None], axis=-1)[..., 0]
+    return np.maximum(end - window + 1, 0), peak
+
+
+def first_exceedance(values, threshold):
+    """Index of the first value above threshold along the last axis, -1 if none"""
+    hit = np.asarray(values) > threshold
+    return np.where(hit.any(axis=-1), hit.argmax(axis=-1), -1)
+
+
+def pressure_change(pressure, hours=PRESSURE_WINDOW_HOURS):
+    """Change over `hours` at each step (p[t] - p[t-hours]); NaN where undefined"""
+    p = np.asarray(pressure, dtype=np.float32)
+    out = np.full(p.shape, np.nan, dtype=np.float32)
+    if p.shape[-1] > hours:
+        out[..., hours:] = p[..., hours:] - p[..., :-hours]
+    return out
+
+
+def _rounded(values):
+    """Per-location floats rounded to 0.1, None where the reduction saw only NaN"""
+    return [None if v != v else round(v, 1) for v in np.asarray(values).tolist()]
+
+
+def _summaries(arrays: dict, times: list):
+    """
+    Summaries for a group of locations sharing one window length.
+
+    `arrays` holds [locations, hours] series and `times` the per-location
+    timestamp lists; every indicator is a single pass over the whole group.
+    """
+    hours = len(times[0])
+    columns = {}
+
+    temp = arrays.get("temperature_2m")
+    rh = arrays.get("relativehumidity_2m")
+    if temp is not None:
+        columns["temp_min_c"] = _rounded(np.fmin.reduce(temp, axis=-1))
+        columns["temp_max_c"] = _rounded(np.fmax.reduce(temp, axis=-1))
+        if rh is not None:
+            hi = heat_index(temp, rh)
+            hi_max = np.fmax.reduce(hi, axis=-1)
+            peak = np.where(np.isnan(hi), -np.inf, hi).argmax(axis=-1)
+            columns["heat_index_max_c"] = _rounded(hi_max)
+            columns["heat_index_peak_at"] = np.where(np.isnan(hi_max), -1, peak).tolist()
+            columns["heat_caution_hours"] = (hi >= HEAT_INDEX_CAUTION_C).sum(axis=-1).tolist()
+            columns["heat_danger_hours"] = (hi >= HEAT_INDEX_DANGER_C).sum(axis=-1).tolist()
+
+    precip = arrays.get("precipitation")
+    if precip is not None:
+        missing = np.isnan(precip)
+        total = np.where(missing, 0, precip).sum(axis=-1)
+        columns["rain_total_mm"] = _rounded(np.where(missing.all(axis=-1), np.nan, total))
+        columns["rain_hours"] = (precip > RAIN_THRESHOLD_MM).sum(axis=-1).tolist()
+        columns["rain_onset_at"] = first_exceedance(precip, RAIN_THRESHOLD_MM).tolist()
+
+    gusts = arrays.get("windgusts_10m")
+    if gusts is not None:
+        start, peak = peak_window(gusts)
+        columns["gust_max_kmh"] = _rounded(np.fmax.reduce(gusts, axis=-1))
+        columns["gust_peak_window"] = list(zip(start.tolist(),
+                                               np.minimum(start + GUST_WINDOW_HOURS - 1, hours - 1).tolist()))
+        columns["gust_peak_window_mean_kmh"] = _rounded(peak)
+
+    pressure = arrays.get("pressure_msl")
+    if pressure is not None:
+        lowest = np.fmin.reduce(pressure_change(pressure), axis=-1)
+        # A series that only rises has no drop; + 0.0 turns -0.0 into 0.0
+        columns["pressure_max_drop_hpa"] = _rounded(np.maximum(-lowest, 0) + 0.0)
+        # NaN compares False, so a window too short to measure is not flagged
+        columns["rapid_pressure_fall"] = (lowest <= -RAPID_PRESSURE_FALL_HPA).tolist()
+
+    visibility = arrays.get("visibility")
+    if visibility is not None:
+        columns["visibility_min_m"] = _rounded(np.fmin.reduce(visibility, axis=-1))
+
+    radiation = arrays.get("shortwave_radiation")
+    if radiation is not None:
+        columns["radiation_peak_wm2"] = _rounded(np.fmax.reduce(radiation, axis=-1))
+
+    summaries = []
+    for row, stamps in enumerate(times):
+        def at(index):
+            return stamps[index] if 0 <= index < hours else None
+
+        summary = {"hours": hours, "from": stamps[0], "to": stamps[-1]}
+        for name, values in columns.items():
+            value = values[row]
+            if name.endswith("_at"):
+                value = at(value)
+            elif name == "gust_peak_window":
+                value = (at(value[0]), at(value[1]))
+            summary[name] = value
+        summaries.append(summary)
+    return summaries
+
+
+def summarize_many(responses, horizon: int = 24):
+    """
+    Summaries of the next `horizon` hours for many locations, in input order.
+
+    Responses with the same fields and window length are stacked into
+    [locations, hours] arrays and summarized together; entries without
+    hourly data come back as None.
+    """
+    results = [None] * len(responses)
+    groups = {}
+    for i, data in enumerate(responses):
+        if not data:
+            continue
+        arrays, times = hourly_arrays(data, horizon)
+        if not times:
+            continue
+        key = (len(times),) + tuple((field, len(values)) for field, values in arrays.items())
+        groups.setdefault(key, []).append((i, arrays, times))
+
+    for members in groups.values():
+        fields = members[0][1]
+        stacked = {field: np.stack([arrays[field] for _, arrays, _ in members]) for field in fields}
+        summaries = _summaries(stacked, [times for _, _, times in members])
+        for (i, _, _), summary in zip(members, summaries):
+            results[i] = summary
+    return results
+
+
+def summarize(data: dict, horizon: int = 24):
+    """
+    Compact structured summary of the next `horizon` hours for one location.
+
+    Use summarize_many for several locations: the NumPy work is paid once
+    per batch instead of once per location.
+    """
+    arrays, times = hourly_arrays(data, horizon)
+    if not times:
+        return None
+    # A batch of one: views with a leading axis, no grouping or stacking
+    return _summaries({field: values[None] for field, values in arrays.items()}, [times])[0]
+
+
+def format_summary(summary: dict) -> str:
+    """Render a summary as short bullet lines for the LLM prompt"""
+    if not summary:
+        return ""
+
+    def fmt(value, unit=""):
+        if value is None:
+            return "N/A"
+        return f"{value:.1f}{unit}" if isinstance(value, float) else f"{value}{unit}"
+
+    lines = [f"Next {summary['hours']}h (from {summary['from']}):"]
+    if "temp_min_c" in summary:
+        lines.append(f"- Temperature range: {fmt(summary['temp_min_c'])} to {fmt(summary['temp_max_c'])} °C")
+    if "heat_index_max_c" in summary:
+        lines.append(f"- Peak heat index: {fmt(summary['heat_index_max_c'])} °C at {fmt(summary['heat_index_peak_at'])}"
+                     f" ({summary['heat_caution_hours']} h caution, {summary['heat_danger_hours']} h danger)")
+    if "rain_total_mm" in summary:
+        onset = summary["rain_onset_at"] or "no rain expected"
+        lines.append(f"- Rain: {fmt(summary['rain_total_mm'], ' mm')} over {summary['rain_hours']} h, onset {onset}")
+    if "gust_max_kmh" in summary:
+        start, end = summary["gust_peak_window"]
+        lines.append(f"- Gusts: max {fmt(summary['gust_max_kmh'], ' km/h')}, strongest {start} to {end}"
+                     f" (avg {fmt(summary['gust_peak_window_mean_kmh'], ' km/h')})")
+    if "pressure_max_drop_hpa" in summary:
+        flag = " - rapid fall, possible storm" if summary["rapid_pressure_fall"] else ""
+        lines.append(f"- Largest {PRESSURE_WINDOW_HOURS} h pressure drop: {fmt(summary['pressure_max_drop_hpa'], ' hPa')}{flag}")
+    if "visibility_min_m" in summary:
+        lines.append(f"- Minimum visibility: {fmt(summary['visibility_min_m'], ' m')}")
+    if "radiation_peak_wm2" in summary:
+        lines.append(f"- Peak solar radiation: {fmt(summary['radiation_peak_wm2'], ' W/m²')}")
+    return "\n".join(lines)
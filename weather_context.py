@@ -0,0 +1,82 @@
+"""
+weather_context.py
+
+In-memory store of weather advisory text keyed by region.
+
+Replaces the single shared data/weather_context.txt: each region gets its
+own entry, so users with different regions no longer overwrite each other
+and weather questions are answered without touching the filesystem.
+The store is a bounded LRU; evicted entries can optionally spill to
+WEATHER_CONTEXT_SPILL_DIR and are read back on the next miss.
+Each entry records when the forecast it was built from expires, so readers
+can tell when an advisory has gone stale.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from geocache import normalize_place
+
+MAX_ENTRIES = int(os.getenv('WEATHER_CONTEXT_SIZE', '512'))
+SPILL_DIR = os.getenv('WEATHER_CONTEXT_SPILL_DIR') or None
+
+
+class WeatherContextStore:
+    def __init__(self, max_entries=MAX_ENTRIES, spill_dir=SPILL_DIR):
+        self.max_entries = max_entries
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if self.spill_dir:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(region):
+        return normalize_place(region)
+
+    def _spill_path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return self.spill_dir / f"{digest}.txt"
+
+    def put(self, region, text, expires_at=None, stored_at=None):
+        key = self.key(region)
+        stored_at = time.time() if stored_at is None else stored_at
+        with self._lock:
+            self._entries[key] = (text, stored_at, expires_at)
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False))
+        if self.spill_dir:
+            for old_key, (old_text, _, _) in evicted:
+                self._spill_path(old_key).write_text(old_text, encoding='utf-8')
+
+    def get(self, region):
+        """
+        Return (text, stored_at, expires_at) for a region, or None if unknown.
+        expires_at is None for entries read back from the spill directory.
+        """
+        key = self.key(region)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+                return entry
+        if self.spill_dir:
+            path = self._spill_path(key)
+            if path.exists():
+                text = path.read_text(encoding='utf-8')
+                stored_at = path.stat().st_mtime
+                path.unlink(missing_ok=True)
+                self.put(region, text, stored_at=stored_at)
+                return text, stored_at, None
+        return None
+
+    def __contains__(self, region):
+        return self.get(region) is not None
+
+
+weather_contexts = WeatherContextStore()
@@ -1,28 +1,18 @@
 import os
-from pathlib import Path
 from langchain_groq import ChatGroq
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 
-# ---------------- Config ---------------- #
-INPUT_FILE = Path("data/weather_context.txt")
-
 # Set your Groq API key
 from dotenv import load_dotenv
 load_dotenv()
 # API Key is loaded from environment variables
 
-def load_weather_file(path):
-    """Load weather context file"""
-    if not path.exists():
-        return "No weather data available. Please set a region first."
-    
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read().strip()
+NO_WEATHER_DATA = "No weather data available. Please set a region first."
 
-def get_weather_response(question):
-    """Get response for weather-related questions"""
-    weather_data = load_weather_file(INPUT_FILE)
+def get_weather_response(question, weather_data=None):
+    """Get response for weather-related questions using the region's advisory text"""
+    weather_data = (weather_data or "").strip() or NO_WEATHER_DATA
     
     template = """
 You are a helpful weather assistant that answers based on the provided weather data.